@@ -7,10 +7,13 @@ import struct
 import random
 from collections import defaultdict, Counter
 import threading
+import multiprocessing
 
 try:
-    from type_exclusive_function import select_item, get_item_category, select_attribute_item, calculate_weaknesses, reload_config, reload_pokemon_types_data
+    from type_exclusive_function import select_items_batch, get_item_category_index, item_category_histogram, select_attribute_item, calculate_weaknesses, reload_config, reload_pokemon_types_data
     from file_manager import safe_load_file, safe_save_file
+    from trainer_poke_corpus import get_trainer_poke_corpus
+    from core.battle_types import get_weakness_row
     from utils.path_resolver import (
         get_trainer_poke_dir,
         get_personal_total_path,
@@ -54,20 +57,6 @@ personal_total_bin_path = get_personal_total_path()
 main_file_path = get_main_file_path()
 file_numbers = []
 
-# 宝可梦数据结构常量
-POKEMON_SIZE = 0x20
-ITEM_OFFSET = 0x10
-POKEMON_ID_OFFSET = 0x0C
-LEVEL_OFFSET = 0x0A
-NATURE_OFFSET = 0x01
-IV_OFFSET = 0x1C
-EV_OFFSET = 0x02
-ABILITY_OFFSET = 0x00
-MOVE1_OFFSET = 0x12
-MOVE2_OFFSET = 0x14
-MOVE3_OFFSET = 0x16
-MOVE4_OFFSET = 0x18
-
 # personal_total.bin 数据结构常量
 PERSONAL_RECORD_SIZE = 0xB0
 TYPE_OFFSET_1 = 6
@@ -185,6 +174,11 @@ class PokemonToolsApp:
         self.single_item_id_var = tk.StringVar(value="234")
         self.single_item_entry = ttk.Entry(strategy_frame, textvariable=self.single_item_id_var, width=10, state="disabled")
         self.single_item_entry.grid(row=3, column=1, sticky=tk.W, padx=5, pady=2)
+
+        # 随机种子输入，留空时每次结果不同
+        ttk.Label(strategy_frame, text="随机种子:").grid(row=4, column=0, sticky=tk.W, padx=5, pady=2)
+        self.random_seed_var = tk.StringVar(value="")
+        ttk.Entry(strategy_frame, textvariable=self.random_seed_var, width=10).grid(row=4, column=1, sticky=tk.W, padx=5, pady=2)
         
         ttk.Button(random_frame, text="开始随机化", command=self.randomize_items).grid(row=1, column=0, padx=5, pady=10)
 
@@ -532,20 +526,25 @@ class PokemonToolsApp:
         if self.resistance_column is None or len(self.selected_defense_types) == 0:
             return
         
+        # 选中的防御属性组合在克制矩阵中对应的一行（types_order与属性编号顺序一致）
+        weakness_row = get_weakness_row([type_code_map.get(col - 1) for col in self.selected_defense_types])
+        
         # 计算每个防御属性对选中防御属性的抗性
         for row in range(1, 19):
             defense_type_index = row - 1
             defense_type = self.types_order[defense_type_index]
             
-            # 计算双属性抗性
-            resistance = 1.0
-            for selected_col in self.selected_defense_types:
-                selected_defense_type_index = selected_col - 1
-                selected_defense_type = self.types_order[selected_defense_type_index]
-                
-                # 获取当前防御属性对选中防御属性的相克倍率
-                defense_effectiveness = type_effectiveness_map[defense_type][selected_defense_type_index]
-                resistance *= defense_effectiveness
+            if weakness_row is not None:
+                resistance = weakness_row[defense_type_index]
+            else:
+                # 计算双属性抗性
+                resistance = 1.0
+                for selected_col in self.selected_defense_types:
+                    selected_defense_type_index = selected_col - 1
+                    
+                    # 获取当前防御属性对选中防御属性的相克倍率
+                    defense_effectiveness = type_effectiveness_map[defense_type][selected_defense_type_index]
+                    resistance *= defense_effectiveness
             
             # 更新抗性列的值和颜色
             cell = self.type_cells[(row, self.resistance_column)]
@@ -1325,15 +1324,8 @@ class PokemonToolsApp:
             messagebox.showerror("错误", "训练家文件目录不存在")
             return
         
-        files = [f for f in os.listdir(trainer_poke_dir) if f.startswith("trainer_poke_") and f.endswith(".bin")]
-        files.sort()
-        
-        file_numbers = []
-        pattern = re.compile(r"trainer_poke_(\d+)\.bin")
-        for f in files:
-            match = pattern.match(f)
-            if match:
-                file_numbers.append(int(match.group(1)))
+        # 手动刷新时重新读取全部训练家文件
+        file_numbers = list(get_trainer_poke_corpus(trainer_poke_dir, reload=True).file_numbers)
         
         # 更新下拉框
         self.file_num_combo['values'] = [str(num).zfill(3) for num in file_numbers]
@@ -1685,55 +1677,27 @@ class PokemonToolsApp:
             return f"{ability_name} ({ability_type})", ability_id
         
 
-        file_number = file_number.zfill(3)
-        filepath = os.path.join(trainer_poke_dir, f"trainer_poke_{file_number}.bin")
-        
-        if not os.path.exists(filepath):
-            return f"文件不存在: {filepath}"
+        corpus = get_trainer_poke_corpus(trainer_poke_dir)
+        file_name = corpus.file_name_for(file_number)
         
-        with open(filepath, "rb") as f:
-            data = f.read()
-        
-        file_size = len(data)
-        num_pokemon = file_size // POKEMON_SIZE
+        if not corpus.has_file(file_name):
+            return f"文件不存在: {os.path.join(trainer_poke_dir, file_name)}"
         
-        # result = f"文件: trainer_poke_{file_number}.bin\n"
-        # result += f"宝可梦数量: {num_pokemon}\n"
+        # result = f"文件: {file_name}\n"
+        # result += f"宝可梦数量: {len(corpus.file_rows(file_name))}\n"
         # result += "-" * 80 + "\n"
 
         pokemon_data_list = []
         
-        for i in range(num_pokemon):
-            offset = i * POKEMON_SIZE
-            if offset + POKEMON_SIZE > file_size:
-                result += f"警告: 宝可梦{i}的数据不完整!\n"
-                break
-            
-            # 偏移量
-            pokemon_id_offset = offset + POKEMON_ID_OFFSET
-            item_offset = offset + ITEM_OFFSET
-            level_offset = offset + LEVEL_OFFSET
-            nature_offset = offset + NATURE_OFFSET
-            ev_offset = offset + EV_OFFSET
-            iv_offset = offset + IV_OFFSET
-            move1_offset = offset + MOVE1_OFFSET
-            move2_offset = offset + MOVE2_OFFSET
-            move3_offset = offset + MOVE3_OFFSET
-            move4_offset = offset + MOVE4_OFFSET
-            
+        for i, row in enumerate(corpus.file_rows(file_name)):
             try:
                 # 读取数据
-                pokemon_id = struct.unpack("<H", data[pokemon_id_offset:pokemon_id_offset+2])[0]
-                item_id = struct.unpack("<H", data[item_offset:item_offset+2])[0]
-                level = data[level_offset]
-                nature_value = data[nature_offset]
-                
-                # 读取技能
-                move1 = struct.unpack("<H", data[move1_offset:move1_offset+2])[0]
-                move2 = struct.unpack("<H", data[move2_offset:move2_offset+2])[0]
-                move3 = struct.unpack("<H", data[move3_offset:move3_offset+2])[0]
-                move4 = struct.unpack("<H", data[move4_offset:move4_offset+2])[0]
-                move_ids = [move1, move2, move3, move4]
+                record = corpus.record(row)
+                pokemon_id = record["species"]
+                item_id = record["item"]
+                level = record["level"]
+                nature_value = record["nature"]
+                move_ids = record["moves"]
                 
                 # 获取宝可梦信息
                 pokemon_name = pokemon_name_map.get(str(pokemon_id), f"未知({pokemon_id})")
@@ -1747,22 +1711,12 @@ class PokemonToolsApp:
                 else:
                     nature_display = nature_name
                 
-                # 解析努力值和个体值
-                evs = []
-                if ev_offset + 6 <= len(data):
-                    ev_data = data[ev_offset:ev_offset+6]
-                    evs = list(ev_data)
-                
-                ivs = []
-                if iv_offset + 4 <= len(data):
-                    iv_data = data[iv_offset:iv_offset+4]
-                    iv_value = struct.unpack("<I", iv_data)[0]
-                    for j in range(6):
-                        iv = (iv_value >> (5 * j)) & 0x1F
-                        ivs.append(iv)
+                # 努力值和个体值
+                evs = record["evs"]
+                ivs = record["ivs"]
                 
                 # 解析特性
-                ability_value = (data[offset + ABILITY_OFFSET] >> 4) & 0x0F
+                ability_value = record["ability_value"]
                 ability_display, ability_id = get_ability_display(pokemon_id, ability_value)
                 
                 # # 格式化输出
@@ -1831,11 +1785,21 @@ class PokemonToolsApp:
                 messagebox.showerror("错误", "道具ID必须是数字")
                 return
         
+        seed = self.random_seed_var.get().strip()
+        if seed:
+            try:
+                seed = int(seed)
+            except ValueError:
+                messagebox.showerror("错误", "随机种子必须是整数")
+                return
+        else:
+            seed = None
+        
         # 在后台线程中执行随机化操作
         def randomize_thread():
             self.set_status(self.random_status_var, "正在随机化道具...")
             try:
-                result = self.randomize_items_process(strategy, single_item_id)
+                result = self.randomize_items_process(strategy, single_item_id, seed)
                 self.random_text.delete(1.0, tk.END)
                 self.random_text.insert(tk.END, result)
                 self.set_status(self.random_status_var, "道具随机化完成!")
@@ -1846,52 +1810,44 @@ class PokemonToolsApp:
         
         threading.Thread(target=randomize_thread).start()
     
-    def randomize_items_process(self, strategy, single_item_id=None):
-        """随机化道具处理过程"""
+    def randomize_items_process(self, strategy, single_item_id=None, seed=None):
+        """随机化道具处理过程
+
+        Args:
+            strategy: "strategy"(五类权重)、"random"(有效列表中随机)或"single"(单一道具)
+            single_item_id: 单一替换时的道具ID
+            seed: 随机种子，相同种子得到相同结果；为None时每次不同
+        """
         if not self._is_valid_trainer_dir():
             raise FileNotFoundError("训练家文件目录无效")
-        total_pokemon = 0
-        replaced_count = 0
         
-        files = [f for f in os.listdir(trainer_poke_dir) if f.startswith("trainer_poke_") and f.endswith(".bin")]
+        corpus = get_trainer_poke_corpus(trainer_poke_dir)
+        total_pokemon = len(corpus)
         
-        for file in files:
-            filepath = os.path.join(trainer_poke_dir, file)
-            
-            with open(filepath, "rb") as f:
-                data = bytearray(f.read())
-            
-            num_pokemon = len(data) // POKEMON_SIZE
-            
-            for i in range(num_pokemon):
-                total_pokemon += 1
-                offset = i * POKEMON_SIZE
-                item_offset = offset + ITEM_OFFSET
-                pokemon_id_offset = offset + POKEMON_ID_OFFSET
-                
-                if strategy == "single" and single_item_id is not None:
-                    # 单一替换
-                    new_item = single_item_id
-                elif strategy == "random":
-                    # 随机替换
-                    new_item = random.choice(config["valid_items"])
-                else:
-                    pokemon_id = struct.unpack("<H", data[pokemon_id_offset:pokemon_id_offset+2])[0]
-                    new_item = select_item(pokemon_id)
-                
-                # 确保new_item是整数
-                if isinstance(new_item, str):
-                    try:
-                        new_item = int(new_item)
-                    except ValueError:
-                        self.set_status(self.random_status_var, f"错误: 道具ID '{new_item}' 不是有效的数字")
-                        return f"错误: 道具ID '{new_item}' 不是有效的数字"
-                
-                data[item_offset:item_offset+2] = struct.pack("<H", new_item)
-                replaced_count += 1
-            
-            with open(filepath, "wb") as f:
-                f.write(data)
+        if strategy == "single" and single_item_id is not None:
+            # 单一替换
+            new_items = [single_item_id] * total_pokemon
+        elif strategy == "random":
+            # 随机替换
+            new_items = random.Random(seed).choices(config["valid_items"], k=total_pokemon)
+        else:
+            # 按属性组合分组后整组抽样
+            new_items = select_items_batch(corpus.column("species"), seed)
+        
+        # 确保道具ID都是整数
+        for new_item in set(new_items):
+            if isinstance(new_item, str):
+                try:
+                    int(new_item)
+                except ValueError:
+                    self.set_status(self.random_status_var, f"错误: 道具ID '{new_item}' 不是有效的数字")
+                    return f"错误: 道具ID '{new_item}' 不是有效的数字"
+        new_items = [int(new_item) for new_item in new_items]
+        replaced_count = len(new_items)
+        
+        # 全部计算完成后统一写回，出错时不会留下只改了一部分的文件
+        corpus.set_items(new_items)
+        corpus.save()
         
         result = f"处理完成!\n"
         result += f"检查宝可梦: {total_pokemon} 只\n"
@@ -1933,19 +1889,22 @@ class PokemonToolsApp:
         """分析训练家文件中的道具分布"""
         if not self._is_valid_trainer_dir():
             raise ValueError("训练家文件目录无效")
-        POKEMON_SIZE = 0x20
-        ITEM_OFFSET = 0x10
-        POKEMON_ID_OFFSET = 0x0C
-        
-        all_files = [f for f in os.listdir(trainer_poke_dir) if f.startswith("trainer_poke_") and f.endswith(".bin")]
+        corpus = get_trainer_poke_corpus(trainer_poke_dir)
+        species_column = corpus.column("species")
+        item_column = corpus.column("item")
+        all_files = corpus.files
         
         # 随机选择一些文件进行分析
         sample_files = random.sample(all_files, min(sample_count, len(all_files)))
+        sample_rows = [row for file_name in sample_files for row in corpus.file_rows(file_name)]
+        # 道具类别直接查稠密索引（道具ID -> 类别编号），不再逐个调用get_item_category
+        category_codes, category_names = get_item_category_index()
+        code_count = len(category_codes)
         
         results = {
             "total_pokemon": 0,
             "item_distribution": Counter(),
-            "category_distribution": Counter(),
+            "category_distribution": item_category_histogram(item_column[row] for row in sample_rows),
             "type_match_analysis": defaultdict(list),
             "pokemon_with_items": []
         }
@@ -1956,33 +1915,18 @@ class PokemonToolsApp:
         mismatched_cases = []  # 存储不匹配的情况
         
         for file_name in sample_files:
-            filepath = os.path.join(trainer_poke_dir, file_name)
-            
-            with open(filepath, "rb") as f:
-                data = f.read()
-            
-            num_pokemon = len(data) // POKEMON_SIZE
-            
-            for i in range(num_pokemon):
-                offset = i * POKEMON_SIZE
-                item_offset = offset + ITEM_OFFSET
-                pokemon_id_offset = offset + POKEMON_ID_OFFSET
-                
-                if item_offset + 2 > len(data) or pokemon_id_offset + 2 > len(data):
-                    continue
-                
+            for row in corpus.file_rows(file_name):
                 # 读取宝可梦ID和道具ID
-                pokemon_id = struct.unpack("<H", data[pokemon_id_offset:pokemon_id_offset+2])[0]
-                item_id = struct.unpack("<H", data[item_offset:item_offset+2])[0]
+                pokemon_id = species_column[row]
+                item_id = item_column[row]
                 
                 pokemon_types = pokemon_types_data.get(str(pokemon_id), [])
                 item_name = item_id_to_name.get(item_id, f"未知道具({item_id})")
-                item_category = get_item_category(item_id)
+                item_category = category_names[category_codes[item_id] if item_id < code_count else 0]
                 
                 # 记录结果
                 results["total_pokemon"] += 1
                 results["item_distribution"][item_id] += 1
-                results["category_distribution"][item_category] += 1
                 
                 # 记录宝可梦和道具的详细信息
                 pokemon_info = {
@@ -2300,7 +2244,18 @@ class PokemonToolsApp:
         def safe_load_json(filename):
             return safe_load_file(filename, "json")
         
-        pokemon_main_info_tmp = safe_load_json("pokemon_main_info.json")
+        # 优先读取二进制快照，快照不存在或比JSON旧时回退到JSON
+        pokemon_main_info_tmp = None
+        try:
+            from file_manager import get_config_dir
+            from pokemon_snapshot import load_snapshot, get_snapshot_path, is_snapshot_current
+            json_path = os.path.join(get_config_dir(), "pokemon_main_info.json")
+            if is_snapshot_current(json_path):
+                pokemon_main_info_tmp = load_snapshot(get_snapshot_path(json_path))
+        except ImportError:
+            pass
+        if pokemon_main_info_tmp is None:
+            pokemon_main_info_tmp = safe_load_json("pokemon_main_info.json")
         if pokemon_main_info_tmp is not None:  # 文件存在且可以解析为JSON（即使是空对象{}）
             global pokemon_main_info
             pokemon_main_info = pokemon_main_info_tmp
@@ -2509,4 +2464,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # 打包版本中进程池的子进程不重新启动界面
+    multiprocessing.freeze_support()
     main()
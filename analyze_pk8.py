@@ -1,15 +1,26 @@
 import struct
 import json
 import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from array import array
 from collections import defaultdict
 
 try:
-    from file_manager import safe_load_file, safe_save_file
+    from file_manager import safe_load_file, safe_save_file, get_config_dir
 except ImportError:
     safe_load_file = None
     safe_save_file = None
+    get_config_dir = None
     print("警告: 无法导入file_manager模块，某些功能可能不可用")
 
+try:
+    from pokemon_snapshot import SnapshotWriter, get_snapshot_path
+except ImportError:
+    SnapshotWriter = None
+    get_snapshot_path = None
+
 # 基于PKHeX的G8PKM.cs修正的偏移量（适用于PK8格式）
 offset_map = {
     'species': 0x08,
@@ -113,60 +124,141 @@ def crypt(data, offset, seed):
     
     return seed
 
+def pkm_keystream(ec, length=0x158, block_size=0x50):
+    """生成与crypt_pkm等价的LCG密钥流（前8字节不加密，密钥流为0）
+
+    加密区[8, 8+4*block_size)从EC开始推进LCG；
+    之后的Party Stats区域重新从EC开始，因此复用密钥流的开头部分。
+    """
+    end = min(8 + 4 * block_size, length)
+    word_count = (end - 8) // 2
+    words = [0] * word_count
+    seed = ec
+    for i in range(word_count):
+        seed = (0x41C64E6D * seed + 0x6073) & 0xFFFFFFFF
+        words[i] = seed >> 16
+    stream = bytes(8) + struct.pack(f'<{word_count}H', *words)
+    if length > end:
+        stream += stream[8:8 + (length - end) // 2 * 2]
+    return stream.ljust(length, b'\x00')
+
+def crypt_pkm_batch(buffer, slot_size=0x158, block_size=0x50):
+    """批量解密/加密连续存放的宝可梦数据（如整个KBox）
+
+    为每个槽位按各自的EC生成LCG密钥流并拼接，再对整个缓冲区做一次异或。
+    结果与逐个槽位调用crypt_pkm一致，返回新的bytes。
+    """
+    slot_count = len(buffer) // slot_size
+    if slot_count == 0:
+        return bytes(buffer)
+    keystreams = {}
+    parts = []
+    for slot in range(slot_count):
+        ec = struct.unpack_from('<I', buffer, slot * slot_size)[0]
+        stream = keystreams.get(ec)
+        if stream is None:
+            stream = pkm_keystream(ec, slot_size, block_size)
+            keystreams[ec] = stream
+        parts.append(stream)
+    tail = len(buffer) - slot_count * slot_size
+    if tail:
+        parts.append(bytes(tail))
+    keystream = b''.join(parts)
+    value = int.from_bytes(buffer, 'little') ^ int.from_bytes(keystream, 'little')
+    return value.to_bytes(len(buffer), 'little')
+
+def decrypt_pokemon_batch(buffer, slot_size=0x158):
+    """批量解密多只宝可梦，返回每个槽位解密并重排后的数据列表"""
+    decrypted = shuffle_batch(crypt_pkm_batch(buffer, slot_size, 0x50), slot_size, 0x50)
+    return [decrypted[offset:offset + slot_size]
+            for offset in range(0, len(decrypted) - slot_size + 1, slot_size)]
+
+# BlockPosition数组来自PKHeX源码
+BLOCK_POSITION = [
+    0, 1, 2, 3,
+    0, 1, 3, 2,
+    0, 2, 1, 3,
+    0, 3, 1, 2,
+    0, 2, 3, 1,
+    0, 3, 2, 1,
+    1, 0, 2, 3,
+    1, 0, 3, 2,
+    2, 0, 1, 3,
+    3, 0, 1, 2,
+    2, 0, 3, 1,
+    3, 0, 2, 1,
+    1, 2, 0, 3,
+    1, 3, 0, 2,
+    2, 1, 0, 3,
+    3, 1, 0, 2,
+    2, 3, 0, 1,
+    3, 2, 0, 1,
+    1, 2, 3, 0,
+    1, 3, 2, 0,
+    2, 1, 3, 0,
+    3, 1, 2, 0,
+    2, 3, 1, 0,
+    3, 2, 1, 0,
+    
+    # duplicates of 0-7 to eliminate modulus
+    0, 1, 2, 3,
+    0, 1, 3, 2,
+    0, 2, 1, 3,
+    0, 3, 1, 2,
+    0, 2, 3, 1,
+    0, 3, 2, 1,
+    1, 0, 2, 3,
+    1, 0, 3, 2,
+]
+
+# 预先计算的32种重排顺序：SHUFFLE_ORDERS[sv][目标块] = 源块
+SHUFFLE_ORDERS = [tuple(BLOCK_POSITION[sv * 4:sv * 4 + 4]) for sv in range(32)]
+# 逆重排顺序，用于重新加密前把数据块恢复到存储顺序
+UNSHUFFLE_ORDERS = [tuple(order.index(block) for block in range(4)) for order in SHUFFLE_ORDERS]
+
+_shuffle_span_cache = {}
+
+def get_shuffle_spans(sv, block_size=0x50, inverse=False):
+    """获取sv对应的块拷贝表：[(目标偏移, 源偏移), ...]，按(sv, 块大小, 方向)缓存"""
+    cache_key = (sv, block_size, inverse)
+    spans = _shuffle_span_cache.get(cache_key)
+    if spans is None:
+        order = (UNSHUFFLE_ORDERS if inverse else SHUFFLE_ORDERS)[sv]
+        spans = tuple((8 + block_size * block, 8 + block_size * order[block]) for block in range(4))
+        _shuffle_span_cache[cache_key] = spans
+    return spans
+
+def shuffle_batch(buffer, slot_size=0x158, block_size=0x50, inverse=False):
+    """批量重排连续存放的宝可梦数据，结果写入一次性分配的输出缓冲区
+
+    每个槽位的sv由其EC决定（EC本身不参与重排也不加密）。
+    inverse为True时执行逆重排，用于重新加密。
+    """
+    result = bytearray(buffer)
+    view = memoryview(buffer)
+    for offset in range(0, len(buffer) - slot_size + 1, slot_size):
+        sv = (struct.unpack_from('<I', buffer, offset)[0] >> 13) & 31
+        for dest, src in get_shuffle_spans(sv, block_size, inverse):
+            result[offset + dest:offset + dest + block_size] = view[offset + src:offset + src + block_size]
+    return result
+
 def shuffle_array(data, sv, block_size):
     """
     实现PKHeX中的ShuffleArray方法
     """
-    # BlockPosition数组来自PKHeX源码
-    block_position = [
-        0, 1, 2, 3,
-        0, 1, 3, 2,
-        0, 2, 1, 3,
-        0, 3, 1, 2,
-        0, 2, 3, 1,
-        0, 3, 2, 1,
-        1, 0, 2, 3,
-        1, 0, 3, 2,
-        2, 0, 1, 3,
-        3, 0, 1, 2,
-        2, 0, 3, 1,
-        3, 0, 2, 1,
-        1, 2, 0, 3,
-        1, 3, 0, 2,
-        2, 1, 0, 3,
-        3, 1, 0, 2,
-        2, 3, 0, 1,
-        3, 2, 0, 1,
-        1, 2, 3, 0,
-        1, 3, 2, 0,
-        2, 1, 3, 0,
-        3, 1, 2, 0,
-        2, 3, 1, 0,
-        3, 2, 1, 0,
-        
-        # duplicates of 0-7 to eliminate modulus
-        0, 1, 2, 3,
-        0, 1, 3, 2,
-        0, 2, 1, 3,
-        0, 3, 1, 2,
-        0, 2, 3, 1,
-        0, 3, 2, 1,
-        1, 0, 2, 3,
-        1, 0, 3, 2,
-    ]
-    
     result = bytearray(data)
-    index = sv * 4
-    start = 8
-    
-    for block in range(4):
-        ofs = block_position[index + block]
-        src_start = start + (block_size * ofs)
-        dest_start = start + (block_size * block)
-        
+    view = memoryview(data)
+    for dest, src in get_shuffle_spans(sv, block_size):
         # 复制数据块
-        result[dest_start:dest_start+block_size] = data[src_start:src_start+block_size]
-    
+        result[dest:dest + block_size] = view[src:src + block_size]
+    return result
+
+def unshuffle_array(data, sv, block_size):
+    """shuffle_array的逆操作，把数据块恢复到加密存储时的顺序"""
+    result = bytearray(data)
+    view = memoryview(data)
+    for dest, src in get_shuffle_spans(sv, block_size, inverse=True):
+        result[dest:dest + block_size] = view[src:src + block_size]
     return result
 
 
@@ -211,25 +303,66 @@ def display_full_hex_dump(file_path, description):
     return True
 
 
-def parse_pk8_to_dict(data, encrypted=False):
-    """解析PK8数据并返回字典
-    
-    Args:
-        data: 宝可梦数据
-        encrypted: 是否为加密数据，如果是则先解密
-    """
-    # 如果数据是加密的，先解密
-    if encrypted:
-        data = decrypt_pokemon_data(data)
-    
-    result = {}
+# 各字段的struct格式；与offset_map一起编译成覆盖全部字段的单个Struct
+_pk8_field_formats = {
+    'ec': 'I',
+    'species': 'H',
+    'held_item': 'H',
+    'tid16': 'H',
+    'sid16': 'H',
+    'ability': 'H',
+    'ability_num': 'B',
+    'pid': 'I',
+    'nature': 'B',
+    'ev_hp': 'B',
+    'ev_atk': 'B',
+    'ev_def': 'B',
+    'ev_spe': 'B',
+    'ev_spa': 'B',
+    'ev_spd': 'B',
+    'nickname': '24s',
+    'move1': 'H',
+    'move2': 'H',
+    'move3': 'H',
+    'move4': 'H',
+    'stat_hp_current': 'H',
+    'iv32': 'I',
+    'friendship': 'B',
+    'met_year': 'B',
+    'met_month': 'B',
+    'met_day': 'B',
+    'met_location': 'H',
+    'level': 'B',
+    'stat_hp_max': 'H',
+    'stat_atk': 'H',
+    'stat_def': 'H',
+    'stat_spe': 'H',
+    'stat_spa': 'H',
+    'stat_spd': 'H',
+}
 
-    # 物种
-    species = struct.unpack_from('<H', data, offset_map['species'])[0]
-    result['species'] = species
+def _compile_pk8_struct(record_size=0x158):
+    """按偏移量排序字段，用填充字节拼出覆盖整条记录的Struct"""
+    offsets = dict(offset_map, ec=0x00)
+    fields = sorted(_pk8_field_formats, key=lambda name: offsets[name])
+    fmt = '<'
+    pos = 0
+    for name in fields:
+        gap = offsets[name] - pos
+        if gap:
+            fmt += f'{gap}x'
+        fmt += _pk8_field_formats[name]
+        pos = offsets[name] + struct.calcsize('<' + _pk8_field_formats[name])
+    if record_size > pos:
+        fmt += f'{record_size - pos}x'
+    return struct.Struct(fmt), tuple(fields)
 
-    # 昵称
-    nickname_data = data[offset_map['nickname']:offset_map['nickname']+24]
+# 一次解包即可取出offset_map中的全部字段
+PK8_STRUCT, PK8_FIELDS = _compile_pk8_struct()
+_pk8_field_index = {name: i for i, name in enumerate(PK8_FIELDS)}
+
+def decode_nickname(nickname_data):
+    """解码UTF-16LE昵称（遇到0x0000结束）"""
     try:
         end_pos = 0
         for i in range(0, len(nickname_data)-1, 2):
@@ -240,116 +373,523 @@ def parse_pk8_to_dict(data, encrypted=False):
             end_pos = len(nickname_data)
         
         if end_pos > 0:
-            nickname = nickname_data[:end_pos].decode('utf-16le')
-            result['nickname'] = nickname
-        else :
-            result['nickname'] = ''
+            return nickname_data[:end_pos].decode('utf-16le')
+        return ''
     except Exception as e:
-        result['nickname'] = f"解析失败 - {e}"
-    
-    # 等级
-    level = data[offset_map['level']]
-    result['level'] = level
-    
-    # 技能
-    move_offsets = ['move1', 'move2', 'move3', 'move4']
-    moves = {}
-    for i, move_key in enumerate(move_offsets):
-        offset = offset_map[move_key]
-        move_id = struct.unpack_from('<H', data, offset)[0]
-        moves[f'move{i+1}'] = move_id
-    result['moves'] = moves
-    
-    # 持有物品
-    held_item = struct.unpack_from('<H', data, offset_map['held_item'])[0]
-    result['held_item'] = held_item
-    
-    # 亲密度
-    friendship = data[offset_map['friendship']]
-    result['friendship'] = friendship
-    
-    # 特性
-    ability_id = struct.unpack_from('<H', data, offset_map['ability'])[0]
-    result['ability_id'] = ability_id
-    
-    # 特性编号
-    ability_num = data[offset_map['ability_num']] & 0x7  # 取低3位
-    result['ability_num'] = ability_num
-    
-    # 性格
-    nature_value = data[offset_map['nature']]
-    result['nature_value'] = nature_value
-    
-    # 努力值
-    ev_keys = ['ev_hp', 'ev_atk', 'ev_def', 'ev_spa', 'ev_spd', 'ev_spe']
-    evs = {}
-    for key in ev_keys:
-        ev = data[offset_map[key]]
-        evs[key.split('_')[1]] = ev  # 提取出HP/ATK/DEF等部分作为键
-    result['evs'] = evs
+        return f"解析失败 - {e}"
+
+def _pk8_values_to_dict(values):
+    """把PK8_STRUCT解包得到的字段值转换为parse_pk8_to_dict的字典格式"""
+    v = dict(zip(PK8_FIELDS, values))
+    result = {}
+    result['species'] = v['species']
+    result['nickname'] = decode_nickname(v['nickname'])
+    result['level'] = v['level']
+    result['moves'] = {
+        'move1': v['move1'],
+        'move2': v['move2'],
+        'move3': v['move3'],
+        'move4': v['move4'],
+    }
+    result['held_item'] = v['held_item']
+    result['friendship'] = v['friendship']
+    result['ability_id'] = v['ability']
+    result['ability_num'] = v['ability_num'] & 0x7  # 取低3位
+    result['nature_value'] = v['nature']
+    result['evs'] = {
+        'hp': v['ev_hp'],
+        'atk': v['ev_atk'],
+        'def': v['ev_def'],
+        'spa': v['ev_spa'],
+        'spd': v['ev_spd'],
+        'spe': v['ev_spe'],
+    }
     
     # 个体值 (从32位值中提取)
-    iv32 = struct.unpack_from('<I', data, offset_map['iv32'])[0]
-    iv_hp = (iv32 >> 0) & 0x1F
-    iv_atk = (iv32 >> 5) & 0x1F
-    iv_def = (iv32 >> 10) & 0x1F
-    iv_spe = (iv32 >> 15) & 0x1F
-    iv_spa = (iv32 >> 20) & 0x1F
-    iv_spd = (iv32 >> 25) & 0x1F
-    is_egg = ((iv32 >> 30) & 1) == 1
-    is_nicknamed = ((iv32 >> 31) & 1) == 1
-    
+    iv32 = v['iv32']
     result['ivs'] = {
-        'hp': iv_hp,
-        'atk': iv_atk,
-        'def': iv_def,
-        'spa': iv_spa,
-        'spd': iv_spd,
-        'spe': iv_spe
+        'hp': (iv32 >> 0) & 0x1F,
+        'atk': (iv32 >> 5) & 0x1F,
+        'def': (iv32 >> 10) & 0x1F,
+        'spa': (iv32 >> 20) & 0x1F,
+        'spd': (iv32 >> 25) & 0x1F,
+        'spe': (iv32 >> 15) & 0x1F,
     }
-    result['is_egg'] = is_egg
-    result['is_nicknamed'] = is_nicknamed
-    
-    # 能力值
-    stat_hp_current = struct.unpack_from('<H', data, offset_map['stat_hp_current'])[0]
-    stat_hp_max = struct.unpack_from('<H', data, offset_map['stat_hp_max'])[0]
-    stat_atk = struct.unpack_from('<H', data, offset_map['stat_atk'])[0]
-    stat_def = struct.unpack_from('<H', data, offset_map['stat_def'])[0]
-    stat_spe = struct.unpack_from('<H', data, offset_map['stat_spe'])[0]
-    stat_spa = struct.unpack_from('<H', data, offset_map['stat_spa'])[0]
-    stat_spd = struct.unpack_from('<H', data, offset_map['stat_spd'])[0]
+    result['is_egg'] = ((iv32 >> 30) & 1) == 1
+    result['is_nicknamed'] = ((iv32 >> 31) & 1) == 1
     
     result['stats'] = {
-        'hp_current': stat_hp_current,
-        'hp_max': stat_hp_max,
-        'atk': stat_atk,
-        'def': stat_def,
-        'spa': stat_spa,
-        'spd': stat_spd,
-        'spe': stat_spe
+        'hp_current': v['stat_hp_current'],
+        'hp_max': v['stat_hp_max'],
+        'atk': v['stat_atk'],
+        'def': v['stat_def'],
+        'spa': v['stat_spa'],
+        'spd': v['stat_spd'],
+        'spe': v['stat_spe'],
     }
     
-    # 相遇信息
-    met_year = data[offset_map['met_year']]
-    met_month = data[offset_map['met_month']]
-    met_day = data[offset_map['met_day']]
-    met_location = struct.unpack_from('<H', data, offset_map['met_location'])[0]
+    result['met_date'] = (2000 + v['met_year'], v['met_month'], v['met_day'])
+    result['met_location'] = v['met_location']
     
-    result['met_date'] = (2000 + met_year, met_month, met_day)
-    result['met_location'] = met_location
+    result['shiny'] = is_shiny(v['pid'], v['tid16'], v['sid16'])
+    result['pid'] = v['pid']
+    result['tid16'] = v['tid16']
+    result['sid16'] = v['sid16']
     
-    # 是否闪光
-    pid = struct.unpack_from('<I', data, offset_map['pid'])[0]
-    tid16 = struct.unpack_from('<H', data, offset_map['tid16'])[0]
-    sid16 = struct.unpack_from('<H', data, offset_map['sid16'])[0]
-    shiny = is_shiny(pid, tid16, sid16)
+    return result
+
+
+def parse_pk8_to_dict(data, encrypted=False):
+    """解析PK8数据并返回字典
     
-    result['shiny'] = shiny
-    result['pid'] = pid
-    result['tid16'] = tid16
-    result['sid16'] = sid16
+    Args:
+        data: 宝可梦数据
+        encrypted: 是否为加密数据，如果是则先解密
+    """
+    # 如果数据是加密的，先解密
+    if encrypted:
+        data = decrypt_pokemon_data(data)
     
-    return result
+    return _pk8_values_to_dict(PK8_STRUCT.unpack_from(data))
+
+
+class PK8Columns:
+    """整盒宝可梦的列式解码结果
+
+    用PK8_STRUCT一次性解包所有槽位，每个字段保存为一列（数值列使用array），
+    便于对整盒数据做筛选和统计；只有调用to_dict时才生成单只宝可梦的字典。
+    """
+    def __init__(self, data, slot_size=0x158):
+        """
+        Args:
+            data: 已解密并重排的连续宝可梦数据（如decrypt_pokemon_batch的结果拼接）
+            slot_size: 每个槽位的大小
+        """
+        if slot_size != PK8_STRUCT.size:
+            raise ValueError(f"槽位大小必须为 {PK8_STRUCT.size} 字节")
+        count = len(data) // slot_size
+        rows = list(PK8_STRUCT.iter_unpack(bytes(data[:count * slot_size])))
+        self.count = count
+        self.columns = {}
+        for i, name in enumerate(PK8_FIELDS):
+            code = _pk8_field_formats[name]
+            values = [row[i] for row in rows]
+            self.columns[name] = values if code.endswith('s') else array(code, values)
+        self._rows = rows
+
+    @classmethod
+    def from_encrypted(cls, data, slot_size=0x158):
+        """从加密的KBox/KParty数据构建"""
+        decrypted = shuffle_batch(crypt_pkm_batch(data, slot_size, 0x50), slot_size, 0x50)
+        return cls(decrypted, slot_size)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def iv_column(self, stat):
+        """单项个体值列，stat为hp/atk/def/spe/spa/spd"""
+        shift = {'hp': 0, 'atk': 5, 'def': 10, 'spe': 15, 'spa': 20, 'spd': 25}[stat]
+        return array('B', [(iv32 >> shift) & 0x1F for iv32 in self.columns['iv32']])
+
+    def iv_total_column(self):
+        """个体值总和列"""
+        return array('H', [sum((iv32 >> shift) & 0x1F for shift in (0, 5, 10, 15, 20, 25))
+                           for iv32 in self.columns['iv32']])
+
+    def shiny_column(self):
+        """是否闪光列"""
+        return [is_shiny(pid, tid16, sid16) for pid, tid16, sid16
+                in zip(self.columns['pid'], self.columns['tid16'], self.columns['sid16'])]
+
+    def occupied(self):
+        """EC不为0（非空）的槽位编号"""
+        return [i for i, ec in enumerate(self.columns['ec']) if ec != 0]
+
+    def to_dict(self, index):
+        """生成与parse_pk8_to_dict相同格式的字典"""
+        return _pk8_values_to_dict(self._rows[index])
+
+
+# 校验和覆盖的存储区域 [8, 0x148)，即4个数据块
+PK8_CHECKSUM_OFFSET = 0x06
+PK8_STORED_SIZE = 0x148
+# 性格修正（薄荷）偏移量，修改性格时同步写入，否则游戏中的能力计算不变
+PK8_STAT_NATURE_OFFSET = 0x21
+# 昵称最多12个字符，末尾保留0x0000结束符
+PK8_NICKNAME_MAX_LENGTH = 12
+
+_iv_shifts = {'hp': 0, 'atk': 5, 'def': 10, 'spe': 15, 'spa': 20, 'spd': 25}
+_checksum_struct = struct.Struct(f'<{(PK8_STORED_SIZE - 8) // 2}H')
+
+def compute_pk8_checksum(data, offset=0):
+    """计算PK8校验和：[8, 0x148)区域按16位小端求和（与数据块顺序无关）"""
+    return sum(_checksum_struct.unpack_from(data, offset + 8)) & 0xFFFF
+
+def update_pk8_checksum(data, offset=0):
+    """重新计算并写回0x06处的校验和，返回新的校验和"""
+    checksum = compute_pk8_checksum(data, offset)
+    struct.pack_into('<H', data, offset + PK8_CHECKSUM_OFFSET, checksum)
+    return checksum
+
+def _pack_field(data, offset, name, value):
+    struct.pack_into('<' + _pk8_field_formats[name], data, offset + offset_map[name], value)
+
+def apply_pk8_edits(data, edits, offset=0):
+    """在已解密重排的数据上就地修改字段（不更新校验和）
+
+    Args:
+        data: 可写的缓冲区（bytearray），可以是整盒数据
+        edits: 修改字典，支持的键：
+            held_item/nature/level/friendship/ability/ability_num等offset_map中的数值字段，
+            moves（{'move1': ...} 或长度不超过4的列表），
+            evs/ivs（{'hp': ..., 'atk': ...}，可只给部分项），
+            nickname（字符串，同时设置已取昵称标志）
+        offset: 该宝可梦在缓冲区中的起始偏移量
+    """
+    for name, value in edits.items():
+        if name == 'moves':
+            if not isinstance(value, dict):
+                value = {f'move{i + 1}': move for i, move in enumerate(value)}
+            for move_name, move in value.items():
+                if move_name not in ('move1', 'move2', 'move3', 'move4'):
+                    raise KeyError(f"未知的招式位置: {move_name}")
+                _pack_field(data, offset, move_name, move)
+        elif name == 'evs':
+            for stat, ev in value.items():
+                if not 0 <= ev <= 252:
+                    raise ValueError(f"努力值超出范围: {stat}={ev}")
+                _pack_field(data, offset, f'ev_{stat}', ev)
+        elif name == 'ivs':
+            iv_offset = offset + offset_map['iv32']
+            iv32 = struct.unpack_from('<I', data, iv_offset)[0]
+            for stat, iv in value.items():
+                if not 0 <= iv <= 31:
+                    raise ValueError(f"个体值超出范围: {stat}={iv}")
+                shift = _iv_shifts[stat]
+                iv32 = (iv32 & ~(0x1F << shift)) | (iv << shift)
+            # 保留最高两位的蛋/昵称标志
+            struct.pack_into('<I', data, iv_offset, iv32 & 0xFFFFFFFF)
+        elif name == 'nickname':
+            if len(value) > PK8_NICKNAME_MAX_LENGTH:
+                raise ValueError(f"昵称最多 {PK8_NICKNAME_MAX_LENGTH} 个字符: {value}")
+            encoded = value.encode('utf-16le').ljust(struct.calcsize(_pk8_field_formats['nickname']), b'\x00')
+            _pack_field(data, offset, 'nickname', encoded)
+            # 同时设置IV32最高位的昵称标志，否则解析结果仍为is_nicknamed=False
+            iv_offset = offset + offset_map['iv32']
+            iv32 = struct.unpack_from('<I', data, iv_offset)[0]
+            struct.pack_into('<I', data, iv_offset, iv32 | 0x80000000)
+        elif name == 'nature':
+            _pack_field(data, offset, 'nature', value)
+            data[offset + PK8_STAT_NATURE_OFFSET] = value
+        elif name == 'ability_num':
+            # 只修改低3位，其余位保持不变
+            pos = offset + offset_map['ability_num']
+            data[pos] = (data[pos] & ~0x7) | (value & 0x7)
+        elif name in offset_map and name != 'iv32':
+            _pack_field(data, offset, name, value)
+        else:
+            raise KeyError(f"不支持修改的字段: {name}")
+
+def encrypt_pokemon_data(data):
+    """decrypt_pokemon_data的逆操作：更新校验和、逆重排并加密，返回新的bytearray"""
+    if len(data) < PK8_STORED_SIZE:
+        return data
+    encrypted = bytearray(data)
+    update_pk8_checksum(encrypted)
+    ec = struct.unpack_from('<I', encrypted, 0)[0]
+    encrypted = unshuffle_array(encrypted, (ec >> 13) & 31, 0x50)
+    crypt_pkm(encrypted, ec, 0x50)
+    return encrypted
+
+def encrypt_pokemon_batch(buffer, slot_size=0x158):
+    """decrypt_pokemon_batch的逆操作：对已解密重排的连续数据整体逆重排并加密
+
+    不修改校验和，需要时先对修改过的槽位调用update_pk8_checksum。
+    """
+    return crypt_pkm_batch(shuffle_batch(buffer, slot_size, 0x50, inverse=True), slot_size, 0x50)
+
+def edit_pokemon_batch(buffer, edits, slot_size=0x158, encrypted=True):
+    """批量修改连续存放的宝可梦（整个KBox或KParty），返回修改后的新数据
+
+    整个缓冲区只解密和加密各一次；只有被修改的槽位会重新计算校验和，
+    其余槽位逐字节保持不变。EC为0的空槽位会被跳过。
+
+    Args:
+        buffer: KBox/KParty数据
+        edits: {槽位编号: 修改字典}，修改字典格式见apply_pk8_edits；
+               也可以直接传入一个修改字典，表示应用到所有非空槽位（如清空全部持有物）
+        slot_size: 每个槽位的大小
+        encrypted: 输入数据是否加密，输出与输入保持同样的状态
+    """
+    slot_count = len(buffer) // slot_size
+    if edits and all(isinstance(slot, str) for slot in edits):
+        edits = dict.fromkeys(range(slot_count), edits)
+
+    data = shuffle_batch(crypt_pkm_batch(buffer, slot_size, 0x50), slot_size, 0x50) if encrypted else bytearray(buffer)
+    for slot, slot_edits in edits.items():
+        if not 0 <= slot < slot_count:
+            raise IndexError(f"槽位编号超出范围: {slot}")
+        offset = slot * slot_size
+        if not slot_edits or struct.unpack_from('<I', data, offset)[0] == 0:
+            continue
+        apply_pk8_edits(data, slot_edits, offset)
+        update_pk8_checksum(data, offset)
+
+    return encrypt_pokemon_batch(data, slot_size) if encrypted else bytes(data)
+
+
+class PK8SlotCache:
+    """按槽位缓存解析结果，刷新时只重新解析密文发生变化的槽位
+
+    缓存键为（槽位编号，EC，该槽位0x158字节密文的摘要），
+    在游戏中只移动了少数宝可梦时，其余槽位直接复用上次的解析结果。
+    返回的字典会在多次刷新之间共享，调用方需要添加或修改字段时应先复制（dict(record)）。
+    """
+    def __init__(self, slot_size=0x158):
+        self.slot_size = slot_size
+        self._entries = {}  # 槽位编号 -> (EC, 密文摘要, 是否加密, 解析结果)
+        self.last_parsed = 0
+
+    def clear(self):
+        self._entries.clear()
+        self.last_parsed = 0
+
+    def parse(self, buffer, encrypted=True):
+        """解析所有槽位，返回与槽位一一对应的列表（空槽位为None）"""
+        slot_count = len(buffer) // self.slot_size
+        self.trim(slot_count)
+        return self.parse_slots(buffer, 0, slot_count, encrypted)
+
+    def trim(self, slot_count):
+        """丢弃编号不小于slot_count的槽位缓存（数据变短时调用）"""
+        for slot in list(self._entries):
+            if slot >= slot_count:
+                del self._entries[slot]
+
+    def parse_slots(self, buffer, start, stop, encrypted=True):
+        """只解析buffer中[start, stop)范围的槽位，返回该范围内与槽位一一对应的列表
+
+        buffer为完整数据（如整个KBox），槽位编号与parse一致，可以逐个盒子调用。
+        """
+        slot_size = self.slot_size
+        view = memoryview(buffer)
+        records = [None] * (stop - start)
+        changed = []
+        for slot in range(start, stop):
+            offset = slot * slot_size
+            ec = struct.unpack_from('<I', buffer, offset)[0]
+            if ec == 0:
+                self._entries.pop(slot, None)
+                continue
+            digest = hashlib.blake2b(view[offset:offset + slot_size], digest_size=16).digest()
+            entry = self._entries.get(slot)
+            if entry is not None and entry[0] == ec and entry[1] == digest and entry[2] == encrypted:
+                records[slot - start] = entry[3]
+            else:
+                changed.append((slot, ec, digest))
+
+        # 变化的槽位拼接后一次性批量解密解析
+        if changed:
+            data = b''.join(view[slot * slot_size:(slot + 1) * slot_size] for slot, _, _ in changed)
+            columns = PK8Columns.from_encrypted(data, slot_size) if encrypted else PK8Columns(data, slot_size)
+            for i, (slot, ec, digest) in enumerate(changed):
+                record = columns.to_dict(i)
+                records[slot - start] = record
+                self._entries[slot] = (ec, digest, encrypted, record)
+        self.last_parsed = len(changed)
+        return records
+
+# 未指定workers时，槽位数不少于此值才自动并行解码：进程池启动和结果回传的开销
+# 远大于解码本身（单个KBox的960个槽位：批量约22ms，2进程并行约55ms），
+# 所以单个存档默认串行；调用方显式传入workers时不受此限制
+PARALLEL_DECODE_MIN_SLOTS = 10000
+
+def _decode_box_shard(shm_name, start, end, encrypted, slot_size):
+    """子进程中解码共享内存里的一段槽位，返回每个槽位的字典（空槽位为None）"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        data = bytes(shm.buf[start:end])
+    finally:
+        shm.close()
+    columns = PK8Columns.from_encrypted(data, slot_size) if encrypted else PK8Columns(data, slot_size)
+    return [columns.to_dict(i) if ec != 0 else None for i, ec in enumerate(columns['ec'])]
+
+def iter_decode_box_parallel(kbox_data, encrypted=True, workers=None, slot_size=0x158, slots_per_box=30):
+    """按盒子分片，在进程池中并行解码整个KBox
+
+    KBox数据只复制一次到共享内存，每个任务只传递共享内存名称和分片范围，
+    不会为每个任务序列化整个缓冲区。按盒子顺序逐个产出该盒子的解析结果（列表，空槽位为None）。
+    程序入口（main.py、Pokemon.py）已调用multiprocessing.freeze_support()，
+    Windows打包版本的子进程不会重新启动界面。
+
+    Args:
+        kbox_data: KBox数据
+        encrypted: 数据是否加密
+        workers: 进程数，None表示使用CPU核心数
+        slot_size: 每个槽位的大小
+        slots_per_box: 每个盒子的槽位数
+    """
+    slot_count = len(kbox_data) // slot_size
+    if slot_count == 0:
+        return
+    shard_size = slots_per_box * slot_size
+    shm = shared_memory.SharedMemory(create=True, size=slot_count * slot_size)
+    try:
+        shm.buf[:slot_count * slot_size] = kbox_data[:slot_count * slot_size]
+        starts = range(0, slot_count * slot_size, shard_size)
+        ends = [min(start + shard_size, slot_count * slot_size) for start in starts]
+        count = len(starts)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # executor.map按提交顺序返回结果，合并顺序与盒子顺序一致
+            shards = executor.map(_decode_box_shard, [shm.name] * count, starts, ends,
+                                  [encrypted] * count, [slot_size] * count)
+            for shard in shards:
+                yield shard
+    finally:
+        shm.close()
+        shm.unlink()
+
+def decode_box_parallel(kbox_data, encrypted=True, workers=None, slot_size=0x158, slots_per_box=30):
+    """并行解码整个KBox，结果按盒子顺序合并，与PK8SlotCache.parse的返回格式相同
+
+    参数见iter_decode_box_parallel。
+    """
+    return [record for shard in iter_decode_box_parallel(kbox_data, encrypted, workers, slot_size, slots_per_box)
+            for record in shard]
+
+# 存档刷新时复用的默认缓存
+party_slot_cache = PK8SlotCache()
+box_slot_cache = PK8SlotCache()
+
+
+# .pk8为解密后的数据，.ek8为加密数据；文件可以是存储大小(0x148)或带队伍能力值的0x158
+PK8_FILE_EXTENSIONS = {'.pk8': False, '.ek8': True}
+PK8_PARTY_SIZE = 0x158
+PK8_FILE_SIZES = (PK8_STORED_SIZE, PK8_PARTY_SIZE)
+
+def find_pk8_files(root, recursive=True):
+    """列出目录下所有.pk8/.ek8文件，按路径排序保证结果稳定"""
+    found = []
+    pending = [root]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in PK8_FILE_EXTENSIONS:
+                    found.append(entry.path)
+    found.sort()
+    return found
+
+
+class PK8Library:
+    """批量导入的.pk8/.ek8文件集合
+
+    所有文件解密后统一补齐为0x158字节连续存放，并生成一份PK8Columns列式索引；
+    按(EC, PID)去重，重复的文件只保留排序后的第一个。
+    """
+    def __init__(self, data, paths, sizes, duplicates=None):
+        """
+        Args:
+            data: 已解密重排、每条0x158字节的连续数据
+            paths: 每条记录的来源文件路径
+            sizes: 每条记录的原始文件大小（0x148或0x158）
+            duplicates: 因重复被跳过的文件 [(文件路径, 保留的文件路径), ...]
+        """
+        self.data = bytes(data)
+        self.paths = list(paths)
+        self.sizes = list(sizes)
+        self.duplicates = duplicates or []
+        self.columns = PK8Columns(self.data, PK8_PARTY_SIZE)
+
+    @classmethod
+    def from_directory(cls, root, recursive=True):
+        """扫描目录并批量导入，无法识别大小的文件会被跳过"""
+        # 按(是否加密, 文件大小)分组，每组拼接后只解密一次
+        groups = defaultdict(list)
+        for path in find_pk8_files(root, recursive):
+            with open(path, 'rb') as f:
+                raw = f.read()
+            if len(raw) not in PK8_FILE_SIZES:
+                print(f"警告: 跳过大小不正确的文件 {path} ({len(raw)} 字节)")
+                continue
+            encrypted = PK8_FILE_EXTENSIONS[os.path.splitext(path)[1].lower()]
+            groups[(encrypted, len(raw))].append((path, raw))
+
+        decoded = []
+        for (encrypted, size), files in groups.items():
+            buffer = b''.join(raw for _, raw in files)
+            if encrypted:
+                buffer = shuffle_batch(crypt_pkm_batch(buffer, size, 0x50), size, 0x50)
+            padding = bytes(PK8_PARTY_SIZE - size)
+            for i, (path, _) in enumerate(files):
+                decoded.append((path, size, buffer[i * size:(i + 1) * size] + padding))
+        decoded.sort(key=lambda item: item[0])
+
+        seen = {}
+        paths, sizes, records, duplicates = [], [], [], []
+        for path, size, record in decoded:
+            key = struct.unpack_from('<I', record, 0)[0], struct.unpack_from('<I', record, offset_map['pid'])[0]
+            if key in seen:
+                duplicates.append((path, seen[key]))
+                continue
+            seen[key] = path
+            paths.append(path)
+            sizes.append(size)
+            records.append(record)
+        return cls(b''.join(records), paths, sizes, duplicates)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def record(self, index):
+        """第index条记录的解密数据（保持原始文件大小）"""
+        offset = index * PK8_PARTY_SIZE
+        return self.data[offset:offset + self.sizes[index]]
+
+    def to_dict(self, index):
+        """生成与parse_pk8_to_dict相同格式的字典，并附带来源路径"""
+        result = self.columns.to_dict(index)
+        result['ec'] = self.columns['ec'][index]
+        result['path'] = self.paths[index]
+        return result
+
+    def export(self, output_dir, encrypted=False, indices=None):
+        """把记录导出为单独的文件
+
+        Args:
+            output_dir: 输出目录
+            encrypted: True导出为加密的.ek8，否则为.pk8
+            indices: 要导出的记录编号，默认全部
+
+        Returns:
+            写入的文件路径列表
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        if indices is None:
+            indices = range(len(self))
+        extension = '.ek8' if encrypted else '.pk8'
+        data = self.data
+        if encrypted:
+            # 整体更新校验和并批量加密；存储大小的记录截断后与单独加密结果相同
+            buffer = bytearray(data)
+            for index in indices:
+                update_pk8_checksum(buffer, index * PK8_PARTY_SIZE)
+            data = encrypt_pokemon_batch(buffer, PK8_PARTY_SIZE)
+        written = []
+        for index in indices:
+            offset = index * PK8_PARTY_SIZE
+            record = data[offset:offset + self.sizes[index]]
+            name = f"{self.columns['species'][index]:04d} - {self.columns['ec'][index]:08X}{self.columns['pid'][index]:08X}{extension}"
+            path = os.path.join(output_dir, name)
+            with open(path, 'wb') as f:
+                f.write(record)
+            written.append(path)
+        return written
 
 
 def analyze_kbox_data(kbox_path, encrypted=True):
@@ -502,12 +1042,13 @@ def analyze_kparty_data(kparty_path, target_ec=0xAB62D4EB, encrypted=True):
     
     return results
 
-def generate_party_json_from_data(kparty_data, encrypted=True):
+def generate_party_json_from_data(kparty_data, encrypted=True, cache=None):
     """生成队伍宝可梦的JSON数据
     
     Args:
         kparty_data: KParty数据（bytes对象）
         encrypted: 数据是否加密
+        cache: 槽位缓存（PK8SlotCache），默认使用party_slot_cache
         
     Returns:
         包含队伍宝可梦数据的字典
@@ -520,6 +1061,10 @@ def generate_party_json_from_data(kparty_data, encrypted=True):
     # 使用偏移量0作为起始位置
     party_data = {}
     first_pokemon_offset = 0
+    
+    # 只重新解析内容发生变化的槽位
+    party_count = min(6, len(kparty_data) // pokemon_size)
+    records = (cache or party_slot_cache).parse(kparty_data[:party_count * pokemon_size], encrypted)
     # print(f"使用第一只宝可梦偏移量: 0x{first_pokemon_offset:X}")
     
     # 队伍中最多有6只宝可梦
@@ -542,8 +1087,8 @@ def generate_party_json_from_data(kparty_data, encrypted=True):
             party_data[str(i+1)] = None
             continue
         
-        # 解析宝可梦数据
-        result = parse_pk8_to_dict(pokemon_data, encrypted=encrypted)
+        # 解析宝可梦数据（缓存中的字典在多次刷新间共享，先复制再添加位置信息）
+        result = dict(records[i])
         result['index'] = i  # 添加索引
         result['offset'] = offset  # 添加偏移量
         result['ec'] = current_ec  # 添加EC值
@@ -574,15 +1119,18 @@ def generate_party_json_from_data(kparty_data, encrypted=True):
     return party_data
 
 
-def generate_box_json_from_data(kbox_data, encrypted=True):
-    """生成盒子宝可梦的JSON数据
+def iter_box_json_from_data(kbox_data, encrypted=True, cache=None, workers=None):
+    """逐个盒子生成盒子宝可梦的JSON数据，供流式写入使用
     
     Args:
         kbox_data: KBox数据（bytes对象）
         encrypted: 数据是否加密
+        cache: 槽位缓存（PK8SlotCache），默认使用box_slot_cache
+        workers: 大于1时按盒子分片并行解码（不使用槽位缓存）；
+                 为None时只在槽位数不少于PARALLEL_DECODE_MIN_SLOTS时按CPU核心数并行，否则串行
         
-    Returns:
-        包含盒子宝可梦数据的字典
+    Yields:
+        (盒子名称, 该盒子30个位置的字典)，按盒子顺序依次产出
     """
     print(f"KBox数据大小: {len(kbox_data)}字节")
     
@@ -597,12 +1145,29 @@ def generate_box_json_from_data(kbox_data, encrypted=True):
     box_count = 32
     pokemon_per_box = 30
     
-    box_data = {}
+    slot_cache = None
+    shards = None
+    if workers is None and pokemon_count >= PARALLEL_DECODE_MIN_SLOTS:
+        workers = os.cpu_count()
+    if workers and workers > 1:
+        shards = iter_decode_box_parallel(kbox_data, encrypted, workers, pokemon_size, pokemon_per_box)
+    else:
+        # 只重新解析内容发生变化的槽位
+        slot_cache = cache or box_slot_cache
+        slot_cache.trim(pokemon_count)
+    reparsed = 0
     
-    # 处理每个盒子
+    # 处理每个盒子：每次只解码当前盒子的30个槽位
     for box_idx in range(box_count):
         box_name = f"box{box_idx+1}"
-        box_data[box_name] = {}
+        box = {}
+        box_start = min(box_idx * pokemon_per_box, pokemon_count)
+        box_stop = min(box_start + pokemon_per_box, pokemon_count)
+        if slot_cache is not None:
+            box_records = slot_cache.parse_slots(kbox_data, box_start, box_stop, encrypted)
+            reparsed += slot_cache.last_parsed
+        else:
+            box_records = next(shards, []) if box_start < box_stop else []
         
         # 处理盒子中的每个位置
         for slot_idx in range(pokemon_per_box):
@@ -610,7 +1175,7 @@ def generate_box_json_from_data(kbox_data, encrypted=True):
             
             # 如果超出宝可梦总数，该位置为空
             if global_idx >= pokemon_count:
-                box_data[box_name][str(slot_idx+1)] = None
+                box[str(slot_idx+1)] = None
                 continue
             
             offset = global_idx * pokemon_size
@@ -622,11 +1187,11 @@ def generate_box_json_from_data(kbox_data, encrypted=True):
             
             # 如果EC为0，表示该位置为空
             if current_ec == 0:
-                box_data[box_name][str(slot_idx+1)] = None
+                box[str(slot_idx+1)] = None
                 continue
             
-            # 解析宝可梦数据
-            result = parse_pk8_to_dict(pokemon_data, encrypted=encrypted)
+            # 解析宝可梦数据（缓存中的字典在多次刷新间共享，先复制再添加位置信息）
+            result = dict(box_records[global_idx - box_start])
             result['index'] = global_idx  # 添加索引
             result['offset'] = offset  # 添加偏移量
             result['ec'] = current_ec  # 添加EC值
@@ -645,7 +1210,7 @@ def generate_box_json_from_data(kbox_data, encrypted=True):
                     print(f"转换nickname时出错: {e}")
                     result['nickname'] = str(nickname_bytes)
             
-            box_data[box_name][str(slot_idx+1)] = result
+            box[str(slot_idx+1)] = result
             
             # # 打印关键信息
             # print(f"  物种={result['species']}, 等级={result['level']}, "
@@ -653,8 +1218,26 @@ def generate_box_json_from_data(kbox_data, encrypted=True):
             #       f"持有物={result['held_item']}, 性格={result['nature_value']}, "
             #       f"IVs: HP={result['ivs']['hp']}, ATK={result['ivs']['atk']}, DEF={result['ivs']['def']}, "
             #       f"SPA={result['ivs']['spa']}, SPD={result['ivs']['spd']}, SPE={result['ivs']['spe']}")
+        
+        yield box_name, box
     
-    return box_data
+    if slot_cache is not None:
+        print(f"重新解析了 {reparsed} 个槽位")
+
+
+def generate_box_json_from_data(kbox_data, encrypted=True, cache=None, workers=None):
+    """生成盒子宝可梦的JSON数据
+    
+    Args:
+        kbox_data: KBox数据（bytes对象）
+        encrypted: 数据是否加密
+        cache: 槽位缓存（PK8SlotCache），默认使用box_slot_cache
+        workers: 并行解码的进程数，见iter_box_json_from_data
+        
+    Returns:
+        包含盒子宝可梦数据的字典
+    """
+    return dict(iter_box_json_from_data(kbox_data, encrypted, cache, workers))
 
 
 def generate_party_json(kparty_path, encrypted=True):
@@ -691,6 +1274,100 @@ def generate_box_json(kbox_path, encrypted=True):
     return generate_box_json_from_data(kbox_data, encrypted)
 
 
+def write_main_info_json_stream(party_data, boxes, output_file, indent=4):
+    """流式写入pokemon_main_info.json
+    
+    每个盒子生成后立即序列化并写入临时文件，全部写完后原子替换目标文件，
+    中途出错时原文件保持不变。输出与json.dump(..., ensure_ascii=False, indent=indent)逐字节一致。
+    
+    Args:
+        party_data: 队伍数据字典
+        boxes: 可迭代的(盒子名称, 盒子字典)，如iter_box_json_from_data的结果
+        output_file: 输出JSON文件路径
+        indent: 缩进空格数
+    """
+    pad = ' ' * indent
+    
+    def dump(value, level):
+        # JSON字符串中的换行会被转义，直接替换换行即可整体缩进
+        return json.dumps(value, ensure_ascii=False, indent=indent).replace('\n', '\n' + pad * level)
+    
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = output_file + '.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write('{\n' + pad + '"party": ' + dump(party_data, 1) + ',\n' + pad + '"box": {')
+            first = True
+            for box_name, box in boxes:
+                f.write(('\n' if first else ',\n') + pad * 2 + dump(box_name, 2) + ': ' + dump(box, 2))
+                f.flush()
+                first = False
+            f.write(('}' if first else '\n' + pad + '}') + '\n}')
+        os.replace(temp_path, output_file)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _save_main_info(party_data, boxes, output_file, write_json=True, return_data=True):
+    """流式写出JSON（可选）并写入二进制快照，返回组合后的数据
+    
+    盒子逐个从boxes取出，写入JSON并追加到快照后即可释放；
+    只有return_data为True时才保留全部盒子用于返回。
+    
+    Args:
+        party_data: 队伍数据字典
+        boxes: 可迭代的(盒子名称, 盒子字典)
+        output_file: 输出JSON文件名
+        write_json: 是否导出JSON文件
+        return_data: 是否返回组合后的数据，为False时返回None
+    """
+    box_data = {}
+    snapshot = SnapshotWriter() if SnapshotWriter else None
+    if snapshot:
+        snapshot.add_party(party_data)
+    
+    def collect():
+        for box_name, box in boxes:
+            if snapshot:
+                snapshot.add_box(box)
+            if return_data:
+                box_data[box_name] = box
+            yield box_name, box
+    
+    if get_config_dir:
+        # 与safe_save_file一致：写入配置目录，缩进为2
+        json_path = os.path.join(get_config_dir(), os.path.basename(output_file))
+        indent = 2
+    else:
+        json_path = output_file
+        indent = 4
+    
+    if write_json:
+        write_main_info_json_stream(party_data, collect(), json_path, indent=indent)
+        print(f"\n=== 已生成 {json_path} 文件 ===")
+    else:
+        for _ in collect():
+            pass
+    
+    # 快照在JSON之后写入，读取方据修改时间判断快照是否比JSON新；
+    # 快照与实际写入的JSON同目录同名，读取方按JSON路径找到对应的快照
+    if snapshot:
+        snapshot_path = get_snapshot_path(json_path)
+        snapshot.write(snapshot_path)
+        print(f"\n=== 已生成 {snapshot_path} 文件 ===")
+    
+    if not return_data:
+        return None
+    return {
+        "party": party_data,
+        "box": box_data
+    }
+
+
 def generate_pokemon_main_info_json(kparty_path, kbox_path, encrypted=True, output_file="config/pokemon_main_info.json"):
     """生成包含队伍和盒子宝可梦信息的JSON文件
     
@@ -703,70 +1380,40 @@ def generate_pokemon_main_info_json(kparty_path, kbox_path, encrypted=True, outp
     Returns:
         生成的JSON数据
     """
+    # 读取KBoxData.bin文件
+    with open(kbox_path, 'rb') as f:
+        kbox_data = f.read()
+    
     print("=== 生成队伍宝可梦数据 ===")
     party_data = generate_party_json(kparty_path, encrypted)
     
     print("\n=== 生成盒子宝可梦数据 ===")
-    box_data = generate_box_json(kbox_path, encrypted)
-    
-    # 组合最终数据
-    main_info = {
-        "party": party_data,
-        "box": box_data
-    }
-    
-    # 写入JSON文件
-    if safe_save_file:
-        # 确保目录存在
-        import os
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        safe_save_file(main_info, os.path.basename(output_file), ensure_config_dir=False)
-    else:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(main_info, f, ensure_ascii=False, indent=4)
-    
-    print(f"\n=== 已生成 {output_file} 文件 ===")
-    
-    return main_info
+    # 盒子数据逐个生成并立即写入文件
+    return _save_main_info(party_data, iter_box_json_from_data(kbox_data, encrypted), output_file)
 
 
-def generate_pokemon_main_info_json_from_data(kparty_data, kbox_data, encrypted=True, output_file="config/pokemon_main_info.json"):
+def generate_pokemon_main_info_json_from_data(kparty_data, kbox_data, encrypted=True, output_file="config/pokemon_main_info.json", write_json=True, return_data=True):
     """生成包含队伍和盒子宝可梦信息的JSON文件
     
+    同时在JSON旁写入同名的二进制快照（如pokemon_main_info.bin），读取方优先使用快照。
+    
     Args:
         kparty_data: KParty数据（bytes对象）
         kbox_data: KBox数据（bytes对象）
         encrypted: 数据是否加密
         output_file: 输出JSON文件名
+        write_json: 是否同时导出JSON文件
+        return_data: 是否返回生成的数据；只需要写文件时传False，盒子写出后即释放
         
     Returns:
-        生成的JSON数据
+        生成的JSON数据，return_data为False时返回None
     """
     print("=== 生成队伍宝可梦数据 ===")
     party_data = generate_party_json_from_data(kparty_data, encrypted)
     
     print("\n=== 生成盒子宝可梦数据 ===")
-    box_data = generate_box_json_from_data(kbox_data, encrypted)
-    
-    # 组合最终数据
-    main_info = {
-        "party": party_data,
-        "box": box_data
-    }
-    
-    # 写入JSON文件
-    if safe_save_file:
-        # 确保目录存在
-        import os
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        safe_save_file(main_info, os.path.basename(output_file), ensure_config_dir=False)
-    else:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(main_info, f, ensure_ascii=False, indent=4)
-    
-    print(f"\n=== 已生成 {output_file} 文件 ===")
-    
-    return main_info
+    # 盒子数据逐个生成并立即写入文件
+    return _save_main_info(party_data, iter_box_json_from_data(kbox_data, encrypted), output_file, write_json, return_data)
 
 
 if __name__ == '__main__':
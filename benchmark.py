@@ -0,0 +1,366 @@
+import os
+import random
+import struct
+import tempfile
+import time
+
+import analyze_pk8
+import type_exclusive_function
+from trainer_poke_corpus import TrainerPokeCorpus, TRAINER_POKE_RECORD_SIZE, POKEMON_ID_OFFSET
+from decrypt_main import SCBlock, SCBlockIndex, SCXorShift32, SwishCrypto, DecryptStats, KBOX_KEY, KPARTY_KEY
+
+# 真实main存档大小约1.5MB
+SYNTHETIC_SAVE_SIZE = 1_573_536
+# KBox块的数据大小
+KBOX_SIZE = 330240
+
+
+def _time_call(func, repeat=3):
+    """执行若干次并返回最短耗时（秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _legacy_crypt_static_xorpad_bytes(crypto, data):
+    """旧版逐字节实现，仅用于对比"""
+    data_region_len = len(data) - crypto.hash_size if len(data) > crypto.hash_size else len(data)
+    for i in range(data_region_len):
+        data[i] ^= crypto.static_xorpad[i % len(crypto.static_xorpad)]
+
+
+def bench_static_xorpad(size=SYNTHETIC_SAVE_SIZE):
+    """对比StaticXorpad新旧实现在合成存档上的耗时"""
+    crypto = SwishCrypto()
+    source = os.urandom(size)
+
+    legacy_buf = bytearray(source)
+    fast_buf = bytearray(source)
+    _legacy_crypt_static_xorpad_bytes(crypto, legacy_buf)
+    crypto.crypt_static_xorpad_bytes(fast_buf)
+    if legacy_buf != fast_buf:
+        raise AssertionError("StaticXorpad新旧实现结果不一致")
+
+    legacy = _time_call(lambda: _legacy_crypt_static_xorpad_bytes(crypto, bytearray(source)), repeat=1)
+    fast = _time_call(lambda: crypto.crypt_static_xorpad_bytes(bytearray(source)))
+
+    print(f"StaticXorpad ({size} 字节):")
+    print(f"  旧版逐字节: {legacy * 1000:.1f} ms")
+    print(f"  整块异或:   {fast * 1000:.1f} ms  (加速 {legacy / fast:.0f}x)")
+
+
+def bench_keystream(size=KBOX_SIZE, key=0x0D66012C):
+    """对比SCBlock载荷逐字节解密与批量密钥流解密的耗时"""
+    payload = os.urandom(size)
+
+    def legacy():
+        rng = SCXorShift32(key)
+        arr = bytearray(payload)
+        for i in range(len(arr)):
+            arr[i] ^= rng.next()
+        return arr
+
+    def batched():
+        return SCXorShift32(key).crypt(payload)
+
+    if legacy() != batched():
+        raise AssertionError("密钥流新旧实现结果不一致")
+
+    legacy_time = _time_call(legacy, repeat=1)
+    fast_time = _time_call(batched)
+
+    print(f"XorShift32密钥流 ({size} 字节):")
+    print(f"  旧版逐字节: {legacy_time * 1000:.1f} ms")
+    print(f"  批量密钥流: {fast_time * 1000:.1f} ms  (加速 {legacy_time / fast_time:.0f}x)")
+
+
+def build_synthetic_save(block_count=5184, seed=0):
+    """构造一个结构与real main相近的合成存档（含KBox/KParty块）"""
+    rng = random.Random(seed)
+    scalar_types = ["Byte", "UInt16", "UInt32", "UInt64", "Int32", "Single", "Double"]
+    blocks = {}
+    for i in range(block_count):
+        key = rng.getrandbits(32)
+        if key in (KBOX_KEY, KPARTY_KEY) or f"0x{key:08X}" in blocks:
+            continue
+        kind = rng.random()
+        if kind < 0.2:
+            block = SCBlock(key, rng.choice(["Bool1", "Bool2"]))
+        elif kind < 0.6:
+            type_name = rng.choice(scalar_types)
+            size = SCBlock.get_type_size(SCBlock.get_type_code(type_name))
+            block = SCBlock(key, type_name, os.urandom(size))
+        elif kind < 0.8:
+            block = SCBlock(key, "Array", os.urandom(4 * rng.randint(1, 64)), "UInt32")
+        else:
+            block = SCBlock(key, "Object", os.urandom(rng.randint(1, 512)))
+        blocks[f"0x{key:08X}"] = block
+    blocks[f"0x{KBOX_KEY:08X}"] = SCBlock(KBOX_KEY, "Object", os.urandom(KBOX_SIZE))
+    blocks[f"0x{KPARTY_KEY:08X}"] = SCBlock(KPARTY_KEY, "Object", os.urandom(2068))
+    return SwishCrypto().encrypt(blocks)
+
+
+def bench_save_roundtrip():
+    """对比整份存档的解密与重新加密耗时，并确认往返结果逐字节一致"""
+    data = build_synthetic_save()
+    crypto = SwishCrypto()
+    _, blocks = crypto.decrypt(data)
+    if crypto.encrypt(blocks) != data:
+        raise AssertionError("存档解密后重新加密结果不一致")
+
+    read_time = _time_call(lambda: crypto.decrypt(data))
+    write_time = _time_call(lambda: crypto.encrypt(blocks))
+    lazy_time = _time_call(lambda: crypto.decrypt(data, lazy=True)[1][f"0x{KBOX_KEY:08X}"])
+
+    # 只修改KParty中的一个字节，对比增量写入
+    kparty = blocks[f"0x{KPARTY_KEY:08X}"]
+
+    def edit_and_write():
+        kparty.data[0x0A] ^= 0x01
+        kparty.mark_dirty()
+        return crypto.encrypt_incremental(data, blocks)
+
+    incremental_time = _time_call(edit_and_write)
+
+    print(f"整份存档 ({len(data)} 字节, {len(blocks)} 个块):")
+    print(f"  解密全部块: {read_time * 1000:.1f} ms")
+    print(f"  按需解密KBox: {lazy_time * 1000:.1f} ms")
+    print(f"  重新加密:   {write_time * 1000:.1f} ms")
+    print(f"  增量写入(改1个块): {incremental_time * 1000:.1f} ms")
+
+
+def bench_resync(corrupt_spans=8, seed=0):
+    """在损坏的存档和纯随机数据上测量块扫描（含重新同步）的耗时"""
+    rng = random.Random(seed)
+    crypto = SwishCrypto()
+    region = bytearray(build_synthetic_save())
+    crypto.crypt_static_xorpad_bytes(region)
+    del region[-crypto.hash_size:]
+    for _ in range(corrupt_spans):
+        start = rng.randrange(len(region) - 4096)
+        length = rng.randint(1, 4096)
+        region[start:start + length] = os.urandom(length)
+    damaged = bytes(region)
+    noise = os.urandom(SYNTHETIC_SAVE_SIZE)
+
+    for name, data in (("损坏存档", damaged), ("纯随机数据", noise)):
+        stats = DecryptStats()
+        start = time.perf_counter()
+        SCBlockIndex.scan(data, stats)
+        elapsed = time.perf_counter() - start
+        print(f"块扫描-{name} ({len(data)} 字节): {elapsed * 1000:.1f} ms, {stats}")
+
+
+def build_synthetic_kbox(seed=0, empty_ratio=0.3):
+    """构造960个槽位的合成KBox数据，部分槽位EC为0表示空位"""
+    rng = random.Random(seed)
+    slot_size = 0x158
+    kbox = bytearray(os.urandom(KBOX_SIZE))
+    for offset in range(0, KBOX_SIZE, slot_size):
+        if rng.random() < empty_ratio:
+            kbox[offset:offset + 4] = bytes(4)
+    return bytes(kbox)
+
+
+def bench_box_decrypt():
+    """对比逐槽位解密与批量LCG解密整个KBox的耗时"""
+    kbox = build_synthetic_kbox()
+    slot_size = 0x158
+    slots = range(0, len(kbox), slot_size)
+
+    def serial():
+        return [analyze_pk8.decrypt_pokemon_data(kbox[offset:offset + slot_size]) for offset in slots]
+
+    def batched():
+        return analyze_pk8.decrypt_pokemon_batch(kbox, slot_size)
+
+    if serial() != batched():
+        raise AssertionError("KBox批量解密结果与逐槽位解密不一致")
+
+    serial_time = _time_call(serial, repeat=1)
+    batch_time = _time_call(batched)
+
+    print(f"KBox解密 ({len(slots)} 个槽位):")
+    print(f"  逐槽位:   {serial_time * 1000:.1f} ms")
+    print(f"  批量LCG: {batch_time * 1000:.1f} ms  (加速 {serial_time / batch_time:.0f}x)")
+
+
+def build_synthetic_plain_kbox(seed=0, empty_ratio=0.3):
+    """构造已解密的合成KBox，非空槽位带有正确的校验和"""
+    rng = random.Random(seed)
+    slot_size = 0x158
+    kbox = bytearray(os.urandom(KBOX_SIZE))
+    for offset in range(0, KBOX_SIZE, slot_size):
+        if rng.random() < empty_ratio:
+            kbox[offset:offset + slot_size] = bytes(slot_size)
+        else:
+            analyze_pk8.update_pk8_checksum(kbox, offset)
+    return bytes(kbox)
+
+
+def bench_box_write():
+    """验证KBox逐槽位加密往返一致，并测量批量清空持有物的耗时"""
+    slot_size = 0x158
+    plain = build_synthetic_plain_kbox()
+    encrypted = analyze_pk8.encrypt_pokemon_batch(plain, slot_size)
+    if b"".join(analyze_pk8.decrypt_pokemon_batch(encrypted, slot_size)) != plain:
+        raise AssertionError("KBox加密后解密结果不一致")
+    if analyze_pk8.edit_pokemon_batch(encrypted, {}, slot_size) != encrypted:
+        raise AssertionError("KBox未修改时重新写入结果不一致")
+
+    strip_time = _time_call(lambda: analyze_pk8.edit_pokemon_batch(encrypted, {"held_item": 0}, slot_size))
+
+    print(f"KBox写入 ({len(plain) // slot_size} 个槽位):")
+    print(f"  清空全部持有物: {strip_time * 1000:.1f} ms")
+
+
+def bench_box_refresh():
+    """对比整盒重新解析与仅解析变化槽位（交换两只宝可梦）的耗时"""
+    slot_size = 0x158
+    kbox = build_synthetic_kbox()
+    occupied = [offset for offset in range(0, len(kbox), slot_size) if kbox[offset:offset + 4] != bytes(4)]
+    first, last = occupied[0], occupied[-1]
+    moved = bytearray(kbox)
+    moved[first:first + slot_size] = kbox[last:last + slot_size]
+    moved[last:last + slot_size] = kbox[first:first + slot_size]
+    moved = bytes(moved)
+
+    cache = analyze_pk8.PK8SlotCache(slot_size)
+
+    def full():
+        cache.clear()
+        return cache.parse(kbox)
+
+    cache.parse(kbox)
+    if cache.parse(moved) != analyze_pk8.PK8SlotCache(slot_size).parse(moved) or cache.last_parsed != 2:
+        raise AssertionError("增量解析结果与完整解析不一致")
+
+    full_time = _time_call(full)
+    # 每次计时前先恢复到交换前的缓存状态
+    refresh_time = None
+    for _ in range(3):
+        cache.parse(kbox)
+        elapsed = _time_call(lambda: cache.parse(moved), repeat=1)
+        if refresh_time is None or elapsed < refresh_time:
+            refresh_time = elapsed
+
+    print(f"KBox刷新 ({len(kbox) // slot_size} 个槽位):")
+    print(f"  完整解析: {full_time * 1000:.1f} ms")
+    print(f"  仅解析变化槽位: {refresh_time * 1000:.1f} ms")
+
+
+def bench_box_parallel(worker_counts=(2, 4)):
+    """对比整盒解码的逐槽位、批量列式和多进程并行三种方式的耗时"""
+    slot_size = 0x158
+    kbox = build_synthetic_kbox()
+    slots = range(0, len(kbox), slot_size)
+
+    def serial():
+        return [analyze_pk8.parse_pk8_to_dict(kbox[offset:offset + slot_size], encrypted=True)
+                if kbox[offset:offset + 4] != bytes(4) else None for offset in slots]
+
+    def vectorized():
+        return analyze_pk8.PK8SlotCache(slot_size).parse(kbox)
+
+    expected = vectorized()
+    if serial() != expected:
+        raise AssertionError("逐槽位解码与批量解码结果不一致")
+
+    print(f"KBox整盒解码 ({len(slots)} 个槽位, CPU核心数 {os.cpu_count()}):")
+    print(f"  逐槽位:   {_time_call(serial) * 1000:.1f} ms")
+    print(f"  批量列式: {_time_call(vectorized) * 1000:.1f} ms")
+    for workers in worker_counts:
+        def parallel():
+            return analyze_pk8.decode_box_parallel(kbox, workers=workers)
+
+        if parallel() != expected:
+            raise AssertionError("并行解码结果与批量解码不一致")
+        print(f"  {workers}进程并行: {_time_call(parallel) * 1000:.1f} ms（含进程池启动）")
+
+
+def build_synthetic_trainer_dir(directory, file_count=437, per_file=6, seed=0):
+    """在目录中生成trainer_poke_*.bin文件，宝可梦ID取自属性数据"""
+    rng = random.Random(seed)
+    species = [int(pokemon_id) for pokemon_id in type_exclusive_function.pokemon_types_data] or [25]
+    for number in range(file_count):
+        data = bytearray(rng.randbytes(TRAINER_POKE_RECORD_SIZE * per_file))
+        for row in range(per_file):
+            struct.pack_into("<H", data, row * TRAINER_POKE_RECORD_SIZE + POKEMON_ID_OFFSET, rng.choice(species))
+        with open(os.path.join(directory, f"trainer_poke_{number:03d}.bin"), "wb") as f:
+            f.write(data)
+
+
+def bench_item_sampling(draws=2622, seed=0):
+    """对比每次重新计算属性道具权重并用random.choices抽样与使用缓存别名表抽样的耗时"""
+    rng = random.Random(seed)
+    species = [int(pokemon_id) for pokemon_id, types in type_exclusive_function.pokemon_types_data.items() if types]
+    if not species:
+        print("属性道具抽样: 没有宝可梦属性数据，跳过")
+        return
+    pokemon_ids = [rng.choice(species) for _ in range(draws)]
+    branches = type_exclusive_function.ATTRIBUTE_BRANCHES
+
+    def weighted_choices():
+        # 旧实现：每次抽样都重新计算权重表，再用random.choices线性扫描
+        for pokemon_id in pokemon_ids:
+            tables = type_exclusive_function._attribute_item_tables(
+                type_exclusive_function.get_pokemon_types(pokemon_id))
+            branch = rng.choices(branches, tables["category_weights"])[0]
+            items, weights = tables[branch]
+            rng.choices(items, weights)[0]
+
+    def alias_tables():
+        for pokemon_id in pokemon_ids:
+            type_exclusive_function.select_attribute_item(pokemon_id, rng)
+
+    type_exclusive_function._clear_samplers()
+    print(f"属性道具抽样 ({draws} 次):")
+    print(f"  random.choices: {_time_call(weighted_choices) * 1000:.1f} ms")
+    print(f"  别名表(含首次构建): {_time_call(alias_tables, repeat=1) * 1000:.1f} ms")
+    print(f"  别名表(已缓存): {_time_call(alias_tables) * 1000:.1f} ms")
+
+
+def bench_item_randomize():
+    """对比逐只select_item与按属性组合分组批量抽样的道具随机化耗时"""
+    with tempfile.TemporaryDirectory() as directory:
+        build_synthetic_trainer_dir(directory)
+        corpus = TrainerPokeCorpus(directory)
+        species = corpus.column("species")
+
+        def per_record():
+            rng = random.Random(1)
+            for row in range(len(corpus)):
+                corpus.set_item(row, type_exclusive_function.select_item(species[row], rng))
+
+        def batch():
+            corpus.set_items(type_exclusive_function.select_items_batch(species, seed=1))
+
+        if type_exclusive_function.select_items_batch(species, seed=1) != \
+                type_exclusive_function.select_items_batch(species, seed=1):
+            raise AssertionError("相同种子的批量随机化结果不一致")
+
+        print(f"训练家道具随机化 ({len(corpus)} 只宝可梦):")
+        print(f"  逐只抽样: {_time_call(per_record) * 1000:.1f} ms")
+        print(f"  分组批量: {_time_call(batch) * 1000:.1f} ms")
+
+
+def main():
+    bench_static_xorpad()
+    bench_keystream()
+    bench_save_roundtrip()
+    bench_resync()
+    bench_box_decrypt()
+    bench_box_write()
+    bench_box_refresh()
+    bench_box_parallel()
+    bench_item_sampling()
+    bench_item_randomize()
+
+
+if __name__ == "__main__":
+    main()
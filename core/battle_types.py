@@ -1,9 +1,66 @@
-from typing import Dict, List
+from array import array
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence
 
 from core.static_data import type_defense_effectiveness, type_code_map
 
 
+# 属性编号顺序的属性名（0=normal ... 17=fairy），也是克制矩阵的列顺序
+TYPE_NAMES: List[str] = [type_code_map[i] for i in sorted(type_code_map)]
+TYPE_COUNT = len(TYPE_NAMES)
+
+# 所有单属性和双属性组合（18 + 153 = 171种），按行号排列
+TYPE_COMBINATIONS: List[tuple] = [(name,) for name in TYPE_NAMES] + list(combinations(TYPE_NAMES, 2))
+_combination_rows: Dict[tuple, int] = {}
+for _row, _combination in enumerate(TYPE_COMBINATIONS):
+    _combination_rows[_combination] = _row
+    _combination_rows[_combination[::-1]] = _row
+
+
+def _build_weakness_matrix() -> array:
+    matrix = array("d", [1.0] * (len(TYPE_COMBINATIONS) * TYPE_COUNT))
+    for row, combination in enumerate(TYPE_COMBINATIONS):
+        base = row * TYPE_COUNT
+        for pokemon_type in combination:
+            effectiveness = type_defense_effectiveness.get(pokemon_type)
+            if effectiveness is None:
+                continue
+            for code in range(TYPE_COUNT):
+                matrix[base + code] *= effectiveness[code]
+    return matrix
+
+
+# 171×18的克制倍率矩阵：第row行第code列为code属性招式对该属性组合的倍率
+WEAKNESS_MATRIX: array = _build_weakness_matrix()
+
+# 防御表的属性顺序与属性编号一致时才能直接用矩阵结果代替逐项计算
+_matrix_matches_table = list(type_defense_effectiveness.keys()) == TYPE_NAMES
+
+# 每个组合对应的calculate_weaknesses结果，调用时返回副本
+_weakness_dicts: List[Dict[str, float]] = [
+    dict(zip(TYPE_NAMES, WEAKNESS_MATRIX[row * TYPE_COUNT:(row + 1) * TYPE_COUNT]))
+    for row in range(len(TYPE_COMBINATIONS))
+]
+
+
+def type_combination_row(types: Sequence[str]) -> Optional[int]:
+    """属性组合在WEAKNESS_MATRIX中的行号，不是合法的单/双属性组合时返回None"""
+    return _combination_rows.get(tuple(types))
+
+
+def get_weakness_row(types: Sequence[str]) -> Optional[array]:
+    """属性组合受各属性招式攻击的倍率（按属性编号排列），不是合法组合时返回None"""
+    row = _combination_rows.get(tuple(types))
+    if row is None:
+        return None
+    return WEAKNESS_MATRIX[row * TYPE_COUNT:(row + 1) * TYPE_COUNT]
+
+
 def calculate_weaknesses(types: List[str]) -> Dict[str, float]:
+    row = _combination_rows.get(tuple(types))
+    if row is not None and _matrix_matches_table:
+        return dict(_weakness_dicts[row])
+
     weaknesses: Dict[str, float] = {t: 1.0 for t in type_defense_effectiveness.keys()}
     for pokemon_type in types:
         if pokemon_type in type_defense_effectiveness:
@@ -13,4 +70,3 @@ def calculate_weaknesses(types: List[str]) -> Dict[str, float]:
                 if attr is not None:
                     weaknesses[attr] *= value
     return weaknesses
-
@@ -1,22 +1,137 @@
 import hashlib
+import json
+import logging
+import mmap
+import os
 import struct
-from typing import List, Dict, Tuple, Union
+from collections.abc import Mapping
+from typing import List, Dict, Tuple, Union, NamedTuple, Optional
 
 from utils.dev_paths import get_dev_path
 
+try:
+    from file_manager import get_config_dir
+except ImportError:
+    get_config_dir = None
+
+# 关键块的键值
+KBOX_KEY = 0x0D66012C
+KPARTY_KEY = 0x2985FE5D
+
+# 块索引持久化文件（保存在config目录下）
+BLOCK_INDEX_FILENAME = "save_block_index.json"
+BLOCK_INDEX_VERSION = 1
+# 最多保留多少份存档的块索引
+BLOCK_INDEX_MAX_SAVES = 8
+# 扫描块数量上限（real main约有5184个块）
+MAX_BLOCK_COUNT = 6000
+# 重新同步时，候选块头之后还需连续解析成功的块数
+# （随机数据中单个位置通过类型检查的概率约1/16，连续5个块头才可信，误判约百万分之一）
+RESYNC_LOOKAHEAD = 4
+# 通过SaveFileReader重新同步时每次解密的窗口大小
+RESYNC_WINDOW = 0x1000
+# 单值类型代码对应的数据大小（布尔类型没有数据）
+_SCALAR_TYPE_SIZES = {1: 0, 2: 0, 3: 0, 8: 1, 9: 2, 10: 4, 11: 8, 12: 1, 13: 2, 14: 4, 15: 8, 16: 4, 17: 8}
+# 有效的块类型代码（不含None）
+_VALID_TYPE_CODES = frozenset(_SCALAR_TYPE_SIZES) | {4, 5}
+# 文件哈希缓存最多记录的文件版本数
+FILE_DIGEST_CACHE_SIZE = 16
+_file_digest_cache: Dict[Tuple[str, int, int], Dict] = {}
+
+# 解密过程的调试日志，默认不输出；需要时调用set_trace(True)
+logger = logging.getLogger(__name__)
+_trace_handler = None
+
+def set_trace(enabled: bool = True) -> None:
+    """开启或关闭解密过程的详细调试输出
+
+    关闭时调试信息在logger.isEnabledFor处即被跳过，几乎没有开销。
+    """
+    global _trace_handler
+    if enabled:
+        if _trace_handler is None:
+            _trace_handler = logging.StreamHandler()
+            _trace_handler.setFormatter(logging.Formatter("调试：%(message)s"))
+            logger.addHandler(_trace_handler)
+        logger.setLevel(logging.DEBUG)
+    else:
+        if _trace_handler is not None:
+            logger.removeHandler(_trace_handler)
+            _trace_handler = None
+        logger.setLevel(logging.NOTSET)
+
+class DecryptStats:
+    """块解析统计：解析成功的块数、跳过的字节数、重新同步的次数及跳过的损坏区间"""
+    def __init__(self):
+        self.blocks_parsed = 0
+        self.bytes_skipped = 0
+        self.resync_attempts = 0
+        # 跳过的损坏区间列表：(起始偏移, 长度)
+        self.skipped_spans: List[Tuple[int, int]] = []
+
+    def __repr__(self) -> str:
+        return (f"DecryptStats(blocks_parsed={self.blocks_parsed}, "
+                f"bytes_skipped={self.bytes_skipped}, resync_attempts={self.resync_attempts}, "
+                f"skipped_spans={len(self.skipped_spans)})")
+
+def xor_bytes(data, key) -> bytes:
+    """将两段等长字节序列整体异或
+
+    借助int.from_bytes把整段数据当作一个大整数处理，
+    异或在C层一次完成，比逐字节循环快数百倍。
+    """
+    length = len(data)
+    if length == 0:
+        return b""
+    value = int.from_bytes(data, "little") ^ int.from_bytes(key[:length], "little")
+    return value.to_bytes(length, "little")
+
 class SCXorShift32:
     """XorShift32随机数生成器，用于加密/解密数据"""
     def __init__(self, seed: int):
         # 确保使用无符号整数
         seed = seed & 0xFFFFFFFF
         # 根据seed的popcount进行多次XorshiftAdvance
-        pop_count = self.popcount(seed)
-        self.seed = seed
-        for _ in range(pop_count):
-            self.seed = self.xorshift_advance(self.seed)
-        
+        self.seed = self.advanced_seed(seed)
         self.counter = 0
     
+    # 推进n次的查找表：_advance_tables[n][i][v]为字节i取值v时的贡献
+    _advance_tables = None
+
+    @staticmethod
+    def advanced_seed(seed: int) -> int:
+        """按popcount推进后的初始状态，其最低字节即密钥流的第一个字节
+
+        XorShift在GF(2)上是线性变换，推进n次可以拆成4个字节各自查表后异或，
+        不必逐次循环。
+        """
+        seed &= 0xFFFFFFFF
+        tables = SCXorShift32._advance_tables
+        if tables is None:
+            tables = SCXorShift32._build_advance_tables()
+        t = tables[SCXorShift32.popcount(seed)]
+        return t[0][seed & 0xFF] ^ t[1][(seed >> 8) & 0xFF] ^ t[2][(seed >> 16) & 0xFF] ^ t[3][seed >> 24]
+
+    @staticmethod
+    def _build_advance_tables():
+        """构建推进0~32次的字节查找表"""
+        # 每一位在推进n次后的像
+        bit_images = [1 << bit for bit in range(32)]
+        tables = []
+        for _ in range(33):
+            per_byte = []
+            for byte_index in range(4):
+                images = bit_images[byte_index * 8:byte_index * 8 + 8]
+                table = [0] * 256
+                for value in range(1, 256):
+                    low = value & -value
+                    table[value] = table[value ^ low] ^ images[low.bit_length() - 1]
+                per_byte.append(table)
+            tables.append(per_byte)
+            bit_images = [SCXorShift32.xorshift_advance(image) for image in bit_images]
+        SCXorShift32._advance_tables = tables
+        return tables
+    
     def next(self) -> int:
         """生成下一个随机字节"""
         c = self.counter
@@ -31,6 +146,50 @@ class SCXorShift32:
     def next32(self) -> int:
         """生成下一个32位随机数"""
         return self.next() | (self.next() << 8) | (self.next() << 16) | (self.next() << 24)
+
+    def next_bytes(self, count: int) -> bytes:
+        """一次生成count字节的密钥流，结果与连续调用count次next()一致"""
+        if count <= 0:
+            return b""
+        out = bytearray()
+        seed = self.seed
+        c = self.counter
+
+        # 先用完当前32位字中剩余的字节
+        if c:
+            take = min(4 - c, count)
+            out += seed.to_bytes(4, "little")[c:c + take]
+            c += take
+            count -= take
+            if c == 4:
+                seed = self.xorshift_advance(seed)
+                c = 0
+
+        # 整字部分：批量推进状态后一次性打包成小端字节
+        full, rem = divmod(count, 4)
+        if full:
+            words = [0] * full
+            state = seed
+            for i in range(full):
+                words[i] = state
+                state ^= (state << 2) & 0xFFFFFFFF
+                state ^= state >> 15
+                state ^= (state << 13) & 0xFFFFFFFF
+            seed = state
+            out += struct.pack(f"<{full}I", *words)
+
+        # 尾部不足一个字的字节
+        if rem:
+            out += seed.to_bytes(4, "little")[:rem]
+            c = rem
+
+        self.seed = seed
+        self.counter = c
+        return bytes(out)
+
+    def crypt(self, data) -> bytes:
+        """用密钥流异或整段数据，加密与解密是同一操作"""
+        return xor_bytes(data, self.next_bytes(len(data)))
     
     @staticmethod
     def xorshift_advance(state: int) -> int:
@@ -52,6 +211,20 @@ class SCXorShift32:
         x += x >> 16
         return x & 0x3F
 
+class SCBlockHeader(NamedTuple):
+    """块头信息：只记录位置与类型，不包含解密后的数据"""
+    key: int
+    type: str
+    sub_type: Optional[str]
+    offset: int
+    payload_offset: int
+    payload_size: int
+
+    @property
+    def end(self) -> int:
+        """块结束位置（下一个块的起始偏移）"""
+        return self.payload_offset + self.payload_size
+
 class SCBlock:
     """处理块数据的读写逻辑"""
     def __init__(self, key: int, block_type: str = "Object", data: bytes = None, sub_type: str = None):
@@ -60,6 +233,14 @@ class SCBlock:
         self.data = bytearray(data) if data else bytearray()
         self.SubType = sub_type
         self.Offset = 0
+        # 块在原存档数据区域中的(偏移, 加密后长度)，新建的块为None
+        self.SourceSpan = None
+        # 数据是否被修改过；增量重新加密时只重写脏块
+        self.Dirty = False
+    
+    def mark_dirty(self) -> None:
+        """直接修改self.data后调用，标记该块需要重新加密"""
+        self.Dirty = True
     
     def get_value(self, data_type: str) -> Union[int, float, bool, bytes]:
         """从块数据中读取值"""
@@ -99,6 +280,7 @@ class SCBlock:
     
     def set_value(self, data_type: str, value: Union[int, float, bool, bytes]):
         """向块数据中写入值"""
+        self.Dirty = True
         if data_type == "Bool1" or data_type == "Bool2":
             self.data[self.Offset] = 1 if value else 0
             self.Offset += 1
@@ -126,218 +308,150 @@ class SCBlock:
         else:
             raise ValueError(f"Unsupported data type: {data_type}")
     
-    def write_block(self) -> bytes:
-        """加密块数据"""
-        result = bytearray()
+    def get_payload_size(self) -> int:
+        """加密后载荷的字节数（布尔类型没有载荷）"""
+        if self.Type in ("Bool1", "Bool2", "Bool3"):
+            return 0
+        return len(self.data)
+    
+    def get_encoded_size(self) -> int:
+        """块加密后的总字节数：键4 + 类型1 + 额外头信息 + 载荷"""
+        size = 5 + self.get_payload_size()
+        if self.Type == "Object":
+            size += 4
+        elif self.Type == "Array":
+            size += 5
+        return size
+    
+    def write_into(self, buffer: bytearray, offset: int) -> int:
+        """把加密后的块写入预分配的缓冲区，返回写入后的偏移量"""
         rng = SCXorShift32(self.Key)
         
-        # 写入块键
-        result.extend(struct.pack('<I', self.Key))
+        # 写入块键（明文）
+        struct.pack_into('<I', buffer, offset, self.Key)
+        pos = offset + 4
         
-        # 写入块类型（加密）
-        type_code = self.get_type_code(self.Type)
-        result.append(type_code ^ rng.next())
-        
-        # 根据类型写入额外信息
+        # 块类型及额外信息，与载荷共用同一条密钥流
+        header = bytearray([self.get_type_code(self.Type)])
         if self.Type == "Object":
-            # 写入对象大小（加密）
-            # 使用有符号整数，与PKHeX实现一致
-            result.extend(struct.pack('<i', len(self.data) ^ rng.next32()))
+            # 对象大小，与读取时一致按无符号整数处理
+            header += struct.pack('<I', len(self.data))
         elif self.Type == "Array":
-            # 写入条目数（加密）
             sub_type_code = self.get_type_code(self.SubType)
-            entry_size = self.get_type_size(sub_type_code)
-            num_entries = len(self.data) // entry_size
-            # 使用有符号整数，与PKHeX实现一致
-            result.extend(struct.pack('<i', num_entries ^ rng.next32()))
-            # 写入子类型（加密）
-            result.append(sub_type_code ^ rng.next())
+            entry_size = self.get_type_size(sub_type_code) or 1
+            header += struct.pack('<I', len(self.data) // entry_size)
+            header.append(sub_type_code)
+        buffer[pos:pos + len(header)] = rng.crypt(header)
+        pos += len(header)
         
         # 加密并写入数据
-        for b in self.data:
-            result.append(b ^ rng.next())
-        
+        payload_size = self.get_payload_size()
+        if payload_size:
+            buffer[pos:pos + payload_size] = rng.crypt(self.data)
+            pos += payload_size
+        return pos
+    
+    def write_block(self) -> bytes:
+        """加密块数据"""
+        result = bytearray(self.get_encoded_size())
+        self.write_into(result, 0)
         return bytes(result)
     
     @staticmethod
     def read_from_offset(data: bytes, offset: int) -> Tuple['SCBlock', int]:
-        """从偏移量解密块数据"""
-        # 读取块键
-        if offset + 4 > len(data):
-            print(f"调试：在偏移量 {offset} 处无法读取块键，数据长度不足")
+        """从偏移量解密块数据
+
+        Returns:
+            (块, 下一个块的偏移量)；无法解析时返回(None, offset)
+        """
+        header = SCBlock.read_header(data, offset)
+        if header is None:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("偏移量 %d 处无法解析有效块头", offset)
             return None, offset
-        key = struct.unpack_from('<I', data, offset)[0]
-        offset += 4
         
-        # 初始化XorShift32
-        rng = SCXorShift32(key)
+        block = SCBlock.from_header(data, header)
         
-        # 读取块类型（解密）
-        if offset >= len(data):
-            print(f"调试：在偏移量 {offset} 处无法读取块类型，数据长度不足")
-            return None, offset
-        type_code = data[offset] ^ rng.next()
-        offset += 1
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("读取块，键: 0x%08X, 类型: %s, 子类型: %s, 偏移量: %d, 数据大小: %d",
+                         header.key, header.type, header.sub_type, header.offset, header.payload_size)
+            if header.key == KBOX_KEY or header.key == KPARTY_KEY:
+                logger.debug("*** 找到目标块键 0x%08X, 类型: %s ***", header.key, header.type)
+                logger.debug("前32字节数据: %s", " ".join(f"{b:02X}" for b in block.data[:32]))
         
+        return block, header.end
+    
+    @staticmethod
+    def read_header(data, offset: int, limit: Optional[int] = None) -> Optional[SCBlockHeader]:
+        """只解析块头（键、类型、大小），不解密载荷，也不输出调试信息
+
+        校验规则与read_from_offset一致，无法识别时返回None。
+        limit为数据区域的实际长度，data只是区域中的一个窗口时使用。
+        """
+        data_len = len(data) if limit is None else limit
+        if offset + 5 > data_len:
+            return None
+        key = struct.unpack_from('<I', data, offset)[0]
+        rng = SCXorShift32(key)
+        pos = offset + 4
+
+        type_code = data[pos] ^ rng.next()
+        pos += 1
         block_type = SCBlock.get_type_name(type_code)
-        
-        # 如果类型无法识别或者是None类型，跳过此块
         if block_type is None or block_type == "None":
-            print(f"调试：跳过无效类型 {block_type} (代码: {type_code})，键: 0x{key:08X}")
-            return None, offset
-        
-        # 调试信息：打印所有块的键和类型
-        print(f"调试：读取块，键: 0x{key:08X}, 类型: {block_type} (代码: {type_code}), 偏移量: {offset}")
-        
-        # 特别关注KBox或KParty的键值
-        if key == 0x0D66012C or key == 0x2985FE5D:  # KBox或KParty的键值
-            print(f"调试：*** 找到目标块键 0x{key:08X}, 类型: {block_type} (代码: {type_code}) ***")
-        
-        # 根据类型读取额外信息
-        if block_type == "Bool1" or block_type == "Bool2" or block_type == "Bool3":
-            # 布尔类型没有额外数据
-            return SCBlock(key, block_type), offset
-        
+            return None
+
+        sub_type = None
+        if block_type in ("Bool1", "Bool2", "Bool3"):
+            num_bytes = 0
         elif block_type == "Object":
-            # 读取对象大小（解密）
-            if offset + 4 > len(data):
-                print(f"调试：在偏移量 {offset} 处无法读取Object块大小，数据长度不足")
-                return None, offset
-            # 使用无符号整数，与PKHeX实现一致
-            encrypted_size = struct.unpack_from('<I', data, offset)[0]
-            xor_value = rng.next32()
-            # 直接进行XOR运算，与PKHeX实现一致
-            num_bytes = encrypted_size ^ xor_value
-            offset += 4
-            
-            # 调试信息：对于所有Object块，打印大小信息
-            print(f"调试：Object块 0x{key:08X} 加密大小: 0x{encrypted_size:08X} ({encrypted_size})")
-            print(f"调试：Object块 0x{key:08X} XOR值: 0x{xor_value:08X} ({xor_value})")
-            print(f"调试：Object块 0x{key:08X} 解密后大小: {num_bytes} 字节")
-            
-            # 检查大小是否合理
-            if num_bytes <= 0 or num_bytes > len(data) - offset:
-                print(f"调试：Object块 0x{key:08X} 大小 {num_bytes} 不合理，跳过此块")
-                return None, offset
-            
-            # 读取对象数据
-            if offset + num_bytes > len(data):
-                print(f"调试：在偏移量 {offset} 处无法读取Object块数据，需要 {num_bytes} 字节，但只有 {len(data) - offset} 字节可用")
-                return None, offset
-            arr = bytearray(data[offset:offset + num_bytes])
-            offset += num_bytes
-            
-            print(f"调试：Object块 0x{key:08X} 数据读取完成，新偏移量: {offset}")
-            
-            # 解密数据
-            for i in range(len(arr)):
-                arr[i] ^= rng.next()
-            
-            # 如果是KParty块，输出前32字节用于调试
-            if key == 0x2985FE5D:
-                print(f"调试：KParty块前32字节数据:")
-                for i in range(min(32, len(arr))):
-                    print(f"{arr[i]:02X} ", end="")
-                    if (i + 1) % 16 == 0:
-                        print()
-                print()
-            
-            return SCBlock(key, block_type, arr), offset
-        
+            if pos + 4 > data_len:
+                return None
+            num_bytes = struct.unpack_from('<I', data, pos)[0] ^ rng.next32()
+            pos += 4
+            if num_bytes <= 0 or num_bytes > data_len - pos:
+                return None
         elif block_type == "Array":
-            print(f"调试：处理Array类型块，当前偏移量: {offset}")
-            
-            # 读取条目数（解密）
-            if offset + 4 > len(data):
-                print(f"调试：在偏移量 {offset} 处无法读取Array块条目数，数据长度不足")
-                return None, offset
-            # 使用无符号整数读取加密条目数，与PKHeX实现一致
-            encrypted_entries = struct.unpack_from('<I', data, offset)[0]
-            xor_value = rng.next32()
-            # 直接进行XOR运算
-            num_entries = encrypted_entries ^ xor_value
-            offset += 4
-            
-            print(f"调试：Array块加密条目数: 0x{encrypted_entries:08X} ({encrypted_entries})")
-            print(f"调试：Array块XOR值: 0x{xor_value:08X} ({xor_value})")
-            print(f"调试：Array块解密后条目数: {num_entries}")
-            
-            # 检查条目数是否合理
-            if num_entries <= 0 or num_entries > 1000000:  # 设置一个合理的上限
-                print(f"调试：Array块 0x{key:08X} 条目数 {num_entries} 不合理，跳过此块")
-                return None, offset
-            
-            # 读取子类型（解密）
-            if offset >= len(data):
-                print(f"调试：在偏移量 {offset} 处无法读取Array块子类型，数据长度不足")
-                return None, offset
-            sub_type_code = data[offset] ^ rng.next()
-            offset += 1
-            
+            if pos + 4 > data_len:
+                return None
+            num_entries = struct.unpack_from('<I', data, pos)[0] ^ rng.next32()
+            pos += 4
+            if num_entries <= 0 or num_entries > 1000000:
+                return None
+            if pos >= data_len:
+                return None
+            sub_type_code = data[pos] ^ rng.next()
+            pos += 1
             sub_type = SCBlock.get_type_name(sub_type_code)
-            print(f"调试：Array块子类型: {sub_type} (代码: {sub_type_code})")
-            
-            # 计算字节数
-            entry_size = SCBlock.get_type_size(sub_type_code)
+            entry_size = SCBlock.get_type_size(sub_type_code) if sub_type is not None else 1
             if entry_size == 0:
-                print(f"调试：Array块子类型 {sub_type} (代码: {sub_type_code}) 的大小为0，使用默认大小1字节")
                 entry_size = 1
-            
             num_bytes = num_entries * entry_size
-            print(f"调试：Array块总数据大小: {num_bytes} 字节 ({num_entries} * {entry_size})")
-            
-            # 检查是否是KBox或KParty块的大小
-            if num_bytes == 330240:
-                print(f"调试：*** Array块大小匹配KBox (330240字节)! ***")
-            if num_bytes == 2068:
-                print(f"调试：*** Array块大小匹配KParty (2068字节)! ***")
-            
-            # 检查数据大小是否合理
-            if num_bytes < 0 or num_bytes > len(data) - offset:
-                print(f"调试：Array块数据大小 {num_bytes} 不合理，可能解密错误")
-                return None, offset
-            
-            # 读取数组数据
-            if offset + num_bytes > len(data):
-                print(f"调试：在偏移量 {offset} 处无法读取Array块数据，需要 {num_bytes} 字节，但只有 {len(data) - offset} 字节可用")
-                return None, offset
-            arr = bytearray(data[offset:offset + num_bytes])
-            offset += num_bytes
-            
-            print(f"调试：Array块数据读取完成，新偏移量: {offset}")
-            
-            # 解密数据
-            for i in range(len(arr)):
-                arr[i] ^= rng.next()
-            
-            return SCBlock(key, block_type, arr, sub_type), offset
-        
-        else:  # 单值类型或Unknown类型
-            # 计算字节数
+            if num_bytes > data_len - pos:
+                return None
+        else:
             num_bytes = SCBlock.get_type_size(type_code)
-            
-            # 如果是Unknown类型，尝试使用默认大小1字节
-            if block_type == "Unknown":
-                print(f"调试：遇到Unknown类型块 (代码: {type_code})，尝试使用默认大小1字节")
-                num_bytes = 1
-            
-            print(f"调试：读取{block_type}类型块，数据大小: {num_bytes}字节")
-            
-            # 读取数据
-            if offset + num_bytes > len(data):
-                print(f"调试：在偏移量 {offset} 处无法读取{num_bytes}字节数据，数据长度不足")
-                return None, offset
-            arr = bytearray(data[offset:offset + num_bytes])
-            offset += num_bytes
-            
-            # 解密数据
-            for i in range(len(arr)):
-                arr[i] ^= rng.next()
-            
-            print(f"调试：成功读取{block_type}类型块，新偏移量: {offset}")
-            
-            return SCBlock(key, block_type, arr), offset
-    
+            if pos + num_bytes > data_len:
+                return None
+
+        return SCBlockHeader(key, block_type, sub_type, offset, pos, num_bytes)
+
+    @staticmethod
+    def from_header(data, header: SCBlockHeader) -> 'SCBlock':
+        """根据块头解密载荷并构建SCBlock"""
+        return SCBlock.from_payload(header, data[header.payload_offset:header.end])
+
+    @staticmethod
+    def from_payload(header: SCBlockHeader, payload) -> 'SCBlock':
+        """用块头对应的密钥流解密载荷（payload为仍被XorShift加密的字节）"""
+        rng = SCXorShift32(header.key)
+        # 跳过块头中已被类型/大小消耗掉的密钥流
+        rng.next_bytes(header.payload_offset - header.offset - 4)
+        block = SCBlock(header.key, header.type, rng.crypt(payload), header.sub_type)
+        block.Offset = header.offset
+        block.SourceSpan = (header.offset, header.end - header.offset)
+        return block
+
     @staticmethod
     def get_type_code(type_name: str) -> int:
         """根据类型名称获取类型代码"""
@@ -408,10 +522,59 @@ class SCBlock:
         
         size = type_sizes.get(type_code, 1)  # 为未知类型代码提供默认大小1字节
         if type_code not in type_sizes:
-            print(f"调试：未知类型代码 {type_code}，使用默认大小1字节")
+            logger.debug("未知类型代码 %d，使用默认大小1字节", type_code)
         
         return size
 
+class SCBlockMap(Mapping):
+    """按需解密的块映射
+
+    只保存块头和数据来源（去除StaticXorpad后的数据区域，或直接读取加密存档的SaveFileReader），
+    某个块第一次被访问时才解密其载荷并缓存。
+    键与SwishCrypto.decrypt返回的字典一致（"0x%08X"格式的字符串）。
+    """
+    def __init__(self, data_region, headers: List[SCBlockHeader]):
+        self.data_region = data_region
+        self.headers = {f"0x{header.key:08X}": header for header in headers}
+        self._blocks: Dict[str, SCBlock] = {}
+
+    def __getitem__(self, name: str) -> SCBlock:
+        block = self._blocks.get(name)
+        if block is None:
+            header = self.headers[name]
+            if isinstance(self.data_region, SaveFileReader):
+                block = self.data_region.read_block(header)
+            else:
+                block = SCBlock.from_header(self.data_region, header)
+            self._blocks[name] = block
+        return block
+
+    def __iter__(self):
+        return iter(self.headers)
+
+    def __len__(self) -> int:
+        return len(self.headers)
+
+    def __contains__(self, name) -> bool:
+        return name in self.headers
+
+    def get_by_key(self, key: int) -> Optional[SCBlock]:
+        """按整数块键获取块"""
+        return self.get(f"0x{key:08X}")
+
+    def decoded_count(self) -> int:
+        """已经解密过的块数量"""
+        return len(self._blocks)
+
+    def peek(self, name: str) -> Optional[SCBlock]:
+        """返回已解密的块，未访问过的块返回None（不会触发解密）"""
+        return self._blocks.get(name)
+
+    def close(self) -> None:
+        """数据来源为SaveFileReader时释放文件映射，之后不能再解密新的块"""
+        if isinstance(self.data_region, SaveFileReader):
+            self.data_region.close()
+
 class SwishCrypto:
     """主要的加密/解密类"""
     def __init__(self):
@@ -442,57 +605,73 @@ class SwishCrypto:
         ])
         
         self.hash_size = 0x20  # SHA256哈希大小
+        self._tiled_xorpad = None
+        # 最近一次decrypt的块解析统计
+        self.stats = DecryptStats()
     
     def crypt_static_xorpad_bytes(self, data: bytearray) -> None:
-        """使用StaticXorpad解密/加密数据（除了最后的哈希部分）"""
+        """使用StaticXorpad解密/加密数据（除了最后的哈希部分）
+
+        将127字节的StaticXorpad平铺到整个数据区域，一次性完成异或，
+        避免逐字节的Python循环。
+        """
         data_region_len = len(data) - self.hash_size if len(data) > self.hash_size else len(data)
-        print(f"调试：数据区域大小: {data_region_len}, 哈希大小: {self.hash_size}")
-        
-        # 添加调试信息：显示解密前的前32字节
-        print("调试：解密前的前32字节:")
-        for i in range(min(32, data_region_len)):
-            print(f"{data[i]:02X} ", end="")
-            if (i + 1) % 16 == 0: print()
-        print()
-        
-        # 添加调试信息：显示StaticXorpad的前32字节
-        print("调试：StaticXorpad的前32字节:")
-        for i in range(min(32, len(self.static_xorpad))):
-            print(f"{self.static_xorpad[i]:02X} ", end="")
-            if (i + 1) % 16 == 0: print()
-        print()
-        
-        # 执行XOR解密
-        for i in range(data_region_len):
-            data[i] ^= self.static_xorpad[i % len(self.static_xorpad)]
-            
-        # 添加调试信息：显示解密后的前32字节
-        print("调试：解密后的前32字节:")
-        for i in range(min(32, data_region_len)):
-            print(f"{data[i]:02X} ", end="")
-            if (i + 1) % 16 == 0: print()
-        print()
+        if data_region_len <= 0:
+            return
+        pad = self.get_tiled_xorpad(data_region_len)
+        data[:data_region_len] = xor_bytes(memoryview(data)[:data_region_len], pad)
+
+    def get_tiled_xorpad(self, length: int) -> bytes:
+        """获取平铺到指定长度的StaticXorpad（按长度缓存，同尺寸存档只构建一次）"""
+        cached = self._tiled_xorpad
+        if cached is None or len(cached) < length:
+            repeat = length // len(self.static_xorpad) + 1
+            cached = self.static_xorpad * repeat
+            self._tiled_xorpad = cached
+        return cached[:length]
     
     def compute_hash(self, data: bytes) -> bytes:
         """计算SHA256哈希"""
-        # 创建哈希输入：IntroHashBytes + data（不包括最后的哈希） + OutroHashBytes
-        hash_input = self.intro_hash_bytes + data[:-self.hash_size] + self.outro_hash_bytes
-        return hashlib.sha256(hash_input).digest()
+        # 哈希输入：IntroHashBytes + data（不包括最后的哈希） + OutroHashBytes
+        # 逐段送入同一个哈希对象，避免拼接出整份存档的副本
+        hasher = hashlib.sha256(self.intro_hash_bytes)
+        hasher.update(memoryview(data)[:-self.hash_size])
+        hasher.update(self.outro_hash_bytes)
+        return hasher.digest()
     
     def get_is_hash_valid(self, data: bytes) -> bool:
         """检查文件哈希是否有效"""
         computed_hash = self.compute_hash(data)
-        stored_hash = data[-self.hash_size:]
+        stored_hash = bytes(data[-self.hash_size:])
         return computed_hash == stored_hash
     
-    def decrypt(self, data: bytes) -> Tuple[bytes, Dict[str, SCBlock]]:
-        """解密数据"""
+    def decrypt(self, data: bytes, lazy: bool = False, verify_hash: bool = True) -> Tuple[bytes, Dict[str, SCBlock]]:
+        """解密数据
+
+        Args:
+            data: 加密的存档数据
+            lazy: 为True时只扫描块头，返回按需解密的SCBlockMap
+            verify_hash: 是否校验存档哈希（调用方已校验过时可关闭）
+
+        Returns:
+            (解密后的数据区域, 块字典)。lazy为True时不会解密整份存档，
+            第一个返回值为直接读取data的SaveFileReader，只在读取时去除StaticXorpad。
+        """
         if len(data) < 8:
             return data, {}
         
         # 首先检查哈希是否有效
-        if not self.get_is_hash_valid(data):
-            print("警告：文件哈希无效，可能不是有效的保存文件")
+        if verify_hash:
+            valid = data.is_hash_valid() if isinstance(data, SaveFileReader) else self.get_is_hash_valid(data)
+            if not valid:
+                print("警告：文件哈希无效，可能不是有效的保存文件")
+        
+        self.stats = DecryptStats()
+        if lazy:
+            # 不复制整份存档：块头和被访问的块载荷按需去除StaticXorpad
+            reader = data if isinstance(data, SaveFileReader) else SaveFileReader.from_buffer(data, self)
+            headers = SCBlockIndex.scan(reader, self.stats)
+            return reader, SCBlockMap(reader, headers)
         
         # 创建数据的可写副本
         decrypted = bytearray(data)
@@ -500,133 +679,40 @@ class SwishCrypto:
         # 使用StaticXorpad解密数据（除了最后的哈希部分）
         self.crypt_static_xorpad_bytes(decrypted)
         
-        # 读取块
-        blocks = {}
-        offset = 0
-        
-        # 只处理除哈希外的数据区域
-        data_region = decrypted[:-self.hash_size] if len(decrypted) > self.hash_size else decrypted
-        
-        # 调试：打印数据区域前4字节
-        print(f"调试：读取块前数据区域前4字节: {' '.join(f'{b:02X}' for b in data_region[:4])}")
-        
-        # 使用BlockDataRatioEstimate2初始化列表容量（与PKHeX一致）
-        block_data_ratio_estimate2 = 555  # 每个块的平均字节数
-        estimated_block_count = len(data_region) // block_data_ratio_estimate2
-        
-        print(f"估计块数量: {estimated_block_count}")
+        # 只处理除哈希外的数据区域（原地截断，不再额外复制）
+        if len(decrypted) > self.hash_size:
+            del decrypted[-self.hash_size:]
+        data_region = decrypted
         
-        # 记录处理块的数量，用于调试
-        block_count = 0
+        # 扫描块头，统计信息保存在self.stats中
+        headers = SCBlockIndex.scan(data_region, self.stats)
         
-        # 记录尝试跳过的次数，避免无限循环
-        skip_attempts = 0
-        max_skip_attempts = 100
-        
-        # 添加调试信息：记录KParty和KBox块的查找状态
-        kparty_found = False
-        kbox_found = False
-        
-        # 修改块读取逻辑，使其更接近PKHeX的实现
-        # 不使用块数量估计，而是处理所有数据直到结束
-        while offset < len(data_region):
-            # 记录当前偏移量作为块的起始位置
-            block_start_offset = offset
-            
-            # 检查是否有足够的数据读取块键（4字节）和类型（1字节）
-            if offset + 5 > len(data_region):
-                print(f"调试：在偏移量 {offset} 处数据不足，无法读取块键和类型，结束读取")
-                break
-                
-            block, new_offset = SCBlock.read_from_offset(data_region, offset)
-            
-            if block is None:
-                # 如果块为None，跳过4个字节（块键大小）以尝试找到下一个可能的块
-                skip_attempts += 1
-                if skip_attempts > max_skip_attempts:
-                    print(f"调试：跳过次数超过最大限制({max_skip_attempts})，重置计数器")
-                    skip_attempts = 0  # 重置计数器，继续尝试
-                offset += 4  # 跳过4个字节（块键大小）
-                print(f"调试：遇到无效块，跳过4个字节，新偏移量: {offset}")
-                continue
-            
-            if new_offset <= offset:
-                # 如果偏移量没有更新，尝试跳过1个字节
-                skip_attempts += 1
-                if skip_attempts > max_skip_attempts:
-                    print(f"调试：跳过次数超过最大限制({max_skip_attempts})，重置计数器")
-                    skip_attempts = 0  # 重置计数器，继续尝试
-                offset += 1  # 只跳过1个字节，避免跳过可能的块
-                print(f"调试：块解析失败，尝试跳过1个字节，新偏移量: {offset}")
-                continue
-            
-            # 成功解析一个块
-            offset = new_offset
-            blocks[f"0x{block.Key:08X}"] = block
-            
-            # 检查是否找到KParty或KBox块
-            if block.Key == 0x2985FE5D:  # KParty的键值
-                kparty_found = True
-                print(f"调试：*** 找到KParty块! Key=0x{block.Key:08X}, Type={block.Type}, DataSize={len(block.data)} 字节 ***")
-            elif block.Key == 0x0D66012C:  # KBox的键值
-                kbox_found = True
-                print(f"调试：*** 找到KBox块! Key=0x{block.Key:08X}, Type={block.Type}, DataSize={len(block.data)} 字节 ***")
-            
-            # 记录块的偏移量（使用块在数据区域中的起始位置）
-            block.Offset = block_start_offset
-            
-            # 增加块计数
-            block_count += 1
-            
-            # 每处理100个块打印一次进度
-            if block_count % 100 == 0:
-                print(f"调试：已处理 {block_count} 个块，当前偏移量: {offset}/{len(data_region)}")
-            
-            # 如果块数量超过real main中的块数量(5184)很多，提前结束循环
-            if block_count > 6000:
-                print(f"调试：块数量({block_count})超过预期，提前结束循环")
-                break
-            
-            # 清除跳过计数器
-            skip_attempts = 0
-            
-            # 不提前结束循环，尝试读取所有可能的块
-            # 移除这个提前结束的条件，确保读取到所有块
-        
-        # 添加调试信息：打印剩余未处理数据
-        remaining_data = len(data_region) - offset
-        print(f"调试：读取块完成，总共读取 {block_count} 个块，最终偏移量: {offset}/{len(data_region)}")
-        print(f"调试：剩余未处理数据: {remaining_data} 字节 (包括 {self.hash_size} 字节哈希)")
+        blocks = {}
+        for header in headers:
+            blocks[f"0x{header.key:08X}"] = SCBlock.from_header(data_region, header)
         
-        # 添加调试信息：确认KParty和KBox块的查找状态
-        print(f"调试：KParty块查找状态: {'找到' if kparty_found else '未找到'}")
-        print(f"调试：KBox块查找状态: {'找到' if kbox_found else '未找到'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("读取块完成: %s", self.stats)
+            logger.debug("KParty块查找状态: %s", "找到" if f"0x{KPARTY_KEY:08X}" in blocks else "未找到")
+            logger.debug("KBox块查找状态: %s", "找到" if f"0x{KBOX_KEY:08X}" in blocks else "未找到")
         
         # 返回解密后的数据区域（不包括哈希部分）
-        return bytes(data_region), blocks
+        return data_region, blocks
     
     def encrypt(self, blocks: Dict[str, SCBlock]) -> bytes:
-        """加密数据"""
-        # 估计块数据大小
-        block_data_ratio_estimate = 777  # 每个块的平均字节数
-        result_size = len(blocks) * block_data_ratio_estimate + self.hash_size
-        
-        # 创建内存流并写入块
-        result = bytearray(result_size)
-        offset = 0
+        """加密数据
+
+        按blocks的顺序写入所有块；对未修改的存档，结果与原文件逐字节一致。
+        """
+        # 按各块的精确大小预分配结果缓冲区（末尾留出哈希空间）
+        block_list = list(blocks.values())
+        data_size = sum(block.get_encoded_size() for block in block_list)
+        result = bytearray(data_size + self.hash_size)
         
         # 写入所有块
-        for block_key, block in blocks.items():
-            encrypted_block = block.write_block()
-            if offset + len(encrypted_block) > len(result):
-                # 如果空间不足，扩展结果数组
-                result.extend(encrypted_block)
-            else:
-                result[offset:offset + len(encrypted_block)] = encrypted_block
-            offset += len(encrypted_block)
-        
-        # 截断到实际大小并添加哈希空间
-        result = result[:offset + self.hash_size]
+        offset = 0
+        for block in block_list:
+            offset = block.write_into(result, offset)
         
         # 使用StaticXorpad加密数据（除了最后的哈希部分）
         self.crypt_static_xorpad_bytes(result)
@@ -637,21 +723,535 @@ class SwishCrypto:
         
         return bytes(result)
 
-def decrypt_main_file(input_path: str, output_path: str) -> Tuple[bytes, Dict[str, SCBlock]]:
-    """解密main文件"""
-    # 读取文件
-    with open(input_path, 'rb') as f:
-        data = f.read()
-    
+    def encrypt_incremental(self, data: bytes, blocks: Dict[str, SCBlock]) -> bytes:
+        """增量重新加密：只重写被修改过的块
+
+        Args:
+            data: decrypt时使用的原始加密存档
+            blocks: decrypt返回的块字典或SCBlockMap（可增删块）
+
+        未修改的块直接复用原存档中的密文。若所有块的位置和大小都不变，
+        在原存档副本上原地替换脏块对应的区间，只对这些区间重新做StaticXorpad；
+        否则按新布局拼接，未修改块的密文原样搬移到新偏移。
+        最后重新计算末尾哈希。
+        """
+        lazy = isinstance(blocks, SCBlockMap)
+        entries = []
+        for name in blocks:
+            if lazy:
+                block = blocks.peek(name)
+                header = blocks.headers[name]
+                span = (header.offset, header.end - header.offset)
+            else:
+                block = blocks[name]
+                span = block.SourceSpan
+            if block is not None and not block.Dirty and span is not None:
+                block = None
+            entries.append((block, span))
+        
+        # 判断布局是否与原存档完全一致
+        same_layout = True
+        offset = 0
+        for block, span in entries:
+            size = span[1] if block is None else block.get_encoded_size()
+            if span is None or span[0] != offset or span[1] != size:
+                same_layout = False
+                break
+            offset += size
+        same_layout = same_layout and offset + self.hash_size == len(data)
+        
+        if same_layout:
+            result = bytearray(data)
+            xorpad_len = len(self.static_xorpad)
+            for block, span in entries:
+                if block is None:
+                    continue
+                start, size = span
+                encoded = bytearray(size)
+                block.write_into(encoded, 0)
+                phase = start % xorpad_len
+                pad = self.get_tiled_xorpad(phase + size)[phase:]
+                result[start:start + size] = xor_bytes(encoded, pad)
+                block.Dirty = False
+        else:
+            # 去除StaticXorpad后，块密文与位置无关，可以直接搬移
+            source = bytearray(data)
+            self.crypt_static_xorpad_bytes(source)
+            data_size = sum(span[1] if block is None else block.get_encoded_size() for block, span in entries)
+            result = bytearray(data_size + self.hash_size)
+            offset = 0
+            for block, span in entries:
+                if block is None:
+                    start, size = span
+                    result[offset:offset + size] = source[start:start + size]
+                    offset += size
+                else:
+                    new_offset = block.write_into(result, offset)
+                    block.SourceSpan = (offset, new_offset - offset)
+                    block.Dirty = False
+                    offset = new_offset
+            if not lazy:
+                # 未修改块的位置也随之平移，便于对新存档继续增量写入
+                offset = 0
+                for name in blocks:
+                    block = blocks[name]
+                    size = block.SourceSpan[1]
+                    block.SourceSpan = (offset, size)
+                    block.Offset = offset
+                    offset += size
+            self.crypt_static_xorpad_bytes(result)
+        
+        result[-self.hash_size:] = self.compute_hash(result)
+        result = bytes(result)
+        if lazy and not same_layout:
+            self._rebase_block_map(blocks, result)
+        return result
+
+    def _rebase_block_map(self, blocks: 'SCBlockMap', data: bytes) -> None:
+        """布局改变后，让SCBlockMap改为读取新存档，并按新偏移重建所有块头
+
+        否则未访问过的块仍指向旧存档的偏移，对新存档再次增量写入时会拼接到错误位置。
+        """
+        reader = SaveFileReader.from_buffer(data, self)
+        offset = 0
+        for name in blocks:
+            header = reader.read_header(offset)
+            if header is None or f"0x{header.key:08X}" != name:
+                raise ValueError(f"重新定位块 {name} 失败（偏移 {offset}）")
+            blocks.headers[name] = header
+            block = blocks.peek(name)
+            if block is not None:
+                block.Offset = header.offset
+                block.SourceSpan = (header.offset, header.end - header.offset)
+            offset = header.end
+        blocks.data_region = reader
+
+class SCBlockIndex:
+    """存档块索引
+
+    一次扫描记录全部块的键、类型、偏移与长度，之后可按键O(1)定位任意块。
+    索引以"存档大小 + SHA-256"为键持久化到config目录，
+    同一存档（或同布局存档）再次加载时无需重新扫描。
+    """
+    def __init__(self, save_size: int, sha256: str, headers: List[SCBlockHeader]):
+        self.save_size = save_size
+        self.sha256 = sha256
+        self.headers = headers
+        self._by_key = {header.key: header for header in headers}
+
+    def __len__(self) -> int:
+        return len(self.headers)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._by_key
+
+    def get(self, key: int) -> Optional[SCBlockHeader]:
+        """按块键获取块头"""
+        return self._by_key.get(key)
+
+    def locate(self, data_region, key: int) -> Optional[SCBlockHeader]:
+        """在数据区域（或SaveFileReader）中定位块，并确认记录的偏移处确实是该块"""
+        header = self._by_key.get(key)
+        if header is None:
+            return None
+        actual = _read_header_from(data_region, header.offset)
+        if actual is None or actual.key != key:
+            return None
+        return actual
+
+    def validate(self, data_region) -> bool:
+        """确认每个记录的块头在数据区域中都与记录完全一致（键、类型、偏移、长度）"""
+        for header in self.headers:
+            if _read_header_from(data_region, header.offset) != header:
+                return False
+        return True
+
+    @staticmethod
+    def scan(data_region, stats: 'DecryptStats' = None) -> List[SCBlockHeader]:
+        """顺序扫描整个数据区域（或SaveFileReader），只解析块头"""
+        if stats is None:
+            stats = DecryptStats()
+        headers = []
+        offset = 0
+        region_len = len(data_region)
+        while offset + 5 <= region_len:
+            header = _read_header_from(data_region, offset)
+            if header is None:
+                # 逐字节寻找下一个可信的块头，整段记为损坏区间；
+                # 损坏的块可能与KBox一样大，不限制搜索长度，每个位置的工作量由RESYNC_LOOKAHEAD限定
+                next_offset = SCBlockIndex.find_resync_offset(data_region, offset + 1)
+                skipped = next_offset - offset
+                stats.resync_attempts += 1
+                stats.bytes_skipped += skipped
+                stats.skipped_spans.append((offset, skipped))
+                logger.debug("偏移量 %d 处块头无效，跳过 %d 字节后重新同步", offset, skipped)
+                offset = next_offset
+                continue
+            headers.append(header)
+            stats.blocks_parsed += 1
+            offset = header.end
+            
+            if logger.isEnabledFor(logging.DEBUG) and stats.blocks_parsed % 100 == 0:
+                logger.debug("已处理 %d 个块，当前偏移量: %d/%d", stats.blocks_parsed, offset, region_len)
+            
+            # 块数量远超real main中的块数量(5184)时提前结束
+            if stats.blocks_parsed > MAX_BLOCK_COUNT:
+                logger.debug("块数量(%d)超过预期，提前结束扫描", stats.blocks_parsed)
+                break
+        stats.bytes_skipped += region_len - offset
+        return headers
+
+    @staticmethod
+    def find_resync_offset(data_region, start: int, limit: Optional[int] = None) -> int:
+        """从start开始寻找下一个可信块头的偏移，找不到时返回数据区域末尾
+
+        limit给出时只搜索到该偏移为止，仍未找到则同样返回数据区域末尾。
+
+        每个候选位置先做廉价检查（类型字节、大小与剩余长度），
+        通过后才完整解析，并要求其后RESYNC_LOOKAHEAD个块也能解析。
+        每个位置的工作量有上限，整体扫描保持线性。
+        """
+        region_len = len(data_region)
+        is_reader = isinstance(data_region, SaveFileReader)
+        tables = SCXorShift32._advance_tables or SCXorShift32._build_advance_tables()
+        unpack_from = struct.unpack_from
+        end = region_len - 4 if limit is None else min(region_len - 4, limit)
+        pos = start
+        while pos < end:
+            if is_reader:
+                base = pos
+                window = data_region.read_region(base, RESYNC_WINDOW + 9)
+                stop = min(end, base + RESYNC_WINDOW)
+            else:
+                base = 0
+                window = data_region
+                stop = end
+            for candidate in range(pos, stop):
+                local = candidate - base
+                # 先只比较解密后的类型字节，绝大多数位置在这里被排除
+                key = unpack_from('<I', window, local)[0]
+                t = tables[bin(key).count("1")]
+                first = t[0][key & 0xFF] ^ t[1][(key >> 8) & 0xFF] ^ t[2][(key >> 16) & 0xFF] ^ t[3][key >> 24]
+                if (window[local + 4] ^ first) & 0xFF not in _VALID_TYPE_CODES:
+                    continue
+                if (_quick_header_check(window, local, region_len - candidate)
+                        and SCBlockIndex._is_trusted_header(data_region, candidate)):
+                    return candidate
+            pos = stop
+        return region_len
+
+    @staticmethod
+    def _is_trusted_header(data_region, offset: int) -> bool:
+        """完整解析候选块头，并确认其后的若干块头同样有效"""
+        header = _read_header_from(data_region, offset)
+        if header is None:
+            return False
+        region_len = len(data_region)
+        following = header.end
+        for _ in range(RESYNC_LOOKAHEAD):
+            if following + 5 > region_len:
+                return True
+            header = _read_header_from(data_region, following)
+            if header is None:
+                return False
+            following = header.end
+        return True
+
+    @classmethod
+    def build(cls, data_region, save_size: int, sha256: str) -> 'SCBlockIndex':
+        """扫描数据区域并构建索引"""
+        return cls(save_size, sha256, cls.scan(data_region))
+
+    def to_dict(self) -> Dict:
+        """转换为可写入JSON的结构"""
+        return {
+            "save_size": self.save_size,
+            "sha256": self.sha256,
+            "blocks": [
+                [h.key, SCBlock.get_type_code(h.type),
+                 SCBlock.get_type_code(h.sub_type) if h.sub_type else None,
+                 h.offset, h.payload_offset, h.payload_size]
+                for h in self.headers
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, obj: Dict) -> 'SCBlockIndex':
+        """从JSON结构恢复索引"""
+        headers = []
+        for key, type_code, sub_type_code, offset, payload_offset, payload_size in obj["blocks"]:
+            sub_type = SCBlock.get_type_name(sub_type_code) if sub_type_code is not None else None
+            headers.append(SCBlockHeader(key, SCBlock.get_type_name(type_code), sub_type,
+                                         offset, payload_offset, payload_size))
+        return cls(obj["save_size"], obj["sha256"], headers)
+
+class SaveFileReader:
+    """基于mmap的存档读取器
+
+    文件只映射一次，块头和载荷通过memoryview切片访问；
+    只有真正需要解密的字节（块头窗口、被读取的块载荷）才会被复制。
+    同一个读取器可以服务任意多次块查找。
+    """
+    # 块头最长10字节：键4 + 类型1 + 大小4 + 子类型1
+    HEADER_WINDOW = 10
+
+    def __init__(self, path: str, crypto: 'SwishCrypto' = None):
+        self.path = path
+        self.crypto = crypto or SwishCrypto()
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # 空文件无法映射
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.view = memoryview(self._mmap) if self._mmap is not None else memoryview(b"")
+        self._digests = _get_file_digest_entry(path)
+        hash_size = self.crypto.hash_size
+        self.region_size = size - hash_size if size > hash_size else size
+
+    @classmethod
+    def from_buffer(cls, data, crypto: 'SwishCrypto' = None) -> 'SaveFileReader':
+        """用内存中的加密存档构建读取器（不复制数据，哈希结果不做文件级缓存）"""
+        reader = cls.__new__(cls)
+        reader.path = None
+        reader.crypto = crypto or SwishCrypto()
+        reader._file = None
+        reader._mmap = None
+        reader.view = memoryview(data)
+        reader._digests = {}
+        hash_size = reader.crypto.hash_size
+        reader.region_size = len(data) - hash_size if len(data) > hash_size else len(data)
+        return reader
+
+    def __enter__(self) -> 'SaveFileReader':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """数据区域长度（不含末尾哈希）"""
+        return self.region_size
+
+    def close(self) -> None:
+        """释放映射和文件句柄"""
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def is_hash_valid(self) -> bool:
+        """检查文件哈希是否有效（同一文件未改动时直接使用缓存结果）"""
+        valid = self._digests.get("hash_valid")
+        if valid is None:
+            valid = self.crypto.get_is_hash_valid(self.view)
+            self._digests["hash_valid"] = valid
+        return valid
+
+    def file_sha256(self) -> str:
+        """整个文件的SHA-256（块索引的键），同样按文件缓存"""
+        digest = self._digests.get("sha256")
+        if digest is None:
+            digest = hashlib.sha256(self.view).hexdigest()
+            self._digests["sha256"] = digest
+        return digest
+
+    def read_region(self, start: int, length: int) -> bytes:
+        """读取数据区域中的一段，并去除StaticXorpad"""
+        end = min(start + length, self.region_size)
+        if start >= end:
+            return b""
+        phase = start % len(self.crypto.static_xorpad)
+        pad = self.crypto.get_tiled_xorpad(phase + end - start)[phase:]
+        return xor_bytes(self.view[start:end], pad)
+
+    def read_header(self, offset: int) -> Optional[SCBlockHeader]:
+        """解析指定偏移处的块头，只解密块头窗口"""
+        window = self.read_region(offset, self.HEADER_WINDOW)
+        header = SCBlock.read_header(window, 0, limit=self.region_size - offset)
+        if header is None:
+            return None
+        return header._replace(offset=offset, payload_offset=offset + header.payload_offset)
+
+    def read_block(self, header: SCBlockHeader) -> SCBlock:
+        """解密块头对应的载荷"""
+        return SCBlock.from_payload(header, self.read_region(header.payload_offset, header.payload_size))
+
+    def read_block_at(self, offset: int) -> Optional[SCBlock]:
+        """解密指定偏移处的块"""
+        header = self.read_header(offset)
+        if header is None:
+            return None
+        return self.read_block(header)
+
+    def get_block_index(self, required_keys=()) -> 'SCBlockIndex':
+        """获取该存档的块索引"""
+        return get_block_index(self.view, self, required_keys, sha256=self.file_sha256())
+
+def _get_file_digest_entry(path: str) -> Dict:
+    """按(路径, 大小, 修改时间)获取文件的哈希缓存项，文件变动后自动失效"""
+    st = os.stat(path)
+    cache_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    entry = _file_digest_cache.get(cache_key)
+    if entry is None:
+        if len(_file_digest_cache) >= FILE_DIGEST_CACHE_SIZE:
+            _file_digest_cache.clear()
+        entry = {}
+        _file_digest_cache[cache_key] = entry
+    return entry
+
+def _quick_header_check(buf, pos: int, available: int) -> bool:
+    """不构造SCXorShift32，只用推进后的种子检查块头是否可能有效
+
+    Args:
+        buf: 已去除StaticXorpad的数据（可以是窗口）
+        pos: 候选块头在buf中的位置
+        available: 从候选位置到数据区域末尾的字节数
+    """
+    if available < 5 or pos + 5 > len(buf):
+        return False
+    seed = SCXorShift32.advanced_seed(struct.unpack_from('<I', buf, pos)[0])
+    type_code = buf[pos + 4] ^ (seed & 0xFF)
+    if type_code == 4 or type_code == 5:
+        if available < 9 or pos + 9 > len(buf):
+            return False
+        # next32紧接在类型字节之后：当前状态的高3字节 + 下一状态的最低字节
+        xor_value = (seed >> 8) | ((SCXorShift32.xorshift_advance(seed) & 0xFF) << 24)
+        value = struct.unpack_from('<I', buf, pos + 5)[0] ^ xor_value
+        if type_code == 4:
+            return 0 < value <= available - 9
+        return 0 < value <= 1000000 and value <= available - 10
+    size = _SCALAR_TYPE_SIZES.get(type_code)
+    return size is not None and available >= 5 + size
+
+def _read_header_from(source, offset: int) -> Optional[SCBlockHeader]:
+    """从数据区域或SaveFileReader读取块头"""
+    if isinstance(source, SaveFileReader):
+        return source.read_header(offset)
+    return SCBlock.read_header(source, offset)
+
+def _block_index_path() -> Optional[str]:
+    """块索引文件路径；缺少file_manager时返回None（不持久化）"""
+    if get_config_dir is None:
+        return None
+    return os.path.join(get_config_dir(), BLOCK_INDEX_FILENAME)
+
+def _load_block_index_store() -> Dict:
+    path = _block_index_path()
+    if path is None or not os.path.isfile(path):
+        return {"version": BLOCK_INDEX_VERSION, "saves": []}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            store = json.load(f)
+        if isinstance(store, dict) and store.get("version") == BLOCK_INDEX_VERSION:
+            return store
+    except (IOError, ValueError):
+        pass
+    return {"version": BLOCK_INDEX_VERSION, "saves": []}
+
+def _save_block_index_store(store: Dict) -> None:
+    path = _block_index_path()
+    if path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(store, f, separators=(",", ":"))
+    except IOError as e:
+        print(f"保存块索引时出错: {e}")
+
+def load_block_index(save_size: int, sha256: str) -> Optional[SCBlockIndex]:
+    """读取持久化的块索引
+
+    优先返回哈希完全一致的索引；没有时返回同尺寸存档的最新索引（可能同布局），
+    调用方需通过SCBlockIndex.validate确认所有块头仍然有效。
+    """
+    same_size = None
+    for entry in _load_block_index_store()["saves"]:
+        if entry.get("save_size") != save_size:
+            continue
+        if entry.get("sha256") == sha256:
+            return SCBlockIndex.from_dict(entry)
+        if same_size is None:
+            same_size = entry
+    if same_size is not None:
+        return SCBlockIndex.from_dict(same_size)
+    return None
+
+def save_block_index(index: SCBlockIndex) -> None:
+    """持久化块索引，最近使用的排在最前"""
+    store = _load_block_index_store()
+    saves = [entry for entry in store["saves"]
+             if not (entry.get("save_size") == index.save_size and entry.get("sha256") == index.sha256)]
+    saves.insert(0, index.to_dict())
+    store["saves"] = saves[:BLOCK_INDEX_MAX_SAVES]
+    _save_block_index_store(store)
+
+def get_block_index(data: bytes, data_region, required_keys=(), sha256: str = None) -> SCBlockIndex:
+    """获取存档的块索引，必要时扫描并持久化
+
+    Args:
+        data: 原始（加密）存档数据，用于计算索引键
+        data_region: 已去除StaticXorpad的数据区域，或SaveFileReader
+        required_keys: 必须能在记录偏移处定位到的块键，校验失败则重新扫描
+        sha256: 已知的存档SHA-256，省略时现场计算
+    """
+    save_size = len(data)
+    if sha256 is None:
+        sha256 = hashlib.sha256(data).hexdigest()
+
+    index = load_block_index(save_size, sha256)
+    if index is not None and index.sha256 != sha256:
+        # 只是同尺寸的其他存档：全部块头都核对一致才视为同布局，
+        # 以新哈希登记一份，下次直接命中；否则重新扫描
+        if index.validate(data_region):
+            index = SCBlockIndex(save_size, sha256, index.headers)
+            save_block_index(index)
+        else:
+            index = None
+    if index is not None and all(index.locate(data_region, key) is not None for key in required_keys):
+        return index
+
+    index = SCBlockIndex.build(data_region, save_size, sha256)
+    print(f"已扫描存档块索引: {len(index)} 个块")
+    save_block_index(index)
+    return index
+
+def decrypt_main_file(input_path: str, output_path: str, lazy: bool = False) -> Tuple[bytes, Dict[str, SCBlock]]:
+    """解密main文件
+
+    lazy为True时返回按需解密的SCBlockMap，直接读取映射的文件，只有被访问的块才会解密；
+    此时第一个返回值为SaveFileReader，用完后调用blocks.close()释放映射。
+    output_path为空时不写出解密后的数据。
+    """
     # 创建解密器
     crypto = SwishCrypto()
     
-    # 解密数据
-    decrypted_data, blocks = crypto.decrypt(data)
+    if lazy:
+        reader = SaveFileReader(input_path, crypto)
+        if not reader.is_hash_valid():
+            print("警告：文件哈希无效，可能不是有效的保存文件")
+        decrypted_data, blocks = crypto.decrypt(reader, lazy=True, verify_hash=False)
+        if output_path:
+            # 分段去除StaticXorpad写出，不在内存中组装整份解密数据
+            with open(output_path, 'wb') as f:
+                for start in range(0, len(reader), RESYNC_WINDOW * 64):
+                    f.write(reader.read_region(start, RESYNC_WINDOW * 64))
+        return decrypted_data, blocks
+    
+    # 校验哈希（结果按文件缓存）并直接从映射解密
+    with SaveFileReader(input_path, crypto) as reader:
+        if not reader.is_hash_valid():
+            print("警告：文件哈希无效，可能不是有效的保存文件")
+        decrypted_data, blocks = crypto.decrypt(reader.view, verify_hash=False)
     
     # 保存解密后的数据
-    with open(output_path, 'wb') as f:
-        f.write(decrypted_data)
+    if output_path:
+        with open(output_path, 'wb') as f:
+            f.write(decrypted_data)
     
     return decrypted_data, blocks
 
@@ -685,64 +1285,50 @@ def extract_kbox_kparty(blocks: Dict[str, SCBlock], output_dir: str):
     else:
         print("未找到KParty块")
 
-def decrypt_block_at_offset(input_path: str, offset: int, output_dir: str = None) -> SCBlock:
-    """直接跳转到特定偏移位置解密并提取数据"""
-    import os
-    # 读取文件
-    with open(input_path, 'rb') as f:
-        data = f.read()
-    
-    # 创建解密器
-    crypto = SwishCrypto()
-    
-    # 首先检查哈希是否有效
-    if not crypto.get_is_hash_valid(data):
-        print("警告：文件哈希无效，可能不是有效的保存文件")
-    
-    # 创建数据的可写副本
-    decrypted = bytearray(data)
-    
-    # 使用StaticXorpad解密数据（除了最后的哈希部分）
-    crypto.crypt_static_xorpad_bytes(decrypted)
-    
-    # 只处理除哈希外的数据区域
-    data_region = decrypted[:-crypto.hash_size] if len(decrypted) > crypto.hash_size else decrypted
+def decrypt_block_at_offset(input_path: str, offset: int, output_dir: str = None,
+                            reader: SaveFileReader = None) -> SCBlock:
+    """直接跳转到特定偏移位置解密并提取数据
+
+    传入已打开的reader时复用其映射，多次查找不会重复读取和解密整个文件。
+    """
+    if reader is None:
+        with SaveFileReader(input_path) as own_reader:
+            if not own_reader.is_hash_valid():
+                print("警告：文件哈希无效，可能不是有效的保存文件")
+            return decrypt_block_at_offset(input_path, offset, output_dir, own_reader)
     
     # 检查偏移量是否有效
-    if offset < 0 or offset >= len(data_region):
-        print(f"错误：偏移量 {offset} 超出数据区域范围 (0-{len(data_region)-1})")
+    if offset < 0 or offset >= len(reader):
+        print(f"错误：偏移量 {offset} 超出数据区域范围 (0-{len(reader)-1})")
         return None
     
-    print(f"调试：尝试在偏移量 {offset} 处解密块")
+    logger.debug("尝试在偏移量 %d 处解密块", offset)
     
     # 直接在指定偏移量处解密块
-    block, new_offset = SCBlock.read_from_offset(data_region, offset)
+    block = reader.read_block_at(offset)
     
     if block is None:
-        print(f"调试：在偏移量 {offset} 处无法解密块")
+        logger.debug("在偏移量 %d 处无法解密块", offset)
         return None
     
-    # print(f"调试：成功在偏移量 {offset} 处解密块")
-    # print(f"调试：块信息 - 键: 0x{block.Key:08X}, 类型: {block.Type}, 数据大小: {len(block.data)} 字节")
-    
     # 如果指定了输出目录，则保存块数据
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
         
-        if block.Key == 0x2985FE5D:  # KParty的键值
+        if block.Key == KPARTY_KEY:  # KParty的键值
             output_path = f"{output_dir}/KPartyData.bin"
-            print(f"调试：找到KParty块，保存到 {output_path}")
-        elif block.Key == 0x0D66012C:  # KBox的键值
+            logger.debug("找到KParty块，保存到 %s", output_path)
+        elif block.Key == KBOX_KEY:  # KBox的键值
             output_path = f"{output_dir}/KBoxData.bin"
-            print(f"调试：找到KBox块，保存到 {output_path}")
+            logger.debug("找到KBox块，保存到 %s", output_path)
         else:
             output_path = f"{output_dir}/Block_0x{block.Key:08X}.bin"
-            print(f"调试：找到其他块，保存到 {output_path}")
+            logger.debug("找到其他块，保存到 %s", output_path)
         
         with open(output_path, 'wb') as f:
             f.write(block.data)
         
-        print(f"调试：块数据已保存到 {output_path}")
+        logger.debug("块数据已保存到 %s", output_path)
     
     return block
 
@@ -766,15 +1352,16 @@ def process_main_file(main_file_path: str, output_dir: str = ""):
     print(f"处理main文件: {main_file_path}")
     print(f"输出目录: {output_dir}")
     
-    # 根据blocks_info.json中的信息，KParty块的偏移量是572209，KBox块的偏移量是23710
-    kparty_offset = 572209
-    kbox_offset = 23710
-    
-    # print(f"\n尝试直接解密KParty块（偏移量: {kparty_offset}）...")
-    kparty_block = decrypt_block_at_offset(main_file_path, kparty_offset)  # 不保存到文件
-    
-    # print(f"\n尝试直接解密KBox块（偏移量: {kbox_offset}）...")
-    kbox_block = decrypt_block_at_offset(main_file_path, kbox_offset)  # 不保存到文件
+    # 通过块索引定位KParty和KBox，不再依赖固定偏移量；整个过程只映射一次文件
+    with SaveFileReader(main_file_path) as reader:
+        if not reader.is_hash_valid():
+            print("警告：文件哈希无效，可能不是有效的保存文件")
+        index = reader.get_block_index(required_keys=(KPARTY_KEY, KBOX_KEY))
+        
+        kparty_header = index.get(KPARTY_KEY)
+        kbox_header = index.get(KBOX_KEY)
+        kparty_block = reader.read_block(kparty_header) if kparty_header else None
+        kbox_block = reader.read_block(kbox_header) if kbox_header else None
     
     # 检查是否成功解密了两个块
     if kparty_block is None:
@@ -804,11 +1391,13 @@ def process_main_file(main_file_path: str, output_dir: str = ""):
         else:
             output_file = os.path.join("config", "pokemon_main_info.json")
             
-        json_file = analyze_pk8.generate_pokemon_main_info_json_from_data(
+        # 只需要写出文件，不保留全部盒子数据
+        analyze_pk8.generate_pokemon_main_info_json_from_data(
             kparty_block.data, 
             kbox_block.data, 
             encrypted=True, 
-            output_file=output_file
+            output_file=output_file,
+            return_data=False
         )
         
         print(f"\n=== 处理完成 ===")
@@ -823,6 +1412,8 @@ def process_main_file(main_file_path: str, output_dir: str = ""):
         return False
 
 if __name__ == "__main__":
+    # 调试入口保留完整的块解析输出
+    set_trace(True)
     main_file_path = get_dev_path("main_file_for_debug")
     output_dir = get_dev_path("real_main_output_dir")
     if not main_file_path or not output_dir:
@@ -1,3 +1,4 @@
+import multiprocessing
 import tkinter as tk
 
 from Pokemon import PokemonToolsApp
@@ -10,5 +11,7 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # 打包版本中进程池的子进程不重新启动界面
+    multiprocessing.freeze_support()
     main()
 
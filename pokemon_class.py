@@ -11,6 +11,23 @@ try:
 except ImportError:
     pass
 
+try:
+    from pokemon_snapshot import load_snapshot, get_snapshot_path, is_snapshot_current
+except ImportError:
+    load_snapshot = None
+
+# 宝可梦ID到名称的映射，首次使用时加载一次，所有宝可梦共享
+_id_name_map = None
+
+
+def get_id_name_map(reload=False):
+    """获取宝可梦ID和名称映射（带缓存）"""
+    global _id_name_map
+    if _id_name_map is None or reload:
+        _id_name_map = safe_load_file("pokemon_internal_id_name.json", "json") or {}
+    return _id_name_map
+
+
 class Pokemon:
     """宝可梦类，封装宝可梦的数据和行为"""
     
@@ -71,7 +88,7 @@ class Pokemon:
         """根据species ID获取宝可梦名称"""
         try:
             # 加载宝可梦ID和名称映射
-            id_name_map = safe_load_file("pokemon_internal_id_name.json", "json")
+            id_name_map = get_id_name_map()
             if id_name_map:
                 species_id = str(self.species)
                 return id_name_map.get(species_id, f"未知宝可梦({species_id})")
@@ -167,6 +184,7 @@ class PokemonManager:
         self.boxes = {}  # 盒子中的宝可梦，格式为 {box_key: [Pokemon]}
         self.all_pokemon = []  # 所有宝可梦的列表
         self.last_modified_time = 0  # 最后修改时间
+        self._query_index = None  # 查询索引，数据重新加载后按需重建
         
         # 处理main_info_path，确保使用正确的配置目录
         if main_info_path is None:
@@ -181,11 +199,24 @@ class PokemonManager:
         else:
             self.main_info_path = main_info_path
     
+    def _load_main_info(self):
+        """加载宝可梦主要信息，快照不比JSON旧时优先读取二进制快照
+
+        Returns:
+            (main_info, 实际读取的文件路径)
+        """
+        if load_snapshot and is_snapshot_current(self.main_info_path):
+            snapshot_path = get_snapshot_path(self.main_info_path)
+            main_info = load_snapshot(snapshot_path)
+            if main_info is not None:
+                return main_info, snapshot_path
+        return safe_load_file(self.main_info_path, "json"), self.main_info_path
+
     def load_pokemon_data(self):
-        """从JSON文件加载宝可梦数据"""
+        """从快照或JSON文件加载宝可梦数据"""
         try:
             # 加载宝可梦主要信息
-            main_info = safe_load_file(self.main_info_path, "json")
+            main_info, loaded_path = self._load_main_info()
             if main_info is None:  # 文件不存在或无法解析
                 # 不再打印警告信息，允许程序使用空数据继续运行
                 main_info = {}  # 使用空字典作为默认值
@@ -194,6 +225,7 @@ class PokemonManager:
             self.team = []
             self.boxes = {}
             self.all_pokemon = []
+            self._query_index = None
             
             # 处理队伍数据
             party_data = main_info.get("party", {})
@@ -225,9 +257,8 @@ class PokemonManager:
                         self.boxes[box_key].append(None)
             
             # 更新最后修改时间
-            import os
-            if os.path.exists(self.main_info_path):
-                self.last_modified_time = os.path.getmtime(self.main_info_path)
+            if os.path.exists(loaded_path):
+                self.last_modified_time = os.path.getmtime(loaded_path)
             else:
                 self.last_modified_time = 0
             return True
@@ -253,6 +284,28 @@ class PokemonManager:
                     return pokemon
         return None
     
+    def get_query_index(self):
+        """获取基于当前所有宝可梦建立的查询索引（首次调用时建立）"""
+        if self._query_index is None:
+            from pokemon_query import PokemonQueryIndex
+            self._query_index = PokemonQueryIndex.from_pokemon_list(self.all_pokemon)
+        return self._query_index
+    
+    def query_pokemon(self, sort_by=None, reverse=False, limit=None, **filters):
+        """
+        按条件查询宝可梦，例如 query_pokemon(shiny=True, iv_spe=31, nature="胆小")
+        
+        Args:
+            sort_by: 排序字段或字段元组，如"iv_total"
+            reverse: 是否降序
+            limit: 最多返回的数量
+            **filters: 筛选条件，字段见pokemon_query.QUERY_FIELDS
+            
+        Returns:
+            list: 宝可梦对象列表
+        """
+        return self.get_query_index().query(sort_by=sort_by, reverse=reverse, limit=limit, **filters)
+    
     def get_team_pokemon(self):
         """获取队伍中的所有宝可梦（过滤掉空槽位）"""
         return [p for p in self.team if p is not None]
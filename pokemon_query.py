@@ -0,0 +1,312 @@
+"""
+宝可梦查询索引模块
+根据解析后的宝可梦数据（pokemon_main_info中的字典）建立倒排索引，
+支持"闪光 + 速度31 + 胆小"之类的组合条件筛选和排序，可供界面和命令行共用
+"""
+
+import argparse
+import os
+import sys
+
+# 可以作为筛选条件和排序字段的字段
+QUERY_FIELDS = (
+    "species", "shiny", "is_egg", "nature", "level", "held_item", "met_location",
+    "iv_total", "iv_hp", "iv_atk", "iv_def", "iv_spa", "iv_spd", "iv_spe", "source",
+)
+IV_STATS = ("hp", "atk", "def", "spa", "spd", "spe")
+
+
+def _record_values(record, source):
+    """从宝可梦字典中取出所有索引字段的值"""
+    ivs = record.get("ivs", {})
+    values = {
+        "species": record.get("species", 0),
+        "shiny": bool(record.get("shiny", False)),
+        "is_egg": bool(record.get("is_egg", False)),
+        "nature": record.get("nature_value", 0),
+        "level": record.get("level", 0),
+        "held_item": record.get("held_item", 0),
+        "met_location": record.get("met_location", 0),
+        "iv_total": sum(ivs.get(stat, 0) for stat in IV_STATS),
+        "source": source,
+    }
+    for stat in IV_STATS:
+        values[f"iv_{stat}"] = ivs.get(stat, 0)
+    return values
+
+
+def _iter_main_info(main_info):
+    """按队伍、盒子顺序列出所有非空槽位：(宝可梦字典, 位置信息)"""
+    for i, record in sorted(main_info.get("party", {}).items(), key=lambda item: int(item[0])):
+        if record:
+            yield record, {"type": "team", "index": int(i) - 1}
+    for box_name, box_info in sorted(main_info.get("box", {}).items(),
+                                     key=lambda item: int(item[0].replace("box", ""))):
+        box_num = int(box_name.replace("box", ""))
+        for slot, record in sorted(box_info.items(), key=lambda item: int(item[0])):
+            if record:
+                yield record, {"type": "box", "box": box_num, "index": int(slot) - 1}
+
+
+class PokemonQueryIndex:
+    """宝可梦查询索引
+
+    每个字段的每个取值对应一个位掩码（第i位表示第i条记录），
+    组合筛选只需对掩码做按位与，几百到几千条记录的查询在微秒级完成。
+    可以通过多次add_main_info合并多个存档的数据，并用source字段区分。
+    """
+
+    def __init__(self):
+        self.items = []  # 每条记录关联的对象（如Pokemon对象或位置信息）
+        self.records = []  # 每条记录的原始字典
+        self._columns = {field: [] for field in QUERY_FIELDS}
+        self._postings = {field: {} for field in QUERY_FIELDS}
+        self._range_cache = {}
+        self._all_mask = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, record, item=None, source=""):
+        """添加一条记录
+
+        Args:
+            record: 宝可梦字典（parse_pk8_to_dict / pokemon_main_info中的格式）
+            item: 查询结果中返回的关联对象，默认为record本身
+            source: 来源（如存档名称），可作为筛选条件
+        """
+        row = len(self.records)
+        bit = 1 << row
+        self.records.append(record)
+        self.items.append(record if item is None else item)
+        for field, value in _record_values(record, source).items():
+            self._columns[field].append(value)
+            postings = self._postings[field]
+            postings[value] = postings.get(value, 0) | bit
+        self._all_mask |= bit
+        self._range_cache.clear()
+
+    def add_main_info(self, main_info, source=""):
+        """添加pokemon_main_info中的所有宝可梦，关联对象为 {"source", "position", "record"}"""
+        for record, position in _iter_main_info(main_info):
+            self.add(record, {"source": source, "position": position, "record": record}, source)
+
+    @classmethod
+    def from_main_info(cls, main_info, source=""):
+        index = cls()
+        index.add_main_info(main_info, source)
+        return index
+
+    @classmethod
+    def from_pokemon_list(cls, pokemon_list):
+        """从Pokemon对象列表建立索引，查询结果为Pokemon对象"""
+        index = cls()
+        for pokemon in pokemon_list:
+            index.add(pokemon.data, pokemon)
+        return index
+
+    def _resolve_value(self, field, value):
+        if field == "nature" and isinstance(value, str):
+            nature_id = get_nature_id(value)
+            if nature_id is None:
+                raise ValueError(f"未知的性格: {value}")
+            return nature_id
+        return value
+
+    def _mask(self, field, condition):
+        """计算单个筛选条件对应的位掩码
+
+        condition可以是单个值（相等）、(最小值, 最大值)元组（闭区间，一端可为None）、
+        或列表/集合（任一取值）
+        """
+        if field not in self._postings:
+            raise KeyError(f"不支持的查询字段: {field}")
+        postings = self._postings[field]
+        if isinstance(condition, tuple):
+            low, high = condition
+            cache_key = (field, low, high)
+            mask = self._range_cache.get(cache_key)
+            if mask is None:
+                mask = 0
+                for value, value_mask in postings.items():
+                    if (low is None or value >= low) and (high is None or value <= high):
+                        mask |= value_mask
+                self._range_cache[cache_key] = mask
+            return mask
+        if isinstance(condition, (list, set, frozenset)):
+            mask = 0
+            for value in condition:
+                mask |= postings.get(self._resolve_value(field, value), 0)
+            return mask
+        return postings.get(self._resolve_value(field, condition), 0)
+
+    def match(self, **filters):
+        """返回满足所有条件的记录编号（按添加顺序）"""
+        mask = self._all_mask
+        for field, condition in filters.items():
+            if condition is None:
+                continue
+            mask &= self._mask(field, condition)
+            if not mask:
+                return []
+        rows = []
+        while mask:
+            low_bit = mask & -mask
+            rows.append(low_bit.bit_length() - 1)
+            mask ^= low_bit
+        return rows
+
+    def count(self, **filters):
+        return len(self.match(**filters))
+
+    def query(self, sort_by=None, reverse=False, limit=None, **filters):
+        """组合条件查询
+
+        例如 query(shiny=True, iv_spe=31, nature="胆小", sort_by="iv_total", reverse=True)
+
+        Args:
+            sort_by: 排序字段，或多个字段组成的元组
+            reverse: 是否降序
+            limit: 最多返回的条数
+            **filters: 筛选条件，字段见QUERY_FIELDS
+
+        Returns:
+            匹配记录关联的对象列表
+        """
+        rows = self.match(**filters)
+        if sort_by:
+            fields = (sort_by,) if isinstance(sort_by, str) else tuple(sort_by)
+            columns = [self._columns[field] for field in fields]
+            rows.sort(key=lambda row: tuple(column[row] for column in columns), reverse=reverse)
+        if limit is not None:
+            rows = rows[:limit]
+        return [self.items[row] for row in rows]
+
+
+_nature_ids = None
+
+
+def get_nature_id(name):
+    """根据性格名称获取性格ID，找不到时返回None"""
+    global _nature_ids
+    if _nature_ids is None:
+        try:
+            from core.static_data import nature_map
+            _nature_ids = {value: key for key, value in nature_map.items()}
+        except ImportError:
+            _nature_ids = {}
+    return _nature_ids.get(name)
+
+
+def load_main_info(path):
+    """读取pokemon_main_info（.bin快照或.json）"""
+    if path.endswith(".bin"):
+        from pokemon_snapshot import load_snapshot
+        main_info = load_snapshot(path)
+        if main_info is None:
+            raise ValueError(f"无法读取快照: {path}")
+        return main_info
+    import json
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _parse_range(text):
+    """解析命令行中的取值：'31'、'25-31'、'170-'"""
+    if "-" in text:
+        low, high = text.split("-", 1)
+        return int(low) if low else None, int(high) if high else None
+    return int(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按条件查询存档中的宝可梦")
+    parser.add_argument("files", nargs="*", help="pokemon_main_info.json或.bin文件，可指定多个存档")
+    parser.add_argument("--species", type=int, action="append", help="宝可梦ID，可重复指定")
+    parser.add_argument("--shiny", action="store_true", help="只显示闪光")
+    parser.add_argument("--nature", action="append", help="性格名称或ID，可重复指定")
+    parser.add_argument("--iv", action="append", default=[], metavar="STAT=VALUE",
+                        help="个体值条件，如 spe=31、atk=0、total=170-")
+    parser.add_argument("--level", help="等级，如 50 或 50-100")
+    parser.add_argument("--held-item", type=int, help="持有物ID")
+    parser.add_argument("--met-location", type=int, help="相遇地点ID")
+    parser.add_argument("--sort", help="排序字段，多个字段用逗号分隔")
+    parser.add_argument("--desc", action="store_true", help="降序排序")
+    parser.add_argument("--limit", type=int, help="最多显示的条数")
+    args = parser.parse_args(argv)
+
+    filters = {
+        "species": args.species,
+        "shiny": True if args.shiny else None,
+        "nature": None,
+        "level": None,
+        "held_item": args.held_item,
+        "met_location": args.met_location,
+    }
+    if args.nature:
+        natures = []
+        for nature in args.nature:
+            nature_id = int(nature) if nature.isdigit() else get_nature_id(nature)
+            if nature_id is None:
+                parser.error(f"--nature 未知的性格: {nature}")
+            natures.append(nature_id)
+        filters["nature"] = natures
+    if args.level:
+        try:
+            filters["level"] = _parse_range(args.level)
+        except ValueError:
+            parser.error(f"--level 的取值无效: {args.level}")
+    for condition in args.iv:
+        stat, separator, value = condition.partition("=")
+        stat = stat.strip()
+        if not separator or stat not in IV_STATS + ("total",):
+            parser.error(f"--iv 条件格式应为 STAT=VALUE，STAT为 {'/'.join(IV_STATS)}/total 之一: {condition}")
+        try:
+            filters[f"iv_{stat}"] = _parse_range(value.strip())
+        except ValueError:
+            parser.error(f"--iv 的取值无效: {condition}")
+    sort_by = None
+    if args.sort:
+        sort_by = tuple(field.strip() for field in args.sort.split(","))
+        unknown = [field for field in sort_by if field not in QUERY_FIELDS]
+        if unknown:
+            parser.error(f"--sort 不支持的字段: {', '.join(unknown)}（可用字段: {', '.join(QUERY_FIELDS)}）")
+
+    files = args.files
+    if not files:
+        try:
+            from file_manager import get_config_dir
+            config_dir = get_config_dir()
+        except ImportError:
+            config_dir = "config"
+        json_path = os.path.join(config_dir, "pokemon_main_info.json")
+        files = [json_path]
+        try:
+            from pokemon_snapshot import get_snapshot_path, is_snapshot_current
+            # 快照比JSON旧时（如JSON被单独修改过）不能使用，否则会查到过期的数据
+            if is_snapshot_current(json_path):
+                files = [get_snapshot_path(json_path)]
+        except ImportError:
+            pass
+
+    index = PokemonQueryIndex()
+    for path in files:
+        index.add_main_info(load_main_info(path), source=path)
+
+    results = index.query(sort_by=sort_by, reverse=args.desc, limit=args.limit, **filters)
+    for item in results:
+        record = item["record"]
+        position = item["position"]
+        where = f"队伍{position['index'] + 1}" if position["type"] == "team" else \
+            f"盒子{position['box']}-{position['index'] + 1}"
+        ivs = "/".join(str(record["ivs"][stat]) for stat in IV_STATS)
+        shiny = "★" if record.get("shiny") else " "
+        source = f"{item['source']} " if len(files) > 1 else ""
+        print(f"{source}{where}: {shiny} #{record['species']} {record.get('nickname', '')} "
+              f"Lv.{record['level']} 性格={record['nature_value']} IV={ivs}")
+    print(f"共 {len(results)} 只（索引 {len(index)} 只）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
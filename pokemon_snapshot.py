@@ -0,0 +1,296 @@
+"""
+宝可梦快照模块
+把pokemon_main_info以紧凑的二进制格式保存（定长记录 + 昵称字符串表），
+读取时通过mmap直接解包，不需要解析JSON文本
+"""
+
+import mmap
+import os
+import struct
+
+SNAPSHOT_MAGIC = b"PKSN"
+# 格式变化时递增，旧版本的快照会被忽略并回退到JSON
+SNAPSHOT_VERSION = 1
+
+PARTY_SLOTS = 6
+BOX_COUNT = 32
+SLOTS_PER_BOX = 30
+
+# 魔数、版本、记录大小、队伍槽位数、盒子数、每盒槽位数、记录数、字符串表偏移量、字符串表大小
+HEADER_STRUCT = struct.Struct("<4sHHHHHIII")
+
+# 每个槽位一条定长记录，空槽位的flags为0
+RECORD_STRUCT = struct.Struct(
+    "<B"      # flags
+    "H"       # species
+    "B"       # level
+    "H"       # held_item
+    "B"       # friendship
+    "H"       # ability_id
+    "B"       # ability_num
+    "B"       # nature_value
+    "6B"      # evs: hp, atk, def, spa, spd, spe
+    "6B"      # ivs: hp, atk, def, spa, spd, spe
+    "7H"      # stats: hp_current, hp_max, atk, def, spa, spd, spe
+    "HBB"     # met_date: 年、月、日
+    "H"       # met_location
+    "4H"      # moves
+    "IHH"     # pid, tid16, sid16
+    "HII"     # index, offset, ec
+    "IH"      # 昵称在字符串表中的偏移量和长度
+)
+
+FLAG_OCCUPIED = 0x01
+FLAG_EGG = 0x02
+FLAG_NICKNAMED = 0x04
+FLAG_SHINY = 0x08
+
+_STAT_ORDER = ("hp", "atk", "def", "spa", "spd", "spe")
+_BATTLE_STAT_ORDER = ("hp_current", "hp_max", "atk", "def", "spa", "spd", "spe")
+_MOVE_ORDER = ("move1", "move2", "move3", "move4")
+
+
+def _slot_entries(main_info):
+    """按固定顺序列出所有槽位：先队伍6个，再32个盒子各30个"""
+    party = main_info.get("party", {})
+    for i in range(1, PARTY_SLOTS + 1):
+        yield party.get(str(i))
+    box = main_info.get("box", {})
+    for box_idx in range(1, BOX_COUNT + 1):
+        box_info = box.get(f"box{box_idx}", {})
+        for slot_idx in range(1, SLOTS_PER_BOX + 1):
+            yield box_info.get(str(slot_idx))
+
+
+def _pack_record(info, string_table, string_offsets):
+    """把一只宝可梦的字典打包为定长记录，昵称写入字符串表（相同昵称只存一份）"""
+    if not info:
+        return bytes(RECORD_STRUCT.size)
+
+    nickname = info.get("nickname", "").encode("utf-8", errors="surrogatepass")
+    nickname_offset = string_offsets.get(nickname)
+    if nickname_offset is None:
+        nickname_offset = len(string_table)
+        string_offsets[nickname] = nickname_offset
+        string_table += nickname
+
+    flags = FLAG_OCCUPIED
+    if info.get("is_egg"):
+        flags |= FLAG_EGG
+    if info.get("is_nicknamed"):
+        flags |= FLAG_NICKNAMED
+    if info.get("shiny"):
+        flags |= FLAG_SHINY
+
+    evs = info.get("evs", {})
+    ivs = info.get("ivs", {})
+    stats = info.get("stats", {})
+    moves = info.get("moves", {})
+    met_date = info.get("met_date") or (2000, 0, 0)
+    return RECORD_STRUCT.pack(
+        flags,
+        info.get("species", 0),
+        info.get("level", 0),
+        info.get("held_item", 0),
+        info.get("friendship", 0),
+        info.get("ability_id", 0),
+        info.get("ability_num", 0),
+        info.get("nature_value", 0),
+        *(evs.get(stat, 0) for stat in _STAT_ORDER),
+        *(ivs.get(stat, 0) for stat in _STAT_ORDER),
+        *(stats.get(stat, 0) for stat in _BATTLE_STAT_ORDER),
+        *met_date,
+        info.get("met_location", 0),
+        *(moves.get(move, 0) for move in _MOVE_ORDER),
+        info.get("pid", 0),
+        info.get("tid16", 0),
+        info.get("sid16", 0),
+        info.get("index", 0),
+        info.get("offset", 0),
+        info.get("ec", 0),
+        nickname_offset,
+        len(nickname),
+    )
+
+
+class SnapshotWriter:
+    """逐槽位构建快照，可以在盒子逐个生成时追加，不需要先组装完整的main_info字典
+
+    槽位须按快照顺序追加（先队伍6个，再按盒子顺序），未追加的槽位写入时视为空。
+    """
+
+    def __init__(self):
+        self._records = []
+        self._string_table = bytearray()
+        self._string_offsets = {}
+
+    def add(self, info):
+        """追加一个槽位（空槽位传入None）"""
+        self._records.append(_pack_record(info, self._string_table, self._string_offsets))
+
+    def add_party(self, party):
+        """追加队伍的6个槽位"""
+        for i in range(1, PARTY_SLOTS + 1):
+            self.add(party.get(str(i)))
+
+    def add_box(self, box_info):
+        """追加一个盒子的30个槽位"""
+        for slot_idx in range(1, SLOTS_PER_BOX + 1):
+            self.add(box_info.get(str(slot_idx)))
+
+    def write(self, path):
+        """写入快照文件（先写临时文件再替换）"""
+        record_count = PARTY_SLOTS + BOX_COUNT * SLOTS_PER_BOX
+        records = self._records + [bytes(RECORD_STRUCT.size)] * (record_count - len(self._records))
+        strings_offset = HEADER_STRUCT.size + RECORD_STRUCT.size * len(records)
+        header = HEADER_STRUCT.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, RECORD_STRUCT.size,
+            PARTY_SLOTS, BOX_COUNT, SLOTS_PER_BOX,
+            len(records), strings_offset, len(self._string_table),
+        )
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(header)
+            f.write(b"".join(records))
+            f.write(self._string_table)
+        os.replace(temp_path, path)
+
+
+def write_snapshot(main_info, path):
+    """把pokemon_main_info字典写成二进制快照（先写临时文件再替换）
+
+    Args:
+        main_info: 与pokemon_main_info.json结构相同的字典
+        path: 快照文件路径
+    """
+    writer = SnapshotWriter()
+    for info in _slot_entries(main_info):
+        writer.add(info)
+    writer.write(path)
+
+
+class PokemonSnapshot:
+    """通过mmap读取二进制快照，按槽位解包记录"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 快照文件路径
+
+        Raises:
+            ValueError: 文件不是快照格式或版本不匹配
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < HEADER_STRUCT.size:
+                raise ValueError(f"快照文件过小: {path}")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        (magic, version, record_size, self.party_slots, self.box_count, self.slots_per_box,
+         self.record_count, self._strings_offset, strings_size) = HEADER_STRUCT.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or record_size != RECORD_STRUCT.size:
+            self.close()
+            raise ValueError(f"快照格式或版本不匹配: {path}")
+        if self._strings_offset + strings_size > size or \
+                HEADER_STRUCT.size + record_size * self.record_count > self._strings_offset:
+            self.close()
+            raise ValueError(f"快照文件已损坏: {path}")
+
+    def close(self):
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.record_count
+
+    def record(self, i):
+        """解包第i条记录，返回与JSON中相同结构的字典，空槽位返回None"""
+        values = RECORD_STRUCT.unpack_from(self._mmap, HEADER_STRUCT.size + i * RECORD_STRUCT.size)
+        flags = values[0]
+        if not flags & FLAG_OCCUPIED:
+            return None
+        nickname_start = self._strings_offset + values[-2]
+        nickname = self._mmap[nickname_start:nickname_start + values[-1]].decode("utf-8", errors="surrogatepass")
+        return {
+            "species": values[1],
+            "nickname": nickname,
+            "level": values[2],
+            "moves": dict(zip(_MOVE_ORDER, values[31:35])),
+            "held_item": values[3],
+            "friendship": values[4],
+            "ability_id": values[5],
+            "ability_num": values[6],
+            "nature_value": values[7],
+            "evs": dict(zip(_STAT_ORDER, values[8:14])),
+            "ivs": dict(zip(_STAT_ORDER, values[14:20])),
+            "is_egg": bool(flags & FLAG_EGG),
+            "is_nicknamed": bool(flags & FLAG_NICKNAMED),
+            "stats": dict(zip(_BATTLE_STAT_ORDER, values[20:27])),
+            "met_date": list(values[27:30]),
+            "met_location": values[30],
+            "shiny": bool(flags & FLAG_SHINY),
+            "pid": values[35],
+            "tid16": values[36],
+            "sid16": values[37],
+            "index": values[38],
+            "offset": values[39],
+            "ec": values[40],
+        }
+
+    def to_main_info(self):
+        """还原为与pokemon_main_info.json结构相同的字典"""
+        party = {str(i + 1): self.record(i) for i in range(self.party_slots)}
+        box = {}
+        record_index = self.party_slots
+        for box_idx in range(self.box_count):
+            box[f"box{box_idx + 1}"] = {
+                str(slot_idx + 1): self.record(record_index + slot_idx)
+                for slot_idx in range(self.slots_per_box)
+            }
+            record_index += self.slots_per_box
+        return {"party": party, "box": box}
+
+
+def get_snapshot_path(json_path):
+    """获取JSON文件对应的快照路径：同目录、同文件名，扩展名为.bin
+
+    例如 config/pokemon_main_info.json -> config/pokemon_main_info.bin，
+    不同的JSON文件各自对应不同的快照，不会互相覆盖。
+    """
+    return os.path.splitext(json_path)[0] + ".bin"
+
+
+def load_snapshot(path):
+    """读取快照并还原为字典；文件不存在、格式或版本不匹配时返回None"""
+    try:
+        with PokemonSnapshot(path) as snapshot:
+            return snapshot.to_main_info()
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def is_snapshot_current(json_path):
+    """快照存在且不比JSON旧时返回True（JSON不存在时只要求快照存在）"""
+    snapshot_path = get_snapshot_path(json_path)
+    if not os.path.exists(snapshot_path):
+        return False
+    if not os.path.exists(json_path):
+        return True
+    return os.path.getmtime(snapshot_path) >= os.path.getmtime(json_path)
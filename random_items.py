@@ -1,8 +1,7 @@
 import json
 import random
-import os
-import struct
-from type_exclusive_function import select_item, select_attribute_item
+from type_exclusive_function import select_items_batch, select_attribute_item
+from trainer_poke_corpus import get_trainer_poke_corpus
 
 try:
     from file_manager import safe_load_file
@@ -21,6 +20,7 @@ use_random = rules["use_random"]
 replace_all = rules["replace_all"]
 trainer_poke_dir = rules["trainer_poke_dir"]
 item_categories = rules["item_categories"]
+seed = rules.get("seed")  # 可选的随机种子，用于复现同一次随机化结果
 type_map = rules.get("type_map", {})
 
 if safe_load_file is not None:
@@ -29,57 +29,38 @@ else:
     with open("pokemon_types_final.json", "r", encoding="utf-8") as f:
         pokemon_types = json.load(f)
 
-# constants -> pokemon data structure
-POKEMON_SIZE = 0x20
-ITEM_OFFSET = 0x10
-POKEMON_ID_OFFSET = 0x0C
-
 reverse_type_map = {v: k for k, v in type_map.items()}
 
 def main():
     # counters
     total_pokemon = 0
     replaced_count = 0
-    for file in os.listdir(trainer_poke_dir):
-        if not file.startswith("trainer_poke_") or not file.endswith(".bin"):
-            continue
-
-        filepath = os.path.join(trainer_poke_dir, file)
-
-        with open(filepath, "rb") as f:
-            data = bytearray(f.read())
-        
-        num_pokemon = len(data) // POKEMON_SIZE
-
-        for i in range(num_pokemon):
+    corpus = get_trainer_poke_corpus(trainer_poke_dir)
+
+    if replace_all:
+        # 按属性组合分组后整组抽样，一次性写回整列
+        corpus.set_items(select_items_batch(corpus.column("species"), seed))
+        total_pokemon = replaced_count = len(corpus)
+    else:
+        rng = random.Random(seed)
+        # 先取出原持有物列（set_item会让语料库重建列缓存，这里保留的是修改前的值）
+        items = corpus.column("item")
+        for row in range(len(corpus)):
             total_pokemon += 1
-            offset = i * POKEMON_SIZE
-            item_offset = offset + ITEM_OFFSET
-            pokemon_id_offset = offset + POKEMON_ID_OFFSET
+            item_id = items[row]
 
-            if offset + 2 > len(data): continue
+            if item_id in valid_items or item_id in skip_items:
+                continue
 
-            if not replace_all:
-                item_id = struct.unpack("<H", data[offset:offset+2])[0]
+            if use_random and valid_items:
+                new_item = rng.choice(valid_items)
+            else:
+                new_item = 234
 
-                if item_id in valid_items or item_id in skip_items:
-                    continue
+            corpus.set_item(row, new_item)
+            replaced_count += 1
 
-                if use_random and valid_items:
-                    new_item = random.choice(valid_items)
-                else:
-                    new_item = 234
-                
-                data[offset:offset+2] = struct.pack("<H", new_item)
-                replaced_count += 1
-            else:
-                pokemon_id = struct.unpack("<H", data[pokemon_id_offset:pokemon_id_offset+2])[0]
-                new_item = select_item(pokemon_id)
-                data[item_offset:item_offset+2] = struct.pack("<H", new_item)
-                replaced_count += 1
-        
-        with open(filepath, "wb") as f:
-            f.write(data)
+    corpus.save()
 
     print(f"\n处理完成！")
     print(f"检查宝可梦: {total_pokemon} 只")
@@ -0,0 +1,74 @@
+import os
+import random
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_pk8 import encrypt_pokemon_data, update_pk8_checksum
+from decrypt_main import SCBlock, SwishCrypto, KBOX_KEY, KPARTY_KEY
+
+SLOT_SIZE = 0x158
+KBOX_SLOTS = 960
+
+
+def make_pk8(rng, ec=None):
+    """生成一只已解密重排的随机宝可梦（0x158字节，校验和正确）"""
+    data = bytearray(rng.randbytes(SLOT_SIZE))
+    struct.pack_into("<I", data, 0, ec if ec is not None else rng.getrandbits(32) or 1)
+    # 昵称保持为可解码的UTF-16
+    data[0x58:0x58 + 24] = "TEST".encode("utf-16le").ljust(24, b"\x00")
+    update_pk8_checksum(data)
+    return data
+
+
+def make_encrypted_slots(seed, slots, empty_ratio=0.3):
+    """生成连续存放的加密宝可梦数据，部分槽位为空（全0）"""
+    rng = random.Random(seed)
+    out = bytearray()
+    for _ in range(slots):
+        if rng.random() < empty_ratio:
+            out += bytes(SLOT_SIZE)
+        else:
+            out += encrypt_pokemon_data(make_pk8(rng))
+    return bytes(out)
+
+
+def build_save(seed=0, block_count=200):
+    """构造包含KBox/KParty块的合成存档，返回(存档数据, 块字典)"""
+    rng = random.Random(seed)
+    blocks = {}
+    scalar_types = ["Byte", "UInt16", "UInt32", "UInt64", "Int32", "Single", "Double"]
+    for _ in range(block_count):
+        key = rng.getrandbits(32)
+        if key in (KBOX_KEY, KPARTY_KEY) or f"0x{key:08X}" in blocks:
+            continue
+        kind = rng.random()
+        if kind < 0.2:
+            block = SCBlock(key, rng.choice(["Bool1", "Bool2"]))
+        elif kind < 0.6:
+            type_name = rng.choice(scalar_types)
+            block = SCBlock(key, type_name, rng.randbytes(SCBlock.get_type_size(SCBlock.get_type_code(type_name))))
+        elif kind < 0.8:
+            block = SCBlock(key, "Array", rng.randbytes(4 * rng.randint(1, 32)), "UInt32")
+        else:
+            block = SCBlock(key, "Object", rng.randbytes(rng.randint(1, 256)))
+        blocks[f"0x{key:08X}"] = block
+    blocks[f"0x{KBOX_KEY:08X}"] = SCBlock(KBOX_KEY, "Object", make_encrypted_slots(seed, KBOX_SLOTS))
+    blocks[f"0x{KPARTY_KEY:08X}"] = SCBlock(KPARTY_KEY, "Object", make_encrypted_slots(seed + 1, 6, 0.0) + bytes(2068 - 6 * SLOT_SIZE))
+    return SwishCrypto().encrypt(blocks), blocks
+
+
+@pytest.fixture(scope="session")
+def synthetic_save():
+    return build_save()
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    """把analyze_pk8的配置目录指向临时目录，避免改动仓库中的config"""
+    import analyze_pk8
+    monkeypatch.setattr(analyze_pk8, "get_config_dir", lambda: str(tmp_path))
+    return tmp_path
@@ -0,0 +1,136 @@
+import random
+import struct
+import sys
+from collections import Counter
+
+import pytest
+
+import benchmark
+import file_manager
+import type_exclusive_function
+from type_exclusive_function import AliasTable, select_items_batch
+from trainer_poke_corpus import TrainerPokeCorpus, ITEM_OFFSET, TRAINER_POKE_RECORD_SIZE
+
+
+@pytest.fixture
+def trainer_dir(tmp_path):
+    benchmark.build_synthetic_trainer_dir(str(tmp_path), file_count=10)
+    return tmp_path
+
+
+def _species(count=300, seed=0):
+    rng = random.Random(seed)
+    species = [int(pokemon_id) for pokemon_id in type_exclusive_function.pokemon_types_data]
+    return [rng.choice(species) for _ in range(count)]
+
+
+def test_select_items_batch_is_reproducible():
+    species = _species()
+    first = select_items_batch(species, seed=42)
+    assert first == select_items_batch(species, seed=42)
+    assert first != select_items_batch(species, seed=43)
+    assert len(first) == len(species)
+
+
+def test_select_items_batch_matches_per_record_distribution():
+    species = _species(count=20000, seed=1)
+    rng = random.Random(5)
+    per_record = Counter(type_exclusive_function.get_item_category(
+        type_exclusive_function.select_item(pokemon_id, rng)) for pokemon_id in species)
+    batch = Counter(type_exclusive_function.get_item_category(item_id)
+                    for item_id in select_items_batch(species, seed=5))
+    for category in set(per_record) | set(batch):
+        assert abs(per_record[category] - batch[category]) / len(species) < 0.02
+
+
+def test_select_items_batch_keeps_categories_with_the_same_name(monkeypatch):
+    categories = {
+        "first": {"name": "重名", "weight": 1, "items": [1001]},
+        "second": {"name": "重名", "weight": 1, "items": [1002]},
+    }
+    monkeypatch.setattr(type_exclusive_function, "item_categories", categories)
+    type_exclusive_function._clear_samplers()
+    try:
+        items = set(select_items_batch(_species(count=200), seed=3))
+    finally:
+        type_exclusive_function._clear_samplers()
+    assert items == {1001, 1002}
+
+
+def test_alias_table_follows_weights():
+    table = AliasTable(["a", "b", "c"], [1, 0, 3])
+    rng = random.Random(0)
+    counts = Counter(table.sample(rng) for _ in range(20000))
+    assert counts["b"] == 0
+    assert 0.7 < counts["c"] / 20000 < 0.8
+
+
+def test_empty_attribute_branch_is_never_drawn(monkeypatch):
+    special = dict(type_exclusive_function.type_category["special"], black_sludge=[])
+    monkeypatch.setitem(type_exclusive_function.type_category, "special", special)
+    type_exclusive_function._clear_samplers()
+    try:
+        samplers = type_exclusive_function._get_attribute_samplers(["poison"])
+        rng = random.Random(0)
+        assert {samplers["branch"].sample(rng) for _ in range(2000)} <= {"attack", "defend"}
+        assert "special" not in samplers
+    finally:
+        type_exclusive_function._clear_samplers()
+
+
+def test_set_item_only_touches_item_field(trainer_dir):
+    corpus = TrainerPokeCorpus(str(trainer_dir))
+    before = bytes(corpus.data)
+    corpus.set_item(3, 0xBEEF)
+    offset = 3 * TRAINER_POKE_RECORD_SIZE + ITEM_OFFSET
+    assert struct.unpack_from("<H", corpus.data, offset)[0] == 0xBEEF
+    assert corpus.data[:offset] == before[:offset]
+    assert corpus.data[offset + 2:] == before[offset + 2:]
+    assert corpus.column("item")[3] == 0xBEEF
+
+
+def test_set_items_writes_whole_column(trainer_dir):
+    corpus = TrainerPokeCorpus(str(trainer_dir))
+    before = bytes(corpus.data)
+    items = list(range(len(corpus)))
+    corpus.set_items(items)
+    assert list(corpus.column("item")) == items
+    for row in range(len(corpus)):
+        start = row * TRAINER_POKE_RECORD_SIZE
+        assert corpus.data[start:start + ITEM_OFFSET] == before[start:start + ITEM_OFFSET]
+    assert corpus.save() == len(corpus.files)
+    assert list(TrainerPokeCorpus(str(trainer_dir)).column("item")) == items
+
+
+@pytest.mark.parametrize("replace_all", [False, True])
+def test_random_items_changes_only_held_items(trainer_dir, monkeypatch, replace_all):
+    rules = {
+        "valid_items": [1], "skip_items": [], "use_random": False, "replace_all": replace_all,
+        "trainer_poke_dir": str(trainer_dir), "item_categories": type_exclusive_function.item_categories,
+        "seed": 7,
+    }
+    load = file_manager.safe_load_file
+    monkeypatch.setattr(file_manager, "safe_load_file",
+                        lambda name, *args: rules if name == "item_category_rules.json" else load(name, *args))
+    monkeypatch.delitem(sys.modules, "random_items", raising=False)
+    import random_items
+
+    before = TrainerPokeCorpus(str(trainer_dir))
+    random_items.main()
+    after = TrainerPokeCorpus(str(trainer_dir))
+    for row in range(len(after)):
+        start = row * TRAINER_POKE_RECORD_SIZE
+        item = start + ITEM_OFFSET
+        assert after.data[start:item] == before.data[start:item]
+        assert after.data[item + 2:start + TRAINER_POKE_RECORD_SIZE] == \
+            before.data[item + 2:start + TRAINER_POKE_RECORD_SIZE]
+    if not replace_all:
+        assert all(item in (1, 234) for item in after.column("item"))
+
+
+def test_item_category_index_matches_lookup():
+    codes, names = type_exclusive_function.get_item_category_index()
+    item_ids = list(range(len(codes) + 5))
+    expected = [type_exclusive_function.get_item_category(item_id) for item_id in item_ids]
+    assert [names[codes[item_id]] if item_id < len(codes) else names[0] for item_id in item_ids] == expected
+    assert type_exclusive_function.item_category_histogram(item_ids) == Counter(expected)
@@ -0,0 +1,191 @@
+import random
+import struct
+
+import pytest
+
+import analyze_pk8
+from analyze_pk8 import (
+    PK8Library, PK8SlotCache, apply_pk8_edits, compute_pk8_checksum, decrypt_pokemon_batch, decrypt_pokemon_data,
+    edit_pokemon_batch, encrypt_pokemon_data, parse_pk8_to_dict, shuffle_array, unshuffle_array,
+)
+from conftest import SLOT_SIZE, make_encrypted_slots, make_pk8
+
+
+def test_checksum_is_sum_of_u16_words():
+    data = make_pk8(random.Random(1))
+    expected = sum(struct.unpack_from("<160H", data, 8)) & 0xFFFF
+    assert compute_pk8_checksum(data) == expected
+    assert struct.unpack_from("<H", data, 0x06)[0] == expected
+
+
+@pytest.mark.parametrize("sv", range(32))
+def test_unshuffle_inverts_shuffle(sv):
+    data = bytearray(random.Random(sv).randbytes(SLOT_SIZE))
+    assert unshuffle_array(shuffle_array(data, sv, 0x50), sv, 0x50) == data
+    assert shuffle_array(unshuffle_array(data, sv, 0x50), sv, 0x50) == data
+
+
+def test_encrypt_decrypt_roundtrip():
+    rng = random.Random(2)
+    for _ in range(20):
+        data = make_pk8(rng)
+        encrypted = encrypt_pokemon_data(data)
+        assert encrypted != data
+        assert decrypt_pokemon_data(encrypted) == data
+
+
+def test_batch_decrypt_matches_single():
+    buffer = make_encrypted_slots(3, 30, empty_ratio=0.0)
+    batch = decrypt_pokemon_batch(buffer)
+    for i in range(30):
+        single = decrypt_pokemon_data(buffer[i * SLOT_SIZE:(i + 1) * SLOT_SIZE])
+        assert batch[i] == single
+
+
+def test_slot_cache_reparses_only_changed_slots():
+    buffer = bytearray(make_encrypted_slots(4, 60, empty_ratio=0.0))
+    cache = PK8SlotCache()
+    first = cache.parse(bytes(buffer))
+    assert cache.last_parsed == 60
+
+    buffer[5 * SLOT_SIZE:6 * SLOT_SIZE] = encrypt_pokemon_data(make_pk8(random.Random(5)))
+    second = cache.parse(bytes(buffer))
+    assert cache.last_parsed == 1
+    assert second[5] != first[5]
+    assert all(second[i] is first[i] for i in range(60) if i != 5)
+
+
+def test_box_generation_does_not_mutate_cached_records():
+    kbox = make_encrypted_slots(6, 90)
+    cache = PK8SlotCache()
+    boxes = list(analyze_pk8.iter_box_json_from_data(kbox, cache=cache))
+    assert len(boxes) == 32
+    records = cache.parse(kbox)
+    assert all("index" not in record for record in records if record)
+    # 第二次生成复用缓存，位置信息仍然正确
+    again = list(analyze_pk8.iter_box_json_from_data(kbox, cache=cache))
+    assert again == boxes
+    for box_idx, (_, box) in enumerate(again):
+        for slot, record in box.items():
+            if record:
+                assert record["index"] == box_idx * 30 + int(slot) - 1
+
+
+def test_parallel_decode_matches_serial(monkeypatch):
+    kbox = make_encrypted_slots(7, 120)
+    calls = []
+    decode = analyze_pk8.iter_decode_box_parallel
+    monkeypatch.setattr(analyze_pk8, "iter_decode_box_parallel",
+                        lambda *args: calls.append(args) or decode(*args))
+    # 显式指定workers时即使槽位数少于PARALLEL_DECODE_MIN_SLOTS也并行解码
+    parallel = list(analyze_pk8.iter_box_json_from_data(kbox, workers=2))
+    assert len(calls) == 1
+    serial = list(analyze_pk8.iter_box_json_from_data(kbox, cache=PK8SlotCache()))
+    assert parallel == serial
+
+
+def _slots(buffer):
+    return [buffer[i:i + SLOT_SIZE] for i in range(0, len(buffer), SLOT_SIZE)]
+
+
+def _checksum_valid(encrypted_slot):
+    data = decrypt_pokemon_data(encrypted_slot)
+    return struct.unpack_from("<H", data, 0x06)[0] == compute_pk8_checksum(data)
+
+
+def test_empty_edit_roundtrips_byte_identical():
+    buffer = make_encrypted_slots(20, 60)
+    assert edit_pokemon_batch(buffer, {}) == buffer
+    assert edit_pokemon_batch(buffer, {0: {}, 5: {}}) == buffer
+
+
+def test_strip_held_items_keeps_checksums_valid():
+    buffer = make_encrypted_slots(21, 60)
+    edited = edit_pokemon_batch(buffer, {"held_item": 0})
+    for before, after in zip(_slots(buffer), _slots(edited)):
+        if struct.unpack_from("<I", before, 0)[0] == 0:
+            assert after == before
+            continue
+        assert _checksum_valid(after)
+        assert parse_pk8_to_dict(after, encrypted=True)["held_item"] == 0
+
+
+def test_edits_apply_only_to_the_given_slot():
+    rng = random.Random(22)
+    slots = [make_pk8(rng) for _ in range(3)]
+    # 清除昵称标志，确认修改昵称时会设置
+    struct.pack_into("<I", slots[1], 0x8C, struct.unpack_from("<I", slots[1], 0x8C)[0] & 0x7FFFFFFF)
+    buffer = b"".join(encrypt_pokemon_data(slot) for slot in slots)
+    edits = {
+        "ivs": {"spe": 31, "atk": 0},
+        "nickname": "Speedy",
+        "moves": [33, 45],
+        "held_item": 234,
+    }
+    edited = edit_pokemon_batch(buffer, {1: edits})
+    before, after = _slots(buffer), _slots(edited)
+    assert after[0] == before[0] and after[2] == before[2]
+    assert _checksum_valid(after[1])
+
+    result = parse_pk8_to_dict(after[1], encrypted=True)
+    original = parse_pk8_to_dict(before[1], encrypted=True)
+    assert result["ivs"]["spe"] == 31 and result["ivs"]["atk"] == 0
+    assert result["ivs"]["hp"] == original["ivs"]["hp"]
+    assert result["nickname"] == "Speedy"
+    assert result["is_nicknamed"] and not original["is_nicknamed"]
+    assert result["is_egg"] == original["is_egg"]
+    assert (result["moves"]["move1"], result["moves"]["move2"]) == (33, 45)
+    assert result["moves"]["move3"] == original["moves"]["move3"]
+    assert result["held_item"] == 234
+
+
+@pytest.mark.parametrize("edits, error", [
+    ({"ivs": {"spe": 32}}, ValueError),
+    ({"evs": {"hp": 253}}, ValueError),
+    ({"nickname": "x" * 13}, ValueError),
+    ({"moves": {"move5": 1}}, KeyError),
+    ({"iv32": 0}, KeyError),
+])
+def test_invalid_edits_are_rejected(edits, error):
+    data = make_pk8(random.Random(23))
+    with pytest.raises(error):
+        apply_pk8_edits(data, edits)
+
+
+def test_pk8_library_import_export_roundtrip(tmp_path):
+    rng = random.Random(30)
+    source = tmp_path / "source"
+    (source / "nested").mkdir(parents=True)
+    originals = {}
+    for i in range(50):
+        record = make_pk8(rng)
+        # 一半为.pk8（0x148字节存储大小），一半为加密的.ek8（0x158字节）
+        if i % 2:
+            name, raw = f"nested/{i:02d}.ek8", bytes(encrypt_pokemon_data(record))
+        else:
+            name, raw = f"{i:02d}.pk8", bytes(record[:0x148])
+        (source / name).write_bytes(raw)
+        originals[struct.unpack_from("<I", record, 0)[0], struct.unpack_from("<I", record, 0x1C)[0]] = record
+    # 重复的文件只保留一份
+    (source / "dup.pk8").write_bytes((source / "00.pk8").read_bytes())
+
+    library = PK8Library.from_directory(str(source))
+    assert len(library) == 50
+    assert len(library.duplicates) == 1
+
+    for encrypted in (False, True):
+        exported = library.export(str(tmp_path / f"out{encrypted}"), encrypted=encrypted)
+        assert len(exported) == 50
+        for index, path in enumerate(exported):
+            with open(path, "rb") as f:
+                raw = f.read()
+            assert len(raw) == library.sizes[index]
+            data = decrypt_pokemon_data(raw) if encrypted else raw
+            assert struct.unpack_from("<H", data, 0x06)[0] == compute_pk8_checksum(data)
+            key = struct.unpack_from("<I", data, 0)[0], struct.unpack_from("<I", data, 0x1C)[0]
+            assert data == originals[key][:len(data)]
+
+        # 重新导入后记录相同（导出的文件名不同，顺序可能变化）
+        again = PK8Library.from_directory(str(tmp_path / f"out{encrypted}"))
+        assert sorted(again.record(i) for i in range(len(again))) == \
+            sorted(library.record(i) for i in range(len(library)))
@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+import file_manager
+import pokemon_query
+from core.static_data import nature_map
+from pokemon_query import PokemonQueryIndex
+from pokemon_snapshot import get_snapshot_path, write_snapshot
+
+
+def _pokemon(species, spe, shiny=False):
+    return {
+        "species": species, "nickname": "", "level": 50, "nature_value": 10,
+        "ivs": {"hp": 31, "atk": 0, "def": 31, "spa": 31, "spd": 31, "spe": spe},
+        "shiny": shiny, "is_egg": False, "held_item": 0, "met_location": 0,
+    }
+
+
+MAIN_INFO = {
+    "party": {"1": _pokemon(25, 31, shiny=True), "2": _pokemon(133, 20)},
+    "box": {"box1": {"1": _pokemon(25, 0), "2": None}},
+}
+
+
+def test_query_combines_filters():
+    index = PokemonQueryIndex.from_main_info(MAIN_INFO)
+    assert len(index) == 3
+    assert index.count(species=[25]) == 2
+    assert index.count(species=[25], iv_spe=(31, None)) == 1
+    results = index.query(sort_by=("iv_spe",), reverse=True)
+    assert [item["record"]["ivs"]["spe"] for item in results] == [31, 20, 0]
+
+
+@pytest.mark.parametrize("condition", ["speed=31", "spe", "spe=abc"])
+def test_invalid_iv_condition_is_a_usage_error(tmp_path, condition):
+    with pytest.raises(SystemExit) as excinfo:
+        pokemon_query.main(["--iv", condition, str(tmp_path / "missing.json")])
+    assert excinfo.value.code == 2
+
+
+@pytest.mark.parametrize("args", [
+    ["--sort", "speed"],
+    ["--sort", "level,unknown"],
+    ["--nature", "不存在的性格"],
+])
+def test_invalid_sort_or_nature_is_a_usage_error(tmp_path, args, capsys):
+    json_path = tmp_path / "main.json"
+    json_path.write_text(json.dumps(MAIN_INFO), encoding="utf-8")
+    with pytest.raises(SystemExit) as excinfo:
+        pokemon_query.main(args + [str(json_path)])
+    assert excinfo.value.code == 2
+    assert "Traceback" not in capsys.readouterr().err
+
+
+def test_nature_name_and_sort_fields(tmp_path, capsys):
+    json_path = tmp_path / "main.json"
+    json_path.write_text(json.dumps(MAIN_INFO), encoding="utf-8")
+    assert pokemon_query.main(["--nature", nature_map[10], "--sort", "iv_spe, level", str(json_path)]) == 0
+    assert "共 3 只" in capsys.readouterr().out
+
+
+def test_default_input_skips_stale_snapshot(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(file_manager, "get_config_dir", lambda: str(tmp_path))
+    json_path = str(tmp_path / "pokemon_main_info.json")
+    stale = {"party": {"1": _pokemon(1, 31)}, "box": {}}
+    write_snapshot(stale, get_snapshot_path(json_path))
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(MAIN_INFO, f)
+    snapshot_mtime = os.path.getmtime(get_snapshot_path(json_path))
+    os.utime(json_path, (snapshot_mtime + 10, snapshot_mtime + 10))
+
+    assert pokemon_query.main(["--species", "25"]) == 0
+    assert "共 2 只（索引 3 只）" in capsys.readouterr().out
+
+    # 快照比JSON新时优先读取快照
+    write_snapshot(stale, get_snapshot_path(json_path))
+    os.utime(get_snapshot_path(json_path), (snapshot_mtime + 20, snapshot_mtime + 20))
+    assert pokemon_query.main([]) == 0
+    assert "索引 1 只" in capsys.readouterr().out
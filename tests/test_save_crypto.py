@@ -0,0 +1,125 @@
+import os
+import random
+
+from decrypt_main import DecryptStats, SCBlockIndex, SwishCrypto, KBOX_KEY, KPARTY_KEY
+
+KBOX_NAME = f"0x{KBOX_KEY:08X}"
+KPARTY_NAME = f"0x{KPARTY_KEY:08X}"
+
+
+def _data_region(data):
+    crypto = SwishCrypto()
+    region = bytearray(data)
+    crypto.crypt_static_xorpad_bytes(region)
+    return bytes(region[:-crypto.hash_size])
+
+
+def test_decrypt_encrypt_roundtrip(synthetic_save):
+    data, blocks = synthetic_save
+    crypto = SwishCrypto()
+    assert crypto.get_is_hash_valid(data)
+    _, decoded = crypto.decrypt(data)
+    assert set(decoded) == set(blocks)
+    assert bytes(decoded[KBOX_NAME].data) == bytes(blocks[KBOX_NAME].data)
+    assert crypto.encrypt(decoded) == data
+
+
+def test_lazy_decrypt_matches_eager(synthetic_save):
+    data, _ = synthetic_save
+    crypto = SwishCrypto()
+    _, eager = crypto.decrypt(data)
+    reader, lazy = crypto.decrypt(data, lazy=True)
+    try:
+        assert list(lazy) == list(eager)
+        assert lazy.decoded_count() == 0
+        for name in (KBOX_NAME, KPARTY_NAME):
+            assert bytes(lazy[name].data) == bytes(eager[name].data)
+        assert lazy.decoded_count() == 2
+    finally:
+        lazy.close()
+
+
+def test_incremental_write_matches_full_encrypt(synthetic_save):
+    data, _ = synthetic_save
+    crypto = SwishCrypto()
+    _, blocks = crypto.decrypt(data)
+    kparty = blocks[KPARTY_NAME]
+    kparty.data[0x0A] ^= 0x01
+    kparty.mark_dirty()
+    assert crypto.encrypt_incremental(data, blocks) == crypto.encrypt(blocks)
+
+
+def test_incremental_write_after_layout_change_on_lazy_map(synthetic_save):
+    """改变块大小后再次增量写入，懒加载的块映射要指向新的布局"""
+    data, _ = synthetic_save
+    crypto = SwishCrypto()
+    _, lazy = crypto.decrypt(data, lazy=True)
+    _, expected = crypto.decrypt(data)
+
+    kparty = lazy[KPARTY_NAME]
+    kparty.data = bytearray(kparty.data) + bytes(16)
+    kparty.mark_dirty()
+    expected[KPARTY_NAME].data = bytearray(expected[KPARTY_NAME].data) + bytes(16)
+    first = crypto.encrypt_incremental(data, lazy)
+    assert first == crypto.encrypt(expected)
+
+    # 之前未解码的块必须从新布局中读取
+    kbox = lazy[KBOX_NAME]
+    kbox.data[0] ^= 0xFF
+    kbox.mark_dirty()
+    expected[KBOX_NAME].data[0] ^= 0xFF
+    second = crypto.encrypt_incremental(first, lazy)
+    assert second == crypto.encrypt(expected)
+    lazy.close()
+
+
+def test_block_index_validate_detects_changed_layout(synthetic_save):
+    data, _ = synthetic_save
+    region = _data_region(data)
+    index = SCBlockIndex.build(region, len(data), "")
+    assert index.validate(region)
+
+    crypto = SwishCrypto()
+    _, blocks = crypto.decrypt(data)
+    blocks[KPARTY_NAME].data = bytearray(blocks[KPARTY_NAME].data) + bytes(4)
+    changed = crypto.encrypt(blocks)
+    assert not index.validate(_data_region(changed))
+
+
+def test_scan_recovers_blocks_after_corruption(synthetic_save):
+    data, blocks = synthetic_save
+    region = bytearray(_data_region(data))
+    headers = SCBlockIndex.scan(bytes(region))
+    assert len(headers) == len(blocks)
+
+    # 在中间破坏一段数据，扫描应跳过损坏区域继续找到后面的块
+    middle = headers[len(headers) // 2]
+    region[middle.offset:middle.offset + 64] = os.urandom(64)
+    recovered = {header.key for header in SCBlockIndex.scan(bytes(region))}
+    assert KBOX_KEY in recovered or KPARTY_KEY in recovered
+    assert headers[-1].key in recovered
+
+
+def test_scan_recovers_blocks_after_damaged_kbox_header(synthetic_save):
+    """KBox放在最前面并破坏其大小字段，重新同步要越过整个KBox找回后面的块"""
+    _, blocks = synthetic_save
+    ordered = {KBOX_NAME: blocks[KBOX_NAME]}
+    ordered.update((name, block) for name, block in blocks.items() if name != KBOX_NAME)
+    region = bytearray(_data_region(SwishCrypto().encrypt(ordered)))
+    headers = SCBlockIndex.scan(bytes(region))
+    assert headers[0].key == KBOX_KEY
+
+    # 大小字段的最高字节，破坏后块大小超出数据区域
+    region[headers[0].offset + 8] ^= 0x40
+    stats = DecryptStats()
+    recovered = SCBlockIndex.scan(bytes(region), stats)
+    keys = {header.key for header in recovered}
+    assert KBOX_KEY not in keys
+    assert KPARTY_KEY in keys
+    assert keys == {header.key for header in headers[1:]}
+    assert stats.bytes_skipped == headers[1].offset
+
+
+def test_scan_on_noise_finds_few_blocks():
+    noise = random.Random(0).randbytes(256 * 1024)
+    assert len(SCBlockIndex.scan(noise)) <= 2
@@ -0,0 +1,68 @@
+import json
+import os
+
+import analyze_pk8
+from pokemon_snapshot import get_snapshot_path, is_snapshot_current, load_snapshot, write_snapshot
+from conftest import make_encrypted_slots
+
+KPARTY = make_encrypted_slots(10, 6, empty_ratio=0.0)
+KBOX = make_encrypted_slots(11, 960)
+
+
+def _generate(output_file, **kwargs):
+    return analyze_pk8.generate_pokemon_main_info_json_from_data(KPARTY, KBOX, output_file=output_file, **kwargs)
+
+
+def test_snapshot_path_follows_json_name():
+    assert get_snapshot_path(os.path.join("config", "pokemon_main_info.json")) == \
+        os.path.join("config", "pokemon_main_info.bin")
+    assert get_snapshot_path("a.json") != get_snapshot_path("b.json")
+
+
+def test_snapshot_matches_json(config_dir):
+    main_info = _generate("pokemon_main_info.json")
+    json_path = config_dir / "pokemon_main_info.json"
+    with open(json_path, encoding="utf-8") as f:
+        from_json = json.load(f)
+    assert from_json == json.loads(json.dumps(main_info))
+    assert load_snapshot(get_snapshot_path(str(json_path))) == from_json
+
+
+def test_different_outputs_do_not_share_a_snapshot(config_dir):
+    _generate("first.json")
+    other_kbox = make_encrypted_slots(12, 960)
+    analyze_pk8.generate_pokemon_main_info_json_from_data(KPARTY, other_kbox, output_file="second.json")
+    for name in ("first.json", "second.json"):
+        json_path = str(config_dir / name)
+        with open(json_path, encoding="utf-8") as f:
+            assert load_snapshot(get_snapshot_path(json_path)) == json.load(f)
+
+
+def test_write_without_returning_data(config_dir):
+    expected = _generate("full.json")
+    assert _generate("streamed.json", return_data=False) is None
+    assert (config_dir / "streamed.json").read_bytes() == (config_dir / "full.json").read_bytes()
+    assert load_snapshot(get_snapshot_path(str(config_dir / "streamed.json"))) == json.loads(json.dumps(expected))
+
+
+def test_snapshot_staleness(tmp_path):
+    json_path = str(tmp_path / "pokemon_main_info.json")
+    assert not is_snapshot_current(json_path)
+
+    main_info = {"party": {}, "box": {}}
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(main_info, f)
+    write_snapshot(main_info, get_snapshot_path(json_path))
+    assert is_snapshot_current(json_path)
+
+    # JSON被单独修改后快照视为过期
+    snapshot_mtime = os.path.getmtime(get_snapshot_path(json_path))
+    os.utime(json_path, (snapshot_mtime + 10, snapshot_mtime + 10))
+    assert not is_snapshot_current(json_path)
+
+
+def test_load_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "broken.bin"
+    path.write_bytes(b"not a snapshot" * 10)
+    assert load_snapshot(str(path)) is None
+    assert load_snapshot(str(tmp_path / "missing.bin")) is None
@@ -0,0 +1,183 @@
+"""
+训练家宝可梦数据集模块
+一次性读取目录下所有trainer_poke_*.bin文件，拼接到一个连续缓冲区中，
+按字段提供列式访问，并记录每个文件对应的记录范围
+"""
+
+import os
+import re
+import struct
+import sys
+from array import array
+
+# 每只训练家宝可梦的记录大小
+TRAINER_POKE_RECORD_SIZE = 0x20
+
+# 记录中各字段的偏移量
+ABILITY_OFFSET = 0x00  # 高4位为特性编号（1/2/3=隐藏特性）
+NATURE_OFFSET = 0x01
+EV_OFFSET = 0x02  # 6字节
+LEVEL_OFFSET = 0x0A
+POKEMON_ID_OFFSET = 0x0C
+ITEM_OFFSET = 0x10
+MOVE1_OFFSET = 0x12
+MOVE2_OFFSET = 0x14
+MOVE3_OFFSET = 0x16
+MOVE4_OFFSET = 0x18
+IV_OFFSET = 0x1C  # 32位，每5位一个个体值
+
+# 一次解包一整条记录，字段顺序见RECORD_FIELDS
+RECORD_STRUCT = struct.Struct("<BB6B2xB1xH2xH4H2xI")
+RECORD_FIELDS = (
+    "ability", "nature",
+    "ev1", "ev2", "ev3", "ev4", "ev5", "ev6",  # 按文件中的顺序
+    "level", "species", "item",
+    "move1", "move2", "move3", "move4",
+    "iv32",
+)
+_field_types = {"species": "H", "item": "H", "move1": "H", "move2": "H", "move3": "H", "move4": "H", "iv32": "I"}
+
+TRAINER_POKE_FILE_PATTERN = re.compile(r"trainer_poke_(\d+)\.bin")
+
+
+def is_trainer_poke_file(file_name):
+    return file_name.startswith("trainer_poke_") and file_name.endswith(".bin")
+
+
+def parse_ivs(iv32):
+    """从32位值中解析6项个体值（每5位一个）"""
+    return [(iv32 >> (5 * i)) & 0x1F for i in range(6)]
+
+
+class TrainerPokeCorpus:
+    """目录下全部训练家宝可梦文件的数据集
+
+    所有文件按文件名排序后依次拼接到data中（只保留完整的0x20字节记录），
+    file_ranges记录每个文件对应的记录范围；修改后调用save只写回被修改的文件。
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory: trainer_poke文件所在目录
+        """
+        self.directory = directory
+        self.files = sorted(f for f in os.listdir(directory) if is_trainer_poke_file(f))
+        self.file_ranges = {}  # 文件名 -> (起始记录编号, 记录数)
+        self.file_numbers = []
+        self._tails = {}  # 文件末尾不足一条记录的多余字节，写回时保持不变
+        self._dirty_files = set()
+        self._columns = None
+
+        parts = []
+        row = 0
+        for file_name in self.files:
+            with open(os.path.join(directory, file_name), "rb") as f:
+                raw = f.read()
+            count = len(raw) // TRAINER_POKE_RECORD_SIZE
+            parts.append(raw[:count * TRAINER_POKE_RECORD_SIZE])
+            if len(raw) % TRAINER_POKE_RECORD_SIZE:
+                self._tails[file_name] = raw[count * TRAINER_POKE_RECORD_SIZE:]
+            self.file_ranges[file_name] = (row, count)
+            row += count
+            match = TRAINER_POKE_FILE_PATTERN.match(file_name)
+            if match:
+                self.file_numbers.append(int(match.group(1)))
+        self.data = bytearray(b"".join(parts))
+        self.row_count = row
+        # 每条记录所属的文件，供按记录反查
+        self.row_files = [file_name for file_name in self.files for _ in range(self.file_ranges[file_name][1])]
+
+    def __len__(self):
+        return self.row_count
+
+    @staticmethod
+    def file_name_for(file_number):
+        """文件编号对应的文件名，如 19 -> trainer_poke_019.bin"""
+        return f"trainer_poke_{str(file_number).zfill(3)}.bin"
+
+    def has_file(self, file_name):
+        return file_name in self.file_ranges
+
+    def file_rows(self, file_name):
+        """文件对应的记录编号范围"""
+        start, count = self.file_ranges[file_name]
+        return range(start, start + count)
+
+    def _build_columns(self):
+        rows = list(RECORD_STRUCT.iter_unpack(self.data))
+        self._columns = {
+            name: array(_field_types.get(name, "B"), [row[i] for row in rows])
+            for i, name in enumerate(RECORD_FIELDS)
+        }
+
+    def column(self, name):
+        """获取某个字段在所有记录上的值（array）"""
+        if self._columns is None:
+            self._build_columns()
+        return self._columns[name]
+
+    def record(self, row):
+        """解包一条记录为字典"""
+        values = RECORD_STRUCT.unpack_from(self.data, row * TRAINER_POKE_RECORD_SIZE)
+        result = dict(zip(RECORD_FIELDS, values))
+        result["ability_value"] = (result["ability"] >> 4) & 0x0F
+        result["evs"] = list(values[2:8])
+        result["ivs"] = parse_ivs(result["iv32"])
+        result["moves"] = list(values[11:15])
+        return result
+
+    def raw_record(self, row):
+        offset = row * TRAINER_POKE_RECORD_SIZE
+        return bytes(self.data[offset:offset + TRAINER_POKE_RECORD_SIZE])
+
+    def set_u16(self, row, field_offset, value):
+        """修改一条记录中的16位字段"""
+        struct.pack_into("<H", self.data, row * TRAINER_POKE_RECORD_SIZE + field_offset, value)
+        self._dirty_files.add(self.row_files[row])
+        self._columns = None
+
+    def set_item(self, row, item_id):
+        self.set_u16(row, ITEM_OFFSET, item_id)
+
+    def set_items(self, items):
+        """批量修改持有物，items为与记录一一对应的道具ID序列"""
+        if len(items) != self.row_count:
+            raise ValueError(f"道具数量({len(items)})与记录数({self.row_count})不一致")
+        # 把数据看作16位数组，按记录步长一次性写入整列
+        item_column = array("H", items)
+        if sys.byteorder == "big":
+            item_column.byteswap()
+        with memoryview(self.data).cast("H") as view:
+            view[ITEM_OFFSET // 2::TRAINER_POKE_RECORD_SIZE // 2] = item_column
+        self._dirty_files.update(self.files)
+        self._columns = None
+
+    def save(self):
+        """把修改过的文件写回磁盘，返回写入的文件数"""
+        for file_name in sorted(self._dirty_files):
+            start, count = self.file_ranges[file_name]
+            with open(os.path.join(self.directory, file_name), "wb") as f:
+                f.write(self.data[start * TRAINER_POKE_RECORD_SIZE:(start + count) * TRAINER_POKE_RECORD_SIZE])
+                f.write(self._tails.get(file_name, b""))
+        written = len(self._dirty_files)
+        self._dirty_files.clear()
+        return written
+
+
+_corpus_cache = {}
+
+
+def get_trainer_poke_corpus(directory, reload=False):
+    """获取目录对应的数据集，同一会话内只读取一次文件
+
+    Args:
+        directory: trainer_poke文件所在目录
+        reload: 为True时重新读取（如用户手动刷新文件列表）
+    """
+    key = os.path.abspath(directory)
+    corpus = _corpus_cache.get(key)
+    if corpus is None or reload:
+        corpus = TrainerPokeCorpus(directory)
+        _corpus_cache[key] = corpus
+    return corpus
@@ -1,6 +1,8 @@
 import random
 import json
 import os
+from array import array
+from collections import Counter
 from typing import List, Dict
 from core.battle_types import calculate_weaknesses
 
@@ -41,17 +43,81 @@ def load_pokemon_types_data():
     # 如果找不到数据文件，返回空字典
     return {}
 
+class AliasTable:
+    """Walker/Vose别名表，构建O(n)，每次按权重抽样O(1)"""
+
+    __slots__ = ("items", "prob", "alias")
+
+    def __init__(self, items, weights):
+        n = len(items)
+        if n == 0:
+            raise ValueError("候选列表不能为空")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("权重之和必须大于0")
+        self.items = list(items)
+        scaled = [weight * n / total for weight in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 剩余项因浮点误差略偏离1，直接视为1
+
+    def sample(self, rng=random):
+        i = int(rng.random() * len(self.items))
+        if rng.random() >= self.prob[i]:
+            i = self.alias[i]
+        return self.items[i]
+
+    def sample_indices(self, rng, k):
+        """抽样k次，返回抽中项在items中的下标"""
+        prob, alias = self.prob, self.alias
+        n = len(prob)
+        rand = rng.random
+        result = []
+        for _ in range(k):
+            i = int(rand() * n)
+            result.append(i if rand() < prob[i] else alias[i])
+        return result
+
+    def sample_many(self, rng, k):
+        items = self.items
+        return [items[i] for i in self.sample_indices(rng, k)]
+
+# 预先构建的抽样表：道具类别表、每种属性组合的攻击/防御/污泥表，重新加载配置或属性数据时清空
+_category_sampler = None
+_attribute_samplers = {}
+_all_type_items_cache = None
+
+def _clear_samplers():
+    global _category_sampler, _all_type_items_cache
+    _category_sampler = None
+    _all_type_items_cache = None
+    _attribute_samplers.clear()
+
+# 道具ID -> 类别编号的稠密数组及类别名称表（编号0为"未知类别"），重新加载配置时清空
+_item_category_index = None
+
 # 重新加载配置文件的函数
 def reload_config():
-    global config, item_categories, type_category
+    global config, item_categories, type_category, _item_category_index
     config = load_config()
     item_categories = config["item_categories"]
     type_category = item_categories["type"]
+    _clear_samplers()
+    _item_category_index = None
 
 # 重新加载宝可梦类型数据的函数
 def reload_pokemon_types_data():
     global pokemon_types_data
     pokemon_types_data = load_pokemon_types_data()
+    _clear_samplers()
 
 config = load_config()
 pokemon_types_data = load_pokemon_types_data()
@@ -67,51 +133,82 @@ def get_pokemon_types(pokemon_id: int) -> List[str]:
         print(f"无法获取宝可梦ID为{pokemon_id}的属性")
         return []
 
-def select_item(pokemon_id: int) -> int:
-    categories = list(item_categories.values())
-    weights = [cat["weight"] for cat in categories]
-    selected_category = random.choices(categories, weights=weights, k=1)[0]
+def _get_category_sampler() -> AliasTable:
+    """道具类别的别名表（按各类别weight抽样）"""
+    global _category_sampler
+    if _category_sampler is None:
+        categories = list(item_categories.values())
+        _category_sampler = AliasTable(categories, [cat["weight"] for cat in categories])
+    return _category_sampler
+
+def select_item(pokemon_id: int, rng=random) -> int:
+    selected_category = _get_category_sampler().sample(rng)
     if selected_category["name"] == "属性：空道具":
-        return select_attribute_item(pokemon_id)
-    return random.choice(selected_category["items"])
+        return select_attribute_item(pokemon_id, rng)
+    return rng.choice(selected_category["items"])
 
-def get_item_category(item_id: int) -> str:
+def _build_item_category_index():
+    """按get_item_category原有的匹配顺序，为每个道具ID记录第一个匹配的类别"""
+    names = ["未知类别"]
+    assignments = []  # (道具ID列表, 类别名称)，按优先级排列
     for category_name, category_data in item_categories.items():
         if category_name == "type":
-            if "attack" in category_data:
-                for attr, items in category_data["attack"].items():
-                    if item_id in items:
-                        return "属性道具-攻击"
-            if "defend" in category_data:
-                for attr, items in category_data["defend"].items():
-                    if item_id in items:
-                        return "属性道具-防御"
-            if "special" in category_data:
-                for key, items in category_data["special"].items():
-                    if item_id in items:
-                        return "属性道具-特殊"
-            if "items" in category_data and item_id in category_data["items"]:
-                return "属性道具"
-        else:
-            if "items" in category_data and item_id in category_data["items"]:
-                return category_data["name"]
+            for sub_key, label in (("attack", "属性道具-攻击"), ("defend", "属性道具-防御"), ("special", "属性道具-特殊")):
+                if sub_key in category_data:
+                    for items in category_data[sub_key].values():
+                        assignments.append((items, label))
+            if "items" in category_data:
+                assignments.append((category_data["items"], "属性道具"))
+        elif "items" in category_data:
+            assignments.append((category_data["items"], category_data["name"]))
+
+    max_item_id = max((item_id for items, _ in assignments for item_id in items
+                       if isinstance(item_id, int) and item_id >= 0), default=-1)
+    codes = array("H", [0]) * (max_item_id + 1)
+    for items, label in assignments:
+        if label not in names:
+            names.append(label)
+        code = names.index(label)
+        for item_id in items:
+            if isinstance(item_id, int) and item_id >= 0 and codes[item_id] == 0:
+                codes[item_id] = code
+    return codes, names
+
+def _get_item_category_index():
+    global _item_category_index
+    if _item_category_index is None:
+        _item_category_index = _build_item_category_index()
+    return _item_category_index
+
+def get_item_category_index():
+    """道具类别的稠密索引：(codes, names)，道具ID在codes范围内时类别为names[codes[item_id]]，否则为names[0]
+
+    需要逐行取类别时直接查表，避免对每个道具调用get_item_category。
+    """
+    return _get_item_category_index()
+
+def get_item_category(item_id: int) -> str:
+    codes, names = _get_item_category_index()
+    if isinstance(item_id, int) and 0 <= item_id < len(codes):
+        return names[codes[item_id]]
     return "未知类别"
 
-def select_attribute_item(pokemon_id: int) -> int:
-    """根据宝可梦选择道具"""
-    pokemon_types = get_pokemon_types(pokemon_id)
+def item_category_histogram(item_ids) -> Counter:
+    """统计一批道具ID的类别分布，返回 {类别名称: 数量}"""
+    codes, names = _get_item_category_index()
+    size = len(codes)
+    counts = [0] * len(names)
+    for item_id in item_ids:
+        counts[codes[item_id] if 0 <= item_id < size else 0] += 1
+    return Counter({names[code]: count for code, count in enumerate(counts) if count})
 
-    if not pokemon_types:
-        all_type_items = []
-        for attr_items in type_category["attack"].values():
-            all_type_items.extend(attr_items)
-        for attr_items in type_category["defend"].values():
-            all_type_items.extend(attr_items)
-        for attr_items in type_category["special"].values():
-            all_type_items.extend(attr_items)
-        print("未找到宝可梦，随机选择type道具")
-        return random.choice(all_type_items)
-    
+def _attribute_item_tables(pokemon_types: List[str]) -> Dict[str, tuple]:
+    """计算属性道具三个分支（攻击/防御/黑色污泥）的候选道具及权重
+
+    Returns:
+        {"category_weights": [攻击, 防御, 污泥],
+         "attack": (道具列表, 权重列表), "defend": (...), "special": (...)}
+    """
     attack_weight = 3.0
     defend_weight = 2.0
     sludge_weight = 0.01
@@ -124,70 +221,174 @@ def select_attribute_item(pokemon_id: int) -> int:
     double_weak = [attr for attr, multiplier in weaknesses.items() if multiplier == 2.0]
     quadruple_weak = [attr for attr, multiplier in weaknesses.items() if multiplier == 4.0]
 
-    item_weights = {}
-    
-    category_weights = [attack_weight, defend_weight, sludge_weight]
-
-    rand_val = random.uniform(0, sum(category_weights))
-
-    if rand_val < attack_weight:
-        for attr, items in type_category["attack"].items():
-            for item_id in items:
-                base_weight = 0.01
-                if attr in pokemon_types:
-                    base_weight += 2.0 / len(pokemon_types)
-
-                    if attr == "normal":
-                        if item_id == 564:
-                            base_weight *= 0.8
-                        elif item_id == 251:
-                            base_weight *= 1.2
-                
-                item_weights[item_id] = base_weight
-        attack_items = []
-        for items in type_category["attack"].values():
-            attack_items.extend(items)
-        items = attack_items
-        
-    elif rand_val < attack_weight + defend_weight:
-        for attr, items in type_category["defend"].items():
-            for item_id in items:
-                base_weight = 0.01
-                if attr in double_weak:
-                    factor = 2.0 / len(double_weak)
-                    base_weight += factor if double_weak else 0
-
-                    if attr == "ice":
-                        if item_id == 649:  # 雪球(冰)
-                            base_weight += 0.02
-                    elif attr == "electric":
-                        if item_id == 546:  # 充电电池(电)
-                            base_weight += 0.02
-                    elif attr == "water":
-                        if item_id == 545:  # 球根(水)
-                            base_weight /= 2
-                            base_weight += 0.01
-                        if item_id == 648:  # 光苔(水)
-                            base_weight /= 2
-                            base_weight += 0.01
-
-                if attr in quadruple_weak:
-                    base_weight += 2.0 / len(quadruple_weak) if quadruple_weak else 0
-
-                item_weights[item_id] = base_weight
-        defend_items = []
-        for items in type_category["defend"].values():
-            defend_items.extend(items)
-        items = defend_items
-    else:
-        items = type_category["special"]["black_sludge"]
-    
-    weights = [item_weights.get(item_id, 0.01) for item_id in items]
+    attack_item_weights = {}
+    for attr, items in type_category["attack"].items():
+        for item_id in items:
+            base_weight = 0.01
+            if attr in pokemon_types:
+                base_weight += 2.0 / len(pokemon_types)
+
+                if attr == "normal":
+                    if item_id == 564:
+                        base_weight *= 0.8
+                    elif item_id == 251:
+                        base_weight *= 1.2
+            
+            attack_item_weights[item_id] = base_weight
+    attack_items = []
+    for items in type_category["attack"].values():
+        attack_items.extend(items)
+
+    defend_item_weights = {}
+    for attr, items in type_category["defend"].items():
+        for item_id in items:
+            base_weight = 0.01
+            if attr in double_weak:
+                factor = 2.0 / len(double_weak)
+                base_weight += factor if double_weak else 0
 
-    selected_item = random.choices(items, weights=weights, k=1)[0]
+                if attr == "ice":
+                    if item_id == 649:  # 雪球(冰)
+                        base_weight += 0.02
+                elif attr == "electric":
+                    if item_id == 546:  # 充电电池(电)
+                        base_weight += 0.02
+                elif attr == "water":
+                    if item_id == 545:  # 球根(水)
+                        base_weight /= 2
+                        base_weight += 0.01
+                    if item_id == 648:  # 光苔(水)
+                        base_weight /= 2
+                        base_weight += 0.01
+
+            if attr in quadruple_weak:
+                base_weight += 2.0 / len(quadruple_weak) if quadruple_weak else 0
+
+            defend_item_weights[item_id] = base_weight
+    defend_items = []
+    for items in type_category["defend"].values():
+        defend_items.extend(items)
+
+    sludge_items = type_category["special"]["black_sludge"]
+
+    return {
+        "category_weights": [attack_weight, defend_weight, sludge_weight],
+        "attack": (attack_items, [attack_item_weights.get(item_id, 0.01) for item_id in attack_items]),
+        "defend": (defend_items, [defend_item_weights.get(item_id, 0.01) for item_id in defend_items]),
+        "special": (sludge_items, [0.01] * len(sludge_items)),
+    }
+
+def _all_type_items() -> List[int]:
+    global _all_type_items_cache
+    if _all_type_items_cache is None:
+        all_type_items = []
+        for attr_items in type_category["attack"].values():
+            all_type_items.extend(attr_items)
+        for attr_items in type_category["defend"].values():
+            all_type_items.extend(attr_items)
+        for attr_items in type_category["special"].values():
+            all_type_items.extend(attr_items)
+        _all_type_items_cache = all_type_items
+    return _all_type_items_cache
+
+ATTRIBUTE_BRANCHES = ("attack", "defend", "special")
+
+def _get_attribute_samplers(pokemon_types) -> Dict[str, AliasTable]:
+    """某种属性组合的抽样表：branch(攻击/防御/污泥分支)及各分支的道具表
+
+    候选道具为空的分支权重视为0，不会被抽到；所有分支都为空时branch为None。
+    各分支的道具表在第一次抽到该分支时才构建（见_get_branch_sampler）。
+    """
+    key = tuple(pokemon_types)
+    samplers = _attribute_samplers.get(key)
+    if samplers is None:
+        tables = _attribute_item_tables(list(key))
+        weights = [weight if tables[branch][0] else 0.0
+                   for branch, weight in zip(ATTRIBUTE_BRANCHES, tables["category_weights"])]
+        samplers = {
+            "branch": AliasTable(ATTRIBUTE_BRANCHES, weights) if any(weights) else None,
+            "tables": tables,
+        }
+        _attribute_samplers[key] = samplers
+    return samplers
+
+def _get_branch_sampler(samplers, branch) -> AliasTable:
+    """某个分支的道具表，第一次使用时构建"""
+    sampler = samplers.get(branch)
+    if sampler is None:
+        sampler = samplers[branch] = AliasTable(*samplers["tables"][branch])
+    return sampler
+
+def select_attribute_item(pokemon_id: int, rng=random) -> int:
+    """根据宝可梦选择道具"""
+    pokemon_types = get_pokemon_types(pokemon_id)
+
+    if not pokemon_types:
+        print("未找到宝可梦，随机选择type道具")
+        return rng.choice(_all_type_items())
+    
+    samplers = _get_attribute_samplers(pokemon_types)
+    if samplers["branch"] is None:
+        print("属性道具分支均为空，随机选择type道具")
+        return rng.choice(_all_type_items())
+    branch = samplers["branch"].sample(rng)
+    selected_item = _get_branch_sampler(samplers, branch).sample(rng)
 
     return selected_item
 
+def select_items_batch(pokemon_ids, seed=None) -> List[int]:
+    """为一批宝可梦选择道具，结果与逐个调用select_item的分布相同
+
+    按属性组合对宝可梦分组，每组只取一次抽样表，并对整组一次性抽样：
+    先抽道具类别，再对抽到"属性：空道具"的宝可梦抽攻击/防御/污泥分支，最后按分支抽道具。
+    类别按在配置中的下标分组，名称相同的不同类别不会被合并。
+
+    Args:
+        pokemon_ids: 宝可梦ID序列
+        seed: 随机种子，相同种子和输入得到相同结果；为None时使用系统随机源
+
+    Returns:
+        与pokemon_ids一一对应的道具ID列表
+    """
+    rng = random.Random(seed)
+    category_sampler = _get_category_sampler()
+    categories = category_sampler.items
+
+    groups = {}
+    for row, pokemon_id in enumerate(pokemon_ids):
+        types = pokemon_types_data.get(str(pokemon_id), [])
+        groups.setdefault(tuple(types), []).append(row)
+
+    result = [0] * len(pokemon_ids)
+    for types, rows in groups.items():
+        # 每只宝可梦先抽道具类别
+        by_category = {}
+        for row, index in zip(rows, category_sampler.sample_indices(rng, len(rows))):
+            by_category.setdefault(index, []).append(row)
+
+        for index, category_rows in by_category.items():
+            category = categories[index]
+            if category["name"] != "属性：空道具":
+                for row, item_id in zip(category_rows, rng.choices(category["items"], k=len(category_rows))):
+                    result[row] = item_id
+                continue
+
+            samplers = _get_attribute_samplers(types) if types else None
+            if samplers is None or samplers["branch"] is None:
+                print(f"{len(category_rows)}只宝可梦没有可用的属性道具表，随机选择type道具")
+                for row, item_id in zip(category_rows, rng.choices(_all_type_items(), k=len(category_rows))):
+                    result[row] = item_id
+                continue
+
+            by_branch = {}
+            for row, branch in zip(category_rows, samplers["branch"].sample_many(rng, len(category_rows))):
+                by_branch.setdefault(branch, []).append(row)
+            for branch, branch_rows in by_branch.items():
+                branch_sampler = _get_branch_sampler(samplers, branch)
+                for row, item_id in zip(branch_rows, branch_sampler.sample_many(rng, len(branch_rows))):
+                    result[row] = item_id
+
+    return result
 
 
 if __name__ == "__main__":
@@ -1,27 +1,15 @@
 import struct
 import os
-import re
 import json
 
 from core.static_data import type_map, nature_map, nature_effect_map, v_names
 from utils.dev_paths import get_dev_path
 from file_manager import safe_load_file
+from trainer_poke_corpus import get_trainer_poke_corpus, TRAINER_POKE_RECORD_SIZE, TRAINER_POKE_FILE_PATTERN
 
 trainer_poke_dir = get_dev_path("modified_trainer_poke_dir")
 if not trainer_poke_dir:
     raise RuntimeError("请在 config/dev_paths.local.json 中配置 modified_trainer_poke_dir")
-POKEMON_SIZE = 0x20
-ITEM_OFFSET = 0x10
-POKEMON_ID_OFFSET = 0x0C
-LEVEL_OFFSET = 0x0A
-NATURE_OFFSET = 0x01
-IV_OFFSET = 0x1C
-EV_OFFSET = 0x02
-ABILITY_OFFSET = 0x00
-MOVE1_OFFSET = 0x12
-MOVE2_OFFSET = 0x14
-MOVE3_OFFSET = 0x16
-MOVE4_OFFSET = 0x18
 
 pokemon_types_data = safe_load_file("pokemon_types_final.json", "json") or {}
 
@@ -136,14 +124,14 @@ def main(check16 = True, file_number = "019"):
     file_number = file_number.zfill(3)
 
     # 选择一个文件进行验证
-    sample_file = os.path.join(trainer_poke_dir, "trainer_poke_" + file_number + ".bin")
+    corpus = get_trainer_poke_corpus(trainer_poke_dir)
+    file_name = corpus.file_name_for(file_number)
 
-    if not os.path.exists(sample_file):
-        print(f"文件不存在: {sample_file}")
+    if not corpus.has_file(file_name):
+        print(f"文件不存在: {os.path.join(trainer_poke_dir, file_name)}")
         return False
 
-    with open(sample_file, "rb") as f:
-        data = f.read()
+    rows = corpus.file_rows(file_name)
 
     if check16:
         # 检查文件大小
@@ -155,7 +143,8 @@ def main(check16 = True, file_number = "019"):
 
         # 打印第一个宝可梦的数据结构
         print("\n第一个宝可梦数据 (十六进制):")
-        for i in range(0, min(POKEMON_SIZE, len(data))):
+        data = corpus.raw_record(rows[0]) if rows else b""
+        for i in range(0, min(TRAINER_POKE_RECORD_SIZE, len(data))):
             if i % 16 == 0:
                 print(f"\nOffset 0x{i:02X}: ", end="")
             print(f"{data[i]:02X} ", end="")
@@ -198,34 +187,16 @@ def main(check16 = True, file_number = "019"):
         # else:
         #     print("\n错误: 个体值偏移超出文件范围!")
     else:
-        file_size = len(data)
-        num_pokemon = file_size // POKEMON_SIZE
-        print(f"文件: trainer_poke_{file_number}.bin")
-        print(f"宝可梦数量: {num_pokemon}")
+        print(f"文件: {file_name}")
+        print(f"宝可梦数量: {len(rows)}")
         print("-" * 80)
 
-        for i in range(num_pokemon):
-            offset = i * POKEMON_SIZE
-            if offset + POKEMON_SIZE > file_size:
-                print(f"警告: 宝可梦{i}的数据不完整!")
-                break
-
-            # 飘移
-            pokemon_id_offset = offset + POKEMON_ID_OFFSET
-            item_offset = offset + ITEM_OFFSET
-            level_offset = offset + LEVEL_OFFSET
-            nature_offset = offset + NATURE_OFFSET
-            ev_offset = offset + EV_OFFSET
-            iv_offset = offset + IV_OFFSET
-            move1_offset = offset + MOVE1_OFFSET
-            move2_offset = offset + MOVE2_OFFSET
-            move3_offset = offset + MOVE3_OFFSET
-            move4_offset = offset + MOVE4_OFFSET
-
-            pokemon_id = struct.unpack("<H", data[pokemon_id_offset:pokemon_id_offset+2])[0]
-            item_id = struct.unpack("<H", data[item_offset:item_offset+2])[0]
-            level = data[level_offset]
-            nature_value = data[nature_offset]
+        for i, row in enumerate(rows):
+            record = corpus.record(row)
+            pokemon_id = record["species"]
+            item_id = record["item"]
+            level = record["level"]
+            nature_value = record["nature"]
 
             pokemon_name = get_pokemon_name(pokemon_id)
 
@@ -241,30 +212,14 @@ def main(check16 = True, file_number = "019"):
             else:
                 nature_display = nature_name
 
-            evs = []
-            if ev_offset + 6 <= len(data):
-                ev_data = data[ev_offset:ev_offset+6]
-                evs = parse_evs(ev_data)
-            
-            ivs = []
-            if iv_offset + 4 <= len(data):
-                iv_data = data[iv_offset:iv_offset+4]
-                ivs = parse_ivs(iv_data)
+            evs = record["evs"]
+            ivs = record["ivs"]
             
             # 解析特性
-            ability_value = (data[offset + ABILITY_OFFSET] >> 4) & 0x0F
-            ability_display = get_ability_display(pokemon_id, ability_value)
+            ability_display = get_ability_display(pokemon_id, record["ability_value"])
             
             # 解析技能
-            move1 = struct.unpack("<H", data[move1_offset:move1_offset+2])[0]
-            move2 = struct.unpack("<H", data[move2_offset:move2_offset+2])[0]
-            move3 = struct.unpack("<H", data[move3_offset:move3_offset+2])[0]
-            move4 = struct.unpack("<H", data[move4_offset:move4_offset+2])[0]
-            
-            move1_name = get_move_name(move1)
-            move2_name = get_move_name(move2)
-            move3_name = get_move_name(move3)
-            move4_name = get_move_name(move4)
+            move1_name, move2_name, move3_name, move4_name = (get_move_name(move) for move in record["moves"])
 
             # 打印宝可梦信息
             print(f"宝可梦 {i+1}:")
@@ -288,16 +243,11 @@ def list_all_trainer_files():
         print(f"{trainer_poke_dir} 不存在")
         return False
 
-    files = [f for f in os.listdir(trainer_poke_dir) if f.startswith("trainer_poke_") and f.endswith(".bin")]
-    files.sort()
-
-    file_numbers = []
-    pattern = re.compile(r"trainer_poke_(\d+)\.bin")
-    for f in files:
-        match = pattern.match(f)
-        if match:
-            file_numbers.append(int(match.group(1)))
-        else:
+    corpus = get_trainer_poke_corpus(trainer_poke_dir)
+    files = [f for f in corpus.files if TRAINER_POKE_FILE_PATTERN.match(f)]
+    file_numbers = corpus.file_numbers
+    for f in corpus.files:
+        if not TRAINER_POKE_FILE_PATTERN.match(f):
             print(f"无法解析文件名：{f}")
     
     # 检查缺失的文件编号